@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+"""
+WSGI vs ASGI load test for the enqueue / status API.
+
+Starts the project twice on a throwaway sqlite database, once as
+  * WSGI: gunicorn (gthread workers, sync screenshots.views)
+  * ASGI: uvicorn (screenshots.async_views, ASYNC_API_VIEWS=1)
+with the same number of worker processes, and drives both with the same
+closed-loop load (a fixed number of concurrent clients):
+
+  status          GET  /api/tasks/<id>/
+  projects        GET  /api/projects/?limit=20
+  enqueue         POST /api/projects/<id>/screenshots/
+  status_streams  GET  /api/tasks/<id>/ while --streams clients keep a
+                  progress stream (/api/tasks/<id>/events/) open
+
+Celery uses the in-memory broker / result backend, so the numbers are for
+the web tier only. Requires gunicorn and uvicorn.
+
+    python benchmarks/api_load.py --workers 2 --threads 4 --concurrency 50 --json bench_api.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def prepare_database(env, projects):
+    """Migrate the throwaway database and add a few projects to list / enqueue against"""
+    code = (
+        "import django; django.setup()\n"
+        "from django.core.management import call_command\n"
+        "from screenshots.models import Project\n"
+        "call_command('migrate', verbosity=0)\n"
+        f"Project.objects.bulk_create([Project(name=f'load {{i}}', website_url='https://example.com', "
+        f"creator_id=str(i % 10), creator_name='load') for i in range({projects})])\n"
+        "print(Project.objects.order_by('id').values_list('id', flat=True).first())\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    return int(out.stdout.strip().splitlines()[-1])
+
+
+def server_command(kind, port, args):
+    if kind == 'wsgi':
+        return ['gunicorn', 'screenshot_generator.wsgi:application', '-b', f'127.0.0.1:{port}',
+                '-w', str(args.workers), '-k', 'gthread', '--threads', str(args.threads),
+                '--log-level', 'warning']
+    return ['uvicorn', 'screenshot_generator.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+            '--workers', str(args.workers), '--log-level', 'warning', '--no-access-log']
+
+
+# ---------------------------
+# ✅ MINIMAL HTTP/1.1 CLIENT (one connection per request, like an uncached browser fetch)
+# ---------------------------
+async def http(port, method, path, body=None, timeout=10.0, read_all=True):
+    """Return (status, seconds); raises on connection errors / timeouts"""
+    start = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection('127.0.0.1', port), timeout)
+    try:
+        payload = body.encode() if body else b''
+        head = (f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n'
+                f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n')
+        writer.write(head.encode() + payload)
+        await writer.drain()
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        status = int(status_line.split()[1])
+        if read_all:
+            await asyncio.wait_for(reader.read(), timeout)
+        return status, time.perf_counter() - start
+    finally:
+        writer.close()
+
+
+async def hold_stream(port, opened, stop):
+    """Keep one SSE progress stream open until stop is set"""
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET /api/tasks/{uuid.uuid4()}/events/ HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n'.encode())
+        await writer.drain()
+        await asyncio.wait_for(reader.readline(), 30)
+        opened.append(1)
+        while not stop.is_set():
+            if not await asyncio.wait_for(reader.read(1024), 30):
+                break
+        writer.close()
+    except (OSError, asyncio.TimeoutError):
+        pass
+
+
+async def run_load(port, make_request, concurrency, duration):
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            method, path, body = make_request()
+            try:
+                status, seconds = await http(port, method, path, body)
+                if status >= 400:
+                    errors += 1
+                else:
+                    latencies.append(seconds)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                errors += 1
+
+    start = time.monotonic()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.monotonic() - start
+
+    latencies.sort()
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': pct(0.50),
+        'p95_ms': pct(0.95),
+        'p99_ms': pct(0.99),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+async def scenarios(port, project_id, args):
+    results = {}
+    results['status'] = await run_load(
+        port, lambda: ('GET', f'/api/tasks/{uuid.uuid4()}/', None), args.concurrency, args.duration)
+    results['projects'] = await run_load(
+        port, lambda: ('GET', '/api/projects/?limit=20', None), args.concurrency, args.duration)
+    results['enqueue'] = await run_load(
+        port, lambda: ('POST', f'/api/projects/{project_id}/screenshots/', '{"devices": ["mobile"]}'),
+        args.concurrency, args.duration)
+
+    stop, opened = asyncio.Event(), []
+    streams = [asyncio.ensure_future(hold_stream(port, opened, stop)) for _ in range(args.streams)]
+    await asyncio.sleep(1)
+    results['status_streams'] = await run_load(
+        port, lambda: ('GET', f'/api/tasks/{uuid.uuid4()}/', None), args.concurrency, args.duration)
+    results['status_streams']['streams_open'] = len(opened)
+    stop.set()
+    for task in streams:
+        task.cancel()
+    await asyncio.gather(*streams, return_exceptions=True)
+    return results
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _ = asyncio.run(http(port, 'GET', f'/api/tasks/{uuid.uuid4()}/', timeout=2))
+            if status == 200:
+                return
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f'server on port {port} did not come up')
+
+
+def bench_server(kind, env, project_id, args):
+    port = free_port()
+    server_env = dict(env, ASYNC_API_VIEWS='1' if kind == 'asgi' else '0')
+    process = subprocess.Popen(server_command(kind, port, args), cwd=ROOT, env=server_env, start_new_session=True)
+    try:
+        wait_ready(port)
+        print(f'{kind}: running scenarios on :{port}...')
+        return asyncio.run(scenarios(port, project_id, args))
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2, help='server worker processes (both servers)')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gunicorn worker (WSGI)')
+    parser.add_argument('--concurrency', type=int, default=50, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per scenario')
+    parser.add_argument('--streams', type=int, default=40, help='open progress streams in status_streams')
+    parser.add_argument('--projects', type=int, default=200, help='projects in the database')
+    parser.add_argument('--only', choices=['wsgi', 'asgi'], help='benchmark one server only')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='api_load_')
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='screenshot_generator.settings',
+        SQLITE_PATH=os.path.join(tmp, 'db.sqlite3'),
+        CELERY_BROKER_URL='memory://',
+        CELERY_RESULT_BACKEND='cache+memory://',
+        # streams end by themselves shortly after their scenario
+        TASK_EVENTS_MAX_DURATION=str(int(args.duration) + 5),
+    )
+    env.pop('DATABASE_URL', None)
+
+    try:
+        project_id = prepare_database(env, args.projects)
+        report = {
+            'workers': args.workers,
+            'wsgi_threads': args.threads,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'streams': args.streams,
+        }
+        for kind in ('wsgi', 'asgi'):
+            if args.only in (None, kind):
+                report[kind] = bench_server(kind, env, project_id, args)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"\n{'scenario':<16}{'server':<7}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for scenario in ('status', 'projects', 'enqueue', 'status_streams'):
+        for kind in ('wsgi', 'asgi'):
+            r = report.get(kind, {}).get(scenario)
+            if r:
+                print(f"{scenario:<16}{kind:<7}{r['rps']:>9}{str(r['p50_ms']):>10}{str(r['p95_ms']):>10}"
+                      f"{str(r['p99_ms']):>10}{r['errors']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+"""
+Offline capture + mockup benchmark.
+
+Serves the fixture site (benchmarks/fixture_site.py) locally and runs the
+real ScreenshotService (Playwright with a warm browser, or --engine selenium
+with its reused session) and MockupService over every page x device,
+--repeat times. Reports, per page and device:
+
+  * latency per phase (median / p95 / min / max, ms): capture and mockup
+    end to end, plus the finer phases the services record (navigation,
+    page_delay, scrolling, rasterization, mockup_fit, mockup_encode, ...)
+  * output bytes of the original capture and of the mockup
+  * peak RSS of this process plus its children (Chromium) while the page ran
+
+Results are written as JSON; --compare flags phases whose median got slower
+than the baseline by more than --tolerance (exit status 1), so runs can be
+checked for regressions:
+
+    python benchmarks/capture_bench.py --json bench_capture.json
+    python benchmarks/capture_bench.py --compare bench_capture.json
+
+Nothing leaves the machine: the ScreenshotOne fallback is never used. When
+Chromium can't start, the capture phases are reported as errors and the
+mockup phases run on synthetic screenshots of the same sizes.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PIL import Image  # noqa: E402
+
+from fixture_site import PAGES, FixtureSite  # noqa: E402
+from screenshots.engines import capture_options  # noqa: E402
+from screenshots.services import MockupService, ScreenshotService  # noqa: E402
+
+# full-page height used for synthetic screenshots when the browser is unavailable
+SYNTHETIC_HEIGHTS = {'short': 900, 'tall': 12000, 'very-tall': 40000, 'lazy': 26000, 'fonts': 9000,
+                     'animated': 5500, 'slow': 3200}
+
+
+# ---------------------------
+# ✅ PEAK RSS (this process + children, sampled)
+# ---------------------------
+def _process_tree_rss():
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        me = psutil.Process()
+        total = me.memory_info().rss
+        for child in me.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    # /proc fallback (Linux)
+    parents = {}
+    for pid in os.listdir('/proc'):
+        if pid.isdigit():
+            try:
+                with open(f'/proc/{pid}/stat') as f:
+                    parents[int(pid)] = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                pass
+    tree, frontier = {os.getpid()}, [os.getpid()]
+    while frontier:
+        parent = frontier.pop()
+        for pid, ppid in parents.items():
+            if ppid == parent and pid not in tree:
+                tree.add(pid)
+                frontier.append(pid)
+
+    total = 0
+    for pid in tree:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+
+class RSSSampler:
+    """Background sampler of the process tree's RSS; reset() starts a new peak window"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self.overall_peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = _process_tree_rss()
+            self.peak = max(self.peak, rss)
+            self.overall_peak = max(self.overall_peak, rss)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def reset(self):
+        self.peak = _process_tree_rss()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def stats(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        'median_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000, 2),
+        'min_ms': round(ordered[0] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+        'runs': len(ordered),
+    }
+
+
+def mb(value):
+    return round(value / (1024 * 1024), 1)
+
+
+# ---------------------------
+# ✅ PHASES
+# ---------------------------
+def capture_page(service, engine, url, devices, folder, project):
+    """One capture of every device; returns ({device_type: seconds}, {device_type: result}, total seconds)"""
+    timings, results = {}, {}
+    start = last = time.perf_counter()
+
+    def on_captured(result):
+        nonlocal last
+        now = time.perf_counter()
+        if result['success']:
+            # the first device also pays for navigation and page_delay
+            timings[result['device_type']] = now - last
+            results[result['device_type']] = result
+        last = now
+
+    # call the engine directly: the service's fallback would go to the ScreenshotOne API
+    service.engine(engine).capture(url, devices, folder, capture_options(project), progress_callback=on_captured)
+    return timings, results, time.perf_counter() - start
+
+
+def synthetic_screenshot(folder, page, device_name, config):
+    path = os.path.join(folder, f"synthetic_{page}_{device_name.replace(' ', '_').lower()}.png")
+    if not os.path.exists(path):
+        image = Image.new('RGB', (config['width'], SYNTHETIC_HEIGHTS.get(page, 4000)), (240, 242, 248))
+        for y in range(0, image.height, 600):
+            image.paste((54, 102, 204), (40, y + 40, config['width'] - 40, y + 200))
+        image.save(path, 'PNG')
+    return path
+
+
+def bench_page(page, site, screenshot_service, mockup_service, devices, args, sampler, work_dir):
+    project = SimpleNamespace(page_delay=args.page_delay, scroll_delay=args.scroll_delay, timeout=args.timeout)
+    capture_samples = {device_type: [] for _, _, device_type in devices}
+    mockup_samples = {device_type: [] for _, _, device_type in devices}
+    # finer phases reported by the services themselves (screenshots.timing)
+    phase_samples = {device_type: {} for _, _, device_type in devices}
+    totals, sizes, errors = [], {}, []
+    synthetic = False
+
+    sampler.reset()
+    for run in range(args.repeat):
+        folder = tempfile.mkdtemp(dir=work_dir)
+        results = {}
+        if not args.skip_capture and not synthetic:
+            try:
+                timings, results, total = capture_page(screenshot_service, args.engine, site.url(f'/{page}'),
+                                                       devices, folder, project)
+                totals.append(total)
+                for device_type, seconds in timings.items():
+                    capture_samples[device_type].append(seconds)
+                missing = [d for _, _, d in devices if d not in results]
+                if missing:
+                    errors.append(f'run {run}: no capture for {", ".join(missing)}')
+            except Exception as e:
+                errors.append(f'run {run}: {e.__class__.__name__}: {str(e).splitlines()[0]}')
+
+        for device_name, config, device_type in devices:
+            path = results.get(device_type, {}).get('path')
+            if not path:
+                synthetic = True
+                path = synthetic_screenshot(work_dir, page, device_name, config)
+
+            start = time.perf_counter()
+            mockup = mockup_service.create_mockup(path, device_type, folder)
+            mockup_samples[device_type].append(time.perf_counter() - start)
+
+            timings = {**results.get(device_type, {}).get('timings', {}), **mockup.get('timings', {})}
+            for phase, seconds in timings.items():
+                phase_samples[device_type].setdefault(phase, []).append(seconds)
+
+            sizes[device_type] = {
+                'original_bytes': os.path.getsize(path),
+                'mockup_bytes': os.path.getsize(mockup['path']) if mockup.get('success') else None,
+            }
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        'capture_total': stats(totals),
+        'devices': {
+            device_type: {
+                'device_name': device_name,
+                'capture': stats(capture_samples[device_type]),
+                'mockup': stats(mockup_samples[device_type]),
+                'phases': {phase: stats(samples) for phase, samples in phase_samples[device_type].items()},
+                **sizes.get(device_type, {}),
+            }
+            for device_name, _, device_type in devices
+        },
+        'peak_rss_mb': mb(sampler.peak),
+        'synthetic_screenshots': synthetic,
+        'errors': errors[:5],
+    }
+
+
+# ---------------------------
+# ✅ REGRESSION CHECK
+# ---------------------------
+def compare(report, baseline, tolerance):
+    """List of (phase, baseline ms, current ms) whose median grew by more than tolerance"""
+    regressions = []
+
+    def walk(current, previous, path):
+        if not isinstance(current, dict) or not isinstance(previous, dict):
+            return
+        if 'median_ms' in current and previous.get('median_ms'):
+            if current['median_ms'] > previous['median_ms'] * (1 + tolerance):
+                regressions.append(('/'.join(path), previous['median_ms'], current['median_ms']))
+            return
+        for key, value in current.items():
+            walk(value, previous.get(key), path + [key])
+
+    walk(report, baseline, [])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', default=','.join(PAGES), help='comma separated fixture pages')
+    parser.add_argument('--devices', default='mobile,tablet,desktop', help='comma separated device types')
+    parser.add_argument('--repeat', type=int, default=3, help='captures per page')
+    parser.add_argument('--page-delay', type=int, default=300, help='Project.page_delay (ms)')
+    parser.add_argument('--scroll-delay', type=int, default=20, help='Project.scroll_delay (ms)')
+    parser.add_argument('--timeout', type=int, default=60000, help='Project.timeout (ms)')
+    parser.add_argument('--slow-ms', type=int, default=1500, help='response time of the /slow page')
+    parser.add_argument('--engine', default='playwright', choices=('playwright', 'selenium'),
+                        help='capture engine to measure')
+    parser.add_argument('--skip-capture', action='store_true', help='mockups only, on synthetic screenshots')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='baseline JSON to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs the baseline (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    screenshot_service = ScreenshotService()
+    mockup_service = MockupService()
+    devices = []
+    for device_type in args.devices.split(','):
+        device_name = next(iter(screenshot_service.device_configs[device_type]))
+        devices.append((device_name, screenshot_service.device_configs[device_type][device_name], device_type))
+
+    site = FixtureSite(slow_ms=args.slow_ms).start()
+    sampler = RSSSampler().start()
+    work_dir = tempfile.mkdtemp(prefix='capture_bench_')
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'engine': args.engine,
+            'repeat': args.repeat,
+            'page_delay': args.page_delay,
+            'scroll_delay': args.scroll_delay,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'pages': {},
+    }
+    try:
+        start = time.perf_counter()
+        mockup_service.load_templates()
+        report['template_load'] = stats([time.perf_counter() - start])
+
+        if not args.skip_capture:
+            start = time.perf_counter()
+            try:
+                if args.engine == 'playwright':
+                    screenshot_service.start_browser()
+                else:
+                    screenshot_service.engine(args.engine).start()
+                report['browser_launch'] = stats([time.perf_counter() - start])
+            except Exception as e:
+                report['browser_launch'] = None
+                report['meta']['browser_error'] = str(e).splitlines()[0]
+                print(f'Chromium unavailable ({report["meta"]["browser_error"]}); using synthetic screenshots')
+                args.skip_capture = True
+
+        for page in args.pages.split(','):
+            print(f'{page}...', flush=True)
+            report['pages'][page] = bench_page(
+                page, site, screenshot_service, mockup_service, devices, args, sampler, work_dir
+            )
+    finally:
+        screenshot_service.close_browser()
+        sampler.stop()
+        site.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report['peak_rss_mb'] = mb(sampler.overall_peak)
+
+    print(f"\n{'page':<11}{'device':<9}{'capture ms':>12}{'mockup ms':>11}{'original KB':>13}{'mockup KB':>11}{'RSS MB':>8}")
+    for page, result in report['pages'].items():
+        for device_type, d in result['devices'].items():
+            capture = d['capture']['median_ms'] if d['capture'] else '-'
+            mockup = d['mockup']['median_ms'] if d['mockup'] else '-'
+            original_kb = round(d['original_bytes'] / 1024) if d.get('original_bytes') else '-'
+            mockup_kb = round(d['mockup_bytes'] / 1024) if d.get('mockup_bytes') else '-'
+            print(f"{page:<11}{device_type:<9}{capture:>12}{mockup:>11}{original_kb:>13}{mockup_kb:>11}"
+                  f"{result['peak_rss_mb']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for phase, before, after in regressions:
+            print(f'REGRESSION {phase}: {before} ms -> {after} ms')
+        if regressions:
+            sys.exit(1)
+        print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+"""
+Screenshot persistence / listing benchmark.
+
+Creates a throwaway test database (same engine as settings: sqlite, or
+PostgreSQL when DATABASE_URL is set), fills it with --rows screenshots and
+measures:
+  * insert throughput: per-row Screenshot.objects.create vs the per-task
+    bulk_create inside one transaction used by generate_screenshots
+  * listing latency for the real access patterns (project page, per-device,
+    creator filter, keyset pages) together with the query plan
+
+    python benchmarks/db_bench.py --rows 1000000 --json bench_db.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'screenshot_generator.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from screenshots.listing import encode_cursor, keyset_page  # noqa: E402
+from screenshots.models import Project, Screenshot  # noqa: E402
+from screenshots.signals import adjust_screenshot_counter  # noqa: E402
+
+DEVICES = [('mobile', 'iPhone 12', 390, 844), ('tablet', 'iPad Pro', 1024, 1366), ('desktop', 'MacBook Pro', 1440, 900)]
+
+
+def populate(rows, per_project, creators):
+    """Fill the DB quickly with rows screenshots spread over rows/per_project projects"""
+    now = timezone.now()
+    project_count = max(1, rows // per_project)
+
+    projects = [
+        Project(name=f'bench {i}', website_url=f'https://site{i}.example', creator_id=str(i % creators),
+                creator_name=f'user{i % creators}')
+        for i in range(project_count)
+    ]
+    Project.objects.bulk_create(projects, batch_size=5000)
+    project_ids = list(Project.objects.values_list('id', flat=True))
+
+    batch = []
+    for n in range(rows):
+        device_type, device_name, width, height = DEVICES[n % 3]
+        batch.append(Screenshot(
+            project_id=project_ids[n // per_project % len(project_ids)],
+            device_type=device_type, device_name=device_name, width=width, height=height,
+            original_path=f'users_projects/bench/{n}.png', mockup_path=f'users_projects/bench/mockup_{n}.webp',
+        ))
+        if len(batch) == 10000:
+            Screenshot.objects.bulk_create(batch)
+            batch = []
+            print(f'  ... {n + 1} rows', end='\r', flush=True)
+    Screenshot.objects.bulk_create(batch)
+
+    # spread created_at so ordering is realistic (auto_now_add stamps whole batches alike);
+    # blocks of 1000 rows share a timestamp so the id tie-breaker is exercised too
+    first_id = Screenshot.objects.order_by('id').values_list('id', flat=True).first() or 0
+    for block, offset in enumerate(range(0, rows, 1000)):
+        Screenshot.objects.filter(id__gte=first_id + offset, id__lt=first_id + offset + 1000).update(
+            created_at=now - timedelta(seconds=rows // 1000 - block)
+        )
+    print()
+    return project_ids
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {
+        'median_ms': round(statistics.median(samples) * 1000, 3),
+        'p95_ms': round(sorted(samples)[max(0, int(len(samples) * 0.95) - 1)] * 1000, 3),
+    }
+
+
+def explain(queryset):
+    try:
+        return queryset.explain()
+    except Exception as e:
+        return f'n/a ({e})'
+
+
+def bench_inserts(project_ids, tasks):
+    """Persist `tasks` x 3 devices with both strategies"""
+    def make(project_id, device):
+        device_type, device_name, width, height = device
+        return Screenshot(project_id=project_id, device_type=device_type, device_name=device_name,
+                          width=width, height=height, original_path='x.png', mockup_path='x.webp')
+
+    results = {}
+
+    start = time.perf_counter()
+    for _ in range(tasks):
+        project_id = random.choice(project_ids)
+        for device in DEVICES:
+            make(project_id, device).save()
+    elapsed = time.perf_counter() - start
+    results['create_per_row'] = {'rows_per_s': round(tasks * 3 / elapsed, 1), 'seconds': round(elapsed, 3)}
+
+    start = time.perf_counter()
+    for _ in range(tasks):
+        project_id = random.choice(project_ids)
+        with transaction.atomic():
+            Screenshot.objects.bulk_create([make(project_id, device) for device in DEVICES])
+            adjust_screenshot_counter(project_id, 3)
+    elapsed = time.perf_counter() - start
+    results['bulk_create_per_task'] = {'rows_per_s': round(tasks * 3 / elapsed, 1), 'seconds': round(elapsed, 3)}
+
+    return results
+
+
+def bench_listing(project_ids, creators, repeat):
+    project_id = random.choice(project_ids)
+    creator_id = str(random.randrange(creators))
+
+    # cursor halfway through the global list
+    middle = Screenshot.objects.order_by('-created_at', '-id')[Screenshot.objects.count() // 2]
+    cursor = encode_cursor(middle)
+
+    patterns = {
+        'project_page': lambda: list(Screenshot.objects.filter(project_id=project_id).order_by('-created_at')),
+        'project_device_latest': lambda: Screenshot.objects.filter(
+            project_id=project_id, device_type='mobile').order_by('-created_at').first(),
+        'screenshots_first_page': lambda: keyset_page(Screenshot.objects.all(), None, 50),
+        'screenshots_deep_page': lambda: keyset_page(Screenshot.objects.all(), cursor, 50),
+        'projects_by_creator': lambda: keyset_page(Project.objects.filter(creator_id=creator_id), None, 50),
+        'projects_with_counts': lambda: keyset_page(Project.objects.with_screenshot_count(), None, 50),
+    }
+
+    plans = {
+        'project_page': Screenshot.objects.filter(project_id=project_id).order_by('-created_at'),
+        'project_device_latest': Screenshot.objects.filter(project_id=project_id, device_type='mobile').order_by('-created_at'),
+        'projects_by_creator': Project.objects.filter(creator_id=creator_id).order_by('-created_at', '-id'),
+    }
+
+    results = {}
+    for name, func in patterns.items():
+        results[name] = timed(func, repeat)
+        if name in plans:
+            results[name]['plan'] = explain(plans[name])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='screenshot rows to create')
+    parser.add_argument('--per-project', type=int, default=30, help='screenshots per project')
+    parser.add_argument('--creators', type=int, default=500, help='distinct creator ids')
+    parser.add_argument('--insert-tasks', type=int, default=500, help='simulated tasks for the insert benchmark')
+    parser.add_argument('--repeat', type=int, default=50, help='repetitions per listing query')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    old_name = connection.settings_dict['NAME']
+    # migrations are applied, so the benchmark always runs against the current indexes
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+    try:
+        print(f'Populating {args.rows} screenshots on {connection.vendor}...')
+        start = time.perf_counter()
+        project_ids = populate(args.rows, args.per_project, args.creators)
+        report = {
+            'vendor': connection.vendor,
+            'rows': args.rows,
+            'populate_seconds': round(time.perf_counter() - start, 1),
+            'inserts': bench_inserts(project_ids, args.insert_tasks),
+            'listing': bench_listing(project_ids, args.creators, args.repeat),
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""
+Local fixture website for the capture benchmarks.
+
+Serves deterministic pages that exercise what makes real captures slow,
+without touching the network:
+
+  /short        one viewport of text
+  /tall         ~12 000 px of sections
+  /very-tall    ~40 000 px of sections (full-page rasterisation / encoding cost)
+  /lazy         60 lazy-loaded images, each served with a delay
+  /fonts        web fonts with font-display: block, served with a delay
+  /animated     CSS animations, a JS ticker and an autoplaying canvas
+  /slow         the HTML itself takes --slow-ms to arrive
+
+    site = FixtureSite(slow_ms=1500).start()
+    site.url('/tall')
+    site.stop()
+"""
+import glob
+import io
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image, ImageDraw
+
+PAGES = ('short', 'tall', 'very-tall', 'lazy', 'fonts', 'animated', 'slow')
+
+STYLE = """
+body { margin: 0; font-family: sans-serif; }
+section { padding: 40px; border-bottom: 1px solid #ddd; }
+section:nth-child(odd) { background: #f4f6fb; }
+h1 { margin-top: 0; }
+"""
+
+LOREM = ("Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor incididunt ut labore "
+         "et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud exercitation ullamco laboris. ")
+
+
+def _sections(count, height):
+    return ''.join(
+        f'<section style="min-height:{height}px"><h1>Section {i}</h1><p>{LOREM * 4}</p></section>'
+        for i in range(count)
+    )
+
+
+def _page(title, body, head=''):
+    return (f'<!doctype html><html><head><meta charset="utf-8"><title>{title}</title>'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+            f'<style>{STYLE}</style>{head}</head><body>{body}</body></html>')
+
+
+def _png(width, height, seed):
+    image = Image.new('RGB', (width, height), ((seed * 53) % 255, (seed * 97) % 255, (seed * 151) % 255))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, width, 24):
+        draw.line([(x, 0), (width - x, height)], fill=(255, 255, 255), width=2)
+    buf = io.BytesIO()
+    image.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def _font_bytes():
+    # any TTF on the machine will do; the point is the delayed download
+    for path in glob.glob('/usr/share/fonts/**/*.ttf', recursive=True):
+        with open(path, 'rb') as f:
+            return f.read()
+    return b'\0' * 20000
+
+
+class FixtureSite:
+    """Threaded HTTP server for the fixture pages"""
+
+    def __init__(self, host='127.0.0.1', port=0, slow_ms=1500, asset_delay_ms=150):
+        self.slow_ms = slow_ms
+        self.asset_delay_ms = asset_delay_ms
+        self._images = [_png(640, 400, i) for i in range(8)]
+        self._font = _font_bytes()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def url(self, path='/'):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}{path}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ---------------------------
+    # ✅ PAGES
+    # ---------------------------
+    def render(self, name):
+        if name == 'short':
+            return _page('Short', _sections(1, 300))
+        if name == 'tall':
+            return _page('Tall', _sections(20, 600))
+        if name == 'very-tall':
+            return _page('Very tall', _sections(64, 620))
+        if name == 'lazy':
+            images = ''.join(
+                f'<section><img loading="lazy" width="640" height="400" '
+                f'src="/img/{i % len(self._images)}.png?n={i}&delay={self.asset_delay_ms}"></section>'
+                for i in range(60)
+            )
+            return _page('Lazy images', images)
+        if name == 'fonts':
+            head = ''.join(
+                f"<style>@font-face {{ font-family: 'Fixture{i}'; font-display: block; "
+                f"src: url('/font/{i}.ttf?delay={self.asset_delay_ms * 2}'); }} "
+                f".f{i} {{ font-family: 'Fixture{i}', serif; }}</style>"
+                for i in range(4)
+            )
+            body = ''.join(f'<section class="f{i % 4}"><h1>Font {i % 4}</h1><p>{LOREM * 3}</p></section>' for i in range(12))
+            return _page('Web fonts', body, head)
+        if name == 'animated':
+            head = ('<style>@keyframes spin { to { transform: rotate(360deg); } } '
+                    '.spin { width: 120px; height: 120px; background: #36c; animation: spin 1s linear infinite; } '
+                    '.fade { animation: fade 2s ease-in-out infinite alternate; } '
+                    '@keyframes fade { from { opacity: .2; } to { opacity: 1; } }</style>')
+            body = ('<section><div class="spin"></div><h1 class="fade">Animated</h1><p id="tick">0</p>'
+                    '<canvas id="c" width="600" height="300"></canvas></section>' + _sections(10, 500) +
+                    '<script>let n = 0; setInterval(() => { document.getElementById("tick").textContent = ++n; }, 16);'
+                    'const ctx = document.getElementById("c").getContext("2d");'
+                    '(function draw(t) { ctx.fillStyle = `hsl(${t / 10 % 360},70%,50%)`; ctx.fillRect(0, 0, 600, 300);'
+                    ' requestAnimationFrame(draw); })(0);</script>')
+            return _page('Animated', body, head)
+        if name == 'slow':
+            time.sleep(self.slow_ms / 1000)
+            return _page('Slow', _sections(6, 500))
+        return None
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                delay = int(query.get('delay', ['0'])[0])
+                if delay:
+                    time.sleep(delay / 1000)
+
+                parts = parsed.path.strip('/').split('/')
+                body, content_type = None, 'text/html; charset=utf-8'
+                if parts[0] == 'img' and len(parts) == 2:
+                    body, content_type = site._images[int(parts[1].split('.')[0]) % len(site._images)], 'image/png'
+                elif parts[0] == 'font':
+                    body, content_type = site._font, 'font/ttf'
+                else:
+                    html = site.render(parts[0] or 'short')
+                    body = html.encode() if html is not None else None
+
+                if body is None:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
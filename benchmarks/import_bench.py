@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Web process import-time benchmark.
+
+Starts fresh interpreters that load the app the way a gunicorn worker does
+(django.setup() through the WSGI module, then the URLconf, which imports every
+view) and reports, per scenario, the median wall time and peak RSS plus which
+browser-automation packages ended up in sys.modules:
+
+  web          what a web worker imports
+  web+engines  the same plus every capture engine's libraries, i.e. what a web
+               worker paid while the backends were imported by services.py
+  worker       a Celery worker with the configured engines (CAPTURE_ENGINES)
+
+    python benchmarks/import_bench.py --repeat 7 --json bench_imports.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# packages a web worker should never need
+HEAVY_MODULES = ('playwright', 'selenium', 'webdriver_manager', 'requests')
+
+# third-party libraries behind the capture engines
+ENGINE_LIBRARIES = ('playwright.sync_api', 'selenium.webdriver', 'webdriver_manager.chrome', 'requests')
+
+PROBE = r'''
+import importlib, json, os, resource, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'screenshot_generator.settings')
+for name in sys.argv[1].split(','):
+    if name:
+        importlib.import_module(name)
+if sys.argv[2] == 'worker':
+    from screenshots.worker import make_screenshot_service
+    service = make_screenshot_service()
+    for engine in service.engine_names:
+        service.engine(engine)
+seconds = time.perf_counter() - started
+maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'seconds': seconds,
+    'maxrss_kb': maxrss // 1024 if sys.platform == 'darwin' else maxrss,
+    'modules': len(sys.modules),
+    'heavy': sorted({m.split('.')[0] for m in sys.modules} & set(sys.argv[3].split(','))),
+}))
+'''
+
+SCENARIOS = {
+    'web': ('screenshot_generator.wsgi', 'screenshot_generator.urls'),
+    'web+engines': ('screenshot_generator.wsgi', 'screenshot_generator.urls') + ENGINE_LIBRARIES,
+    'worker': ('screenshot_generator.wsgi', 'screenshot_generator.celery', 'screenshots.tasks'),
+}
+
+
+def probe(modules, mode):
+    out = subprocess.run(
+        [sys.executable, '-c', PROBE, ','.join(modules), mode, ','.join(HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench(name, repeat):
+    modules = SCENARIOS[name]
+    mode = 'worker' if name == 'worker' else 'web'
+    probe(modules, mode)  # warm the filesystem / bytecode caches
+    samples = [probe(modules, mode) for _ in range(repeat)]
+    return {
+        'seconds': round(statistics.median(s['seconds'] for s in samples), 4),
+        'maxrss_mb': round(statistics.median(s['maxrss_kb'] for s in samples) / 1024, 1),
+        'modules': samples[-1]['modules'],
+        'heavy': samples[-1]['heavy'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='run only these scenarios (default: all)')
+    parser.add_argument('--json', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        results[name] = bench(name, args.repeat)
+        r = results[name]
+        print(f"{name:<12} {r['seconds'] * 1000:8.1f} ms  {r['maxrss_mb']:7.1f} MB  "
+              f"{r['modules']:5} modules  heavy: {', '.join(r['heavy']) or '-'}")
+
+    if 'web' in results and 'web+engines' in results:
+        web, eager = results['web'], results['web+engines']
+        print(f"\nweb worker saves {(eager['seconds'] - web['seconds']) * 1000:.1f} ms and "
+              f"{eager['maxrss_mb'] - web['maxrss_mb']:.1f} MB per process")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'repeat': args.repeat, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
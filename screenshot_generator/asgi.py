@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'screenshot_generator.settings')
+# serve the enqueue / status API with the async views (see screenshots.async_views)
+os.environ.setdefault('ASYNC_API_VIEWS', '1')
 
 application = get_asgi_application()
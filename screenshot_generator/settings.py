@@ -10,24 +10,106 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 # Redis broker + backend
-CELERY_BROKER_URL = 'redis://localhost:6379/0'
-CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
 
 # optional: task results expire in 1 hour
 CELERY_TASK_RESULT_EXPIRES = 3600
 
+# periodic tasks (run `celery -A screenshot_generator beat`)
+CELERY_BEAT_SCHEDULE = {
+    'collect-orphan-media': {
+        'task': 'screenshots.tasks.collect_orphan_media',
+        'schedule': 3600.0,
+    },
+    'run-capture-schedules': {
+        'task': 'screenshots.tasks.run_capture_schedules',
+        'schedule': 60.0,
+    },
+}
+
+# recurring captures (screenshots.scheduling): shortest allowed interval (minutes), most jitter
+# added per run, projects of one domain captured per browser session, due projects taken per tick
+SCHEDULE_MIN_INTERVAL = 15
+SCHEDULE_JITTER_SECONDS = 300
+SCHEDULE_BATCH_SIZE = 10
+SCHEDULE_DISPATCH_LIMIT = 500
+
+# multi-page projects (screenshots.pages): most pages per run, pages captured at once in the shared
+# browser context, and sitemap fetching limits (timeout in seconds, size, nested index levels)
+SITE_MAX_PAGES = 500
+SITE_CAPTURE_CONCURRENCY = int(os.getenv('SITE_CAPTURE_CONCURRENCY', '4'))
+SITEMAP_TIMEOUT = 15
+SITEMAP_MAX_BYTES = 10 * 1024 * 1024
+SITEMAP_MAX_NESTING = 3
+SITEMAP_ALLOW_PRIVATE = False   # allow localhost / private network sitemap URLs
+
+# two-phase results: generate_screenshots first saves a quick above-the-fold preview per device
+# (downscaled by PREVIEW_SCALE, JPEG quality PREVIEW_QUALITY), then replaces it with the full capture
+CAPTURE_PREVIEW = os.getenv('CAPTURE_PREVIEW', 'true').lower() == 'true'
+PREVIEW_SCALE = 0.5
+PREVIEW_QUALITY = 60
+
+# logged-in captures (screenshots.auth): Fernet key encrypting login recipes and cached sessions
+# (defaults to one derived from SECRET_KEY), longest reuse of a session (seconds, shortened to the
+# first cookie expiry), and how long one sign-in may take before another process tries its own
+LOGIN_STATE_KEY = os.environ.get('LOGIN_STATE_KEY')
+LOGIN_STATE_TTL = 12 * 3600
+LOGIN_TIMEOUT = 60
+
+# orphaned media garbage collector: files removed per run, and minimum file age
+MEDIA_GC_BATCH_SIZE = 500
+MEDIA_GC_GRACE_SECONDS = 3600
+
+# webhook deliveries run on their own queue so slow endpoints never delay captures
+# (`celery -A screenshot_generator worker -Q webhooks`)
+CELERY_TASK_ROUTES = {
+    'screenshots.tasks.deliver_webhooks': {'queue': 'webhooks'},
+}
+
+# completion webhooks (screenshots.webhooks): signing secret (defaults to SECRET_KEY),
+# coalescing window, batch size, HTTP timeout / pool size and retry backoff
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET')
+WEBHOOK_ALLOW_PRIVATE = False   # allow localhost / private network webhook URLs
+WEBHOOK_COALESCE_SECONDS = 2
+WEBHOOK_BATCH_SIZE = 50
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_POOL_SIZE = 10
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_RETRY_BASE_SECONDS = 10
+WEBHOOK_RETRY_MAX_SECONDS = 3600
+
+# report STARTED so the status endpoint can tell queued tasks from running ones
+CELERY_TASK_TRACK_STARTED = True
+
+# task progress stream (Server-Sent Events)
+TASK_EVENTS_POLL_INTERVAL = 1.0   # seconds between result backend reads
+TASK_EVENTS_HEARTBEAT = 15.0      # seconds of silence before a keep-alive comment
+TASK_EVENTS_MAX_DURATION = int(os.environ.get('TASK_EVENTS_MAX_DURATION', 600))  # seconds before the stream gives up
+
+# worker warm-up (imports, services, mockup templates, Chromium) on process start
+WORKER_WARMUP = True
+WORKER_WARMUP_BROWSER = True
+
+# keep Project.screenshot_counter in sync on screenshot create/delete
+# (run `manage.py recount_screenshots` after re-enabling)
+SCREENSHOT_COUNTER_ENABLED = True
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-import os
 SECRET_KEY = os.environ.get('SESSION_SECRET', 'django-insecure-q0d^@ftrk1v!xkr7^t-@yu21jndu76b3#ma53l1iyo122fbw5%')
 
 # SECURITY WARNING: don't run with debug turned on in production!
@@ -95,7 +177,7 @@ DATABASES = {
 } if os.environ.get('DATABASE_URL') else {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
@@ -143,10 +225,137 @@ STATICFILES_DIRS = [
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media delivery (screenshots.media.serve_media)
+#   None       -> Django streams the file (Range / ETag / Last-Modified supported)
+#   'nginx'    -> X-Accel-Redirect to MEDIA_ACCEL_PREFIX, e.g.
+#                 location /protected-media/ { internal; alias /path/to/media/; }
+#   'sendfile' -> X-Sendfile with the absolute path (Apache mod_xsendfile, lighttpd)
+MEDIA_ACCEL = os.environ.get('MEDIA_ACCEL') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# per-creator storage quota in bytes (None = unlimited), optional {creator_id: bytes} overrides;
+# eviction brings an over-quota creator down to STORAGE_QUOTA_TARGET_RATIO of the quota
+STORAGE_QUOTA_BYTES = int(os.environ['STORAGE_QUOTA_BYTES']) if os.environ.get('STORAGE_QUOTA_BYTES') else None
+STORAGE_QUOTA_OVERRIDES = {}
+STORAGE_QUOTA_TARGET_RATIO = 0.9
+# served files record their access time at most this often (seconds)
+STORAGE_ACCESS_TOUCH_INTERVAL = 300
+
 # Custom settings
 SCREENSHOT_ROOT = BASE_DIR / 'users'
 
+# Screenshots and mockups are stored by content hash under MEDIA_ROOT/cas/
+# (screenshots.storage.ContentAddressedStorage, reference counted by Artifact rows)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'artifacts': {
+        'BACKEND': 'screenshots.storage.ContentAddressedStorage',
+    },
+}
+
+# Cache (page / API response cache, shared metrics and login sessions)
+# must be shared by the web process and the Celery workers: the Redis of the Celery
+# broker by default, CACHE_REDIS_URL for another one, or CACHE_FILE_DIR for a single-host
+# file cache. CACHE_LOCMEM=1 keeps a per-process cache, for a single process only
+# (tests always use it); an implicit locmem cache logs an error at startup
+CACHE_LOCMEM = TESTING or bool(os.environ.get('CACHE_LOCMEM'))
+if os.environ.get('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_REDIS_URL'],
+        }
+    }
+elif os.environ.get('CACHE_FILE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['CACHE_FILE_DIR'],
+        }
+    }
+elif not CACHE_LOCMEM and CELERY_BROKER_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CELERY_BROKER_URL,
+            # keeps cache keys apart from the broker's own
+            'KEY_PREFIX': 'screenshots',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'screenshot-generator',
+        }
+    }
+
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_ALIAS = 'default'
+# workers can't invalidate a per-process locmem cache, so keep entries short-lived there
+RESPONSE_CACHE_TIMEOUT = 30 if CACHES['default']['BACKEND'].endswith('LocMemCache') else 300
+# metrics live in this cache; point it at the shared Redis so /metrics aggregates every worker
+METRICS_CACHE_ALIAS = 'default'
+# prefix of the Prometheus metric names served at /metrics
+METRICS_NAMESPACE = 'screenshots'
+# when set, /metrics requires "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# synchronous "capture now" endpoint (screenshots.live): warm browsers per web process,
+# default / maximum time budget and how many requests may wait for a free browser
+LIVE_CAPTURE_POOL_SIZE = 2
+LIVE_CAPTURE_MAX_QUEUE = 4
+LIVE_CAPTURE_BUDGET_MS = 8000
+LIVE_CAPTURE_MAX_BUDGET_MS = 15000
+LIVE_CAPTURE_MAX_DELAY_MS = 2000
+LIVE_CAPTURE_INITIAL_ESTIMATE = 2.0  # seconds, until real captures have been timed
+LIVE_CAPTURE_ALLOW_PRIVATE = False   # allow localhost / private network URLs
+
+# capture engines (screenshots.engines) tried in order until one succeeds:
+# playwright, selenium, screenshotone, placeholder; each is imported on first use only
+CAPTURE_ENGINES = [name.strip() for name in os.environ.get('CAPTURE_ENGINES', 'playwright,screenshotone').split(',')
+                   if name.strip()]
+# per-engine circuit breakers (screenshots.health): after ENGINE_FAILURE_THRESHOLD failed captures
+# in a row an engine is skipped for ENGINE_RESET_SECONDS, then one capture probes it again
+ENGINE_CIRCUIT_BREAKER = True
+ENGINE_FAILURE_THRESHOLD = 5
+ENGINE_RESET_SECONDS = 60
+ENGINE_PROBE_SECONDS = 300  # a probe that never reports back frees the slot after this long
+
+# ScreenshotOne engine: API key (unset = the engine fails every capture), concurrent requests per capture, per-request timeout (s),
+# attempts on 429 / 5xx / connection errors, first backoff (s) and optional price per credit
+SCREENSHOTONE_KEY = os.environ.get('SCREENSHOTONE_KEY')
+SCREENSHOTONE_CONCURRENCY = 3
+SCREENSHOTONE_TIMEOUT = 90
+SCREENSHOTONE_MAX_ATTEMPTS = 4
+SCREENSHOTONE_RETRY_BASE_SECONDS = 1.0
+SCREENSHOTONE_CREDIT_PRICE = None
+
+# memory guardrails (screenshots.memory): full-page captures are clipped to CAPTURE_MAX_PIXELS,
+# a mockup decodes at most MOCKUP_MAX_PIXELS of its screenshot, Pillow refuses images over
+# IMAGE_MAX_PIXELS (its decompression-bomb check) and a prefork worker child whose RSS passed
+# WORKER_MAX_RSS_MB is replaced after its current task
+CAPTURE_MAX_PIXELS = 1920 * 16384
+MOCKUP_MAX_PIXELS = 25_000_000
+IMAGE_MAX_PIXELS = 120_000_000
+WORKER_MAX_RSS_MB = int(os.environ.get('WORKER_MAX_RSS_MB', 1500))
+CELERY_WORKER_MAX_MEMORY_PER_CHILD = WORKER_MAX_RSS_MB * 1024  # KB
+
+# {"profile": true} on a generate request runs it under cProfile + tracemalloc (screenshots.profiling);
+# how many hotspots / allocation sites the summary lists and how many frames tracemalloc keeps
+CAPTURE_PROFILING_ENABLED = os.environ.get('CAPTURE_PROFILING_ENABLED', '1') == '1'
+CAPTURE_PROFILE_TOP = 20
+CAPTURE_PROFILE_FRAMES = 10
+
+# serve the enqueue / status API with async views (set by screenshot_generator.asgi)
+ASYNC_API_VIEWS = os.environ.get('ASYNC_API_VIEWS') == '1'
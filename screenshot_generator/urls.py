@@ -17,13 +17,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+
+from screenshots.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('screenshots.urls')),
+    # media goes through an access check, then X-Accel-Redirect / X-Sendfile or a ranged stream
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media'),
 ]
-
-# Serve media files during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,41 @@
+# screenshots/addresses.py
+"""
+Outbound requests to user-supplied URLs (live captures, webhooks).
+
+A URL is public when its host resolves to public addresses only: private,
+loopback, link-local (cloud metadata), reserved and multicast ranges are
+refused. Callers check again right before each request, redirects included,
+so a redirect or a DNS answer that changed since validation can't reach the
+internal network.
+"""
+import ipaddress
+import socket
+from urllib.parse import urlparse
+
+
+def is_private_ip(address):
+    ip = ipaddress.ip_address(address.split('%')[0])
+    return ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved or ip.is_multicast
+
+
+def check_public_url(url):
+    """Raise ValueError unless url is http(s) and its host resolves to public addresses only"""
+    parsed = urlparse(url or '')
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError('is not an http(s) URL')
+    try:
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        addresses = {info[4][0] for info in socket.getaddrinfo(parsed.hostname, port)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise ValueError('host does not resolve')
+    if any(is_private_ip(address) for address in addresses):
+        raise ValueError('points at a private address')
+    return url
+
+
+def is_public_url(url):
+    try:
+        check_public_url(url)
+    except ValueError:
+        return False
+    return True
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Project, Screenshot
+from .models import Artifact, CaptureProfile, Project, Screenshot, StorageUsage, WebhookDelivery
 
 
 @admin.register(Project)
@@ -7,19 +7,52 @@ class ProjectAdmin(admin.ModelAdmin):
     list_display = ('name', 'website_url', 'screenshot_count', 'creator_id', 'creator_name','created_at', 'updated_at')
     list_filter = ('created_at', 'updated_at', 'creator_name')
     search_fields = ('name', 'website_url')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'next_capture_at')
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_screenshot_count()
+
     def screenshot_count(self, obj):
         return obj.screenshot_count
     screenshot_count.short_description = 'Screenshots'
+    screenshot_count.admin_order_field = 'num_screenshots'
 
 
 @admin.register(Screenshot)
 class ScreenshotAdmin(admin.ModelAdmin):
     list_display = ('device_name', 'device_type', 'project', 'width', 'height', 'created_at')
     list_filter = ('device_type', 'created_at', 'project')
-    search_fields = ('device_name', 'project__name')
+    search_fields = ('device_name', 'project__name', 'page_url')
     readonly_fields = ('created_at',)
     
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('project')
\ No newline at end of file
+        return super().get_queryset(request).select_related('project')
+
+
+@admin.register(Artifact)
+class ArtifactAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'ref_count', 'created_at')
+    search_fields = ('name',)
+    readonly_fields = ('name', 'size', 'ref_count', 'created_at')
+
+
+@admin.register(StorageUsage)
+class StorageUsageAdmin(admin.ModelAdmin):
+    list_display = ('creator_id', 'bytes', 'files', 'updated_at')
+    search_fields = ('creator_id',)
+    readonly_fields = ('creator_id', 'bytes', 'files', 'updated_at')
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('event', 'url', 'status', 'attempts', 'next_attempt_at', 'created_at', 'delivered_at')
+    list_filter = ('status', 'event')
+    search_fields = ('url',)
+    readonly_fields = ('created_at', 'delivered_at', 'claimed_at')
+
+
+@admin.register(CaptureProfile)
+class CaptureProfileAdmin(admin.ModelAdmin):
+    list_display = ('project', 'task_id', 'created_at')
+    search_fields = ('task_id',)
+    readonly_fields = ('cpu_path', 'summary_path', 'json_path', 'summary', 'created_at')
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ScreenshotsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'screenshots'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401  (connects model signal handlers)
+
+        metrics.check_shared_cache()
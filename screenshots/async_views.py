@@ -0,0 +1,199 @@
+# screenshots/async_views.py
+"""
+Async versions of the enqueue, status and capture-now API for ASGI deployments.
+
+Same URLs, parameters and responses as the views in screenshots.views;
+screenshots.urls routes to these when ASYNC_API_VIEWS is on (the default
+under screenshot_generator.asgi). Database access goes through the async
+ORM, and the blocking work that has no async API (publishing to the Celery
+broker, reading the result backend, cache I/O) runs in a worker thread so
+the event loop keeps serving other requests. Task progress streams sleep
+on the event loop instead of holding a thread each.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+
+from . import live
+from .caching import acached, list_key, project_key
+from .listing import ListParamError, akeyset_page, conditional_json
+from .models import Project, Screenshot
+from .tasks import generate_screenshots, regenerate_single_screenshot
+from .worker import get_screenshot_service
+from .views import (
+    TaskEventStream, parse_generate_data, parse_project_data, project_created_response, project_list_data,
+    project_list_query, screenshot_list_data, screenshot_list_query, task_payload,
+)
+
+
+async def enqueue(task, *args, **kwargs):
+    """Publish a Celery task without blocking the event loop; returns the AsyncResult"""
+    return await sync_to_async(task.delay, thread_sensitive=False)(*args, **kwargs)
+
+
+async def atask_payload(task_id):
+    return await sync_to_async(task_payload, thread_sensitive=False)(task_id)
+
+
+async def acached_list_response(request, view, key_func, build):
+    """Async cached_list_response(): key_func builds the generation-aware cache key"""
+    key = await sync_to_async(key_func, thread_sensitive=False)()
+    try:
+        data, last_modified = await acached(view, key, build)
+    except ListParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return conditional_json(request, data, last_modified=last_modified)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ProjectAPIView(View):
+    """Async API view for listing and creating projects"""
+
+    async def get(self, request):
+        """List projects, newest first (?cursor=, ?limit=, ?creator_id=, ?fields=)"""
+        async def build():
+            projects, fields, limit = project_list_query(request)
+            page, next_cursor = await akeyset_page(projects, request.GET.get('cursor'), limit)
+            return project_list_data(page, next_cursor, fields)
+
+        return await acached_list_response(request, 'api_projects', lambda: list_key('api_projects', request), build)
+
+    async def post(self, request):
+        """Create a new project"""
+        try:
+            # webhook_url validation resolves its host: keep the DNS lookup off the event loop
+            data = await sync_to_async(parse_project_data, thread_sensitive=False)(request.body)
+            if data is None:
+                return JsonResponse({'error': 'Name and website_url are required'}, status=400)
+
+            project = await Project.objects.acreate(**data)
+            return project_created_response(project)
+
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except ValidationError as e:
+            return JsonResponse({'error': e.messages[0]}, status=400)
+        except Exception as e:
+            logging.error(f"Error creating project: {str(e)}")
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ScreenshotAPIView(View):
+    """Async API view for listing and generating a project's screenshots"""
+
+    async def get(self, request, project_id):
+        """List this project's screenshots"""
+        async def build():
+            project = await aget_object_or_404(Project, id=project_id)
+            queryset, fields, limit = screenshot_list_query(request, project.screenshots.all())
+            page, next_cursor = await akeyset_page(queryset, request.GET.get('cursor'), limit)
+            return screenshot_list_data(page, next_cursor, fields)
+
+        return await acached_list_response(
+            request, 'api_project_screenshots',
+            lambda: project_key('api_project_screenshots', project_id, request), build,
+        )
+
+    async def post(self, request, project_id):
+        try:
+            project = await aget_object_or_404(Project, id=project_id)
+            devices, options = await sync_to_async(parse_generate_data, thread_sensitive=False)(request.body)
+
+            task = await enqueue(generate_screenshots, project.id, devices, **options)
+
+            return JsonResponse({
+                "message": "Screenshots task queued",
+                "task_id": task.id
+            })
+
+        except ValidationError as e:
+            return JsonResponse({'error': e.messages[0]}, status=400)
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def regenerate_screenshot(request, screenshot_id):
+    """Regenerate an individual screenshot + mockup"""
+    screenshot = await aget_object_or_404(Screenshot, id=screenshot_id, project__deleted_at__isnull=True)
+    try:
+        task = await enqueue(regenerate_single_screenshot, screenshot.id)
+
+        return JsonResponse({
+            "message": f"Regeneration queued for screenshot {screenshot.id}",
+            "task_id": task.id
+        })
+
+    except Exception as e:
+        logging.error(f"Error queuing regeneration for screenshot {screenshot_id}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+async def task_status(request, task_id):
+    """Return the current state (and progress) of a queued task"""
+    try:
+        return JsonResponse(await atask_payload(task_id))
+    except Exception as e:
+        logging.error(f"Error reading task {task_id}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+async def _task_event_stream(task_id):
+    """Async generator of Server-Sent Events, see views._task_event_stream"""
+    stream = TaskEventStream(task_id)
+
+    yield "retry: 3000\n\n"
+    while not stream.expired():
+        payload = await atask_payload(task_id)
+        event = stream.event_for(payload)
+        if event:
+            yield event
+        if payload['ready']:
+            return
+        await asyncio.sleep(stream.interval)
+
+    yield stream.timeout_event()
+
+
+@require_http_methods(["GET"])
+async def task_events(request, task_id):
+    """Stream task progress to the browser as Server-Sent Events"""
+    response = StreamingHttpResponse(_task_event_stream(task_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # ✅ disable nginx buffering so events arrive immediately
+    return response
+
+
+@require_http_methods(["GET"])
+async def capture_now(request):
+    """Capture a URL right now and return the image bytes, see views.capture_now"""
+    started_at = time.monotonic()
+    try:
+        options = await sync_to_async(live.parse_capture_request, thread_sensitive=False)(
+            request.GET, get_screenshot_service().device_configs
+        )
+        future = live.get_pool().submit(options)
+    except live.CaptureParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except live.CaptureRejected as e:
+        return live.rejected_response(e, started_at)
+
+    try:
+        # the capture runs on the pool's thread; only the wait happens here
+        result = await asyncio.wait_for(asyncio.wrap_future(future), options['budget'] / 1000)
+    except Exception as e:
+        return live.failed_response(e, started_at, future)
+    return live.image_response(result, options, started_at)
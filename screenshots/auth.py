@@ -0,0 +1,213 @@
+# screenshots/auth.py
+"""
+Logged-in captures.
+
+A project's login recipe signs in with a real browser:
+
+    {"url": "https://example.com/login",
+     "steps": [{"fill": "#email", "value": "me@example.com"},
+               {"fill": "#password", "value": "..."},
+               {"click": "button[type=submit]"},
+               {"wait_for": "#dashboard"}],
+     "logged_in_selector": "#account-menu"}
+
+Steps are fill (+ value), click, press (+ key), wait_for (a selector) and
+wait (ms). The resulting Playwright storage_state (cookies + localStorage) is
+cached encrypted and every capture context of the project starts from it, so
+the sign-in runs once per LOGIN_STATE_TTL (or until the first cookie expires)
+instead of once per capture.
+
+A capture whose page lacks logged_in_selector (or, without one, lands back on
+the login url) calls LoginSession.refresh(): one process signs in again while
+the others wait for its state, and a capture refreshes at most once, however
+many devices or pages it has.
+
+The recipe holds credentials, so it is stored encrypted too; both use
+LOGIN_STATE_KEY (a Fernet key), else a key derived from SECRET_KEY.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+STEP_ACTIONS = {'fill': 'value', 'click': None, 'press': 'key', 'wait_for': None, 'wait': None}
+
+
+def _secret():
+    return (getattr(settings, 'LOGIN_STATE_KEY', None) or settings.SECRET_KEY).encode()
+
+
+def _fernet():
+    # imported on first use, like the capture engines: most web requests never encrypt anything
+    from cryptography.fernet import Fernet
+
+    key = getattr(settings, 'LOGIN_STATE_KEY', None)
+    if not key:
+        key = base64.urlsafe_b64encode(hashlib.sha256(b'login-state:' + settings.SECRET_KEY.encode()).digest())
+    return Fernet(key)
+
+
+def encrypt(data):
+    return _fernet().encrypt(json.dumps(data).encode()).decode()
+
+
+def decrypt(token):
+    """The data encrypt() was given, or None if the token can't be read (e.g. the key changed)"""
+    from cryptography.fernet import InvalidToken
+
+    try:
+        return json.loads(_fernet().decrypt(token.encode()))
+    except (InvalidToken, ValueError):
+        return None
+
+
+def _cache():
+    return caches[getattr(settings, 'LOGIN_STATE_CACHE_ALIAS', 'default')]
+
+
+# ---------------------------
+# ✅ RECIPES
+# ---------------------------
+def recipe_of(project):
+    """The project's decrypted login recipe, or None"""
+    if not project or not project.login_recipe:
+        return None
+    return decrypt(project.login_recipe)
+
+
+def clean_login_recipe(data, project):
+    """Apply login_recipe from request data to project, encrypted (raises ValueError)"""
+    if 'login_recipe' not in data:
+        return
+    recipe = data['login_recipe']
+    if not recipe:
+        project.login_recipe = ''
+        return
+
+    if not isinstance(recipe, dict) or not isinstance(recipe.get('url'), str) \
+            or not recipe['url'].startswith(('http://', 'https://')):
+        raise ValueError('login_recipe needs the http(s) url of the login page')
+    steps = recipe.get('steps')
+    if not isinstance(steps, list) or not steps:
+        raise ValueError('login_recipe needs a list of steps')
+    for step in steps:
+        actions = [action for action in STEP_ACTIONS if isinstance(step, dict) and action in step]
+        if len(actions) != 1:
+            raise ValueError(f"each login step needs exactly one of {', '.join(STEP_ACTIONS)}")
+        argument = STEP_ACTIONS[actions[0]]
+        if argument and not isinstance(step.get(argument), str):
+            raise ValueError(f'a {actions[0]} step needs a {argument}')
+    selector = recipe.get('logged_in_selector')
+    if selector is not None and not isinstance(selector, str):
+        raise ValueError('logged_in_selector must be a CSS selector')
+
+    project.login_recipe = encrypt({'url': recipe['url'], 'steps': steps, 'logged_in_selector': selector})
+
+
+def login_session(project, sign_in):
+    """A LoginSession for the project's captures, or None when it has no login recipe"""
+    recipe = recipe_of(project)
+    if recipe is None:
+        return None
+    return LoginSession(project.id, recipe, sign_in)
+
+
+# ---------------------------
+# ✅ CACHED STORAGE STATE
+# ---------------------------
+def state_ttl(state, now=None):
+    """Seconds a storage_state may be reused: LOGIN_STATE_TTL, or less if a cookie expires sooner"""
+    now = now or time.time()
+    ttl = getattr(settings, 'LOGIN_STATE_TTL', 12 * 3600)
+    expiries = [cookie['expires'] for cookie in state.get('cookies', []) if cookie.get('expires', -1) > 0]
+    if expiries:
+        # a minute of margin, so no capture starts with a cookie about to lapse
+        ttl = min(ttl, min(expiries) - now - 60)
+    return max(int(ttl), 60)
+
+
+class LoginSession:
+    """storage_state of one project's login, shared by every context of one capture (or crawl)
+
+    sign_in(recipe) runs the recipe in a browser and returns the storage_state;
+    the capture engines call state(), refresh(), and read login_url / logged_in_selector.
+    """
+
+    def __init__(self, project_id, recipe, sign_in):
+        self.recipe = recipe
+        self.login_url = recipe['url']
+        self.logged_in_selector = recipe.get('logged_in_selector')
+        self._sign_in = sign_in
+        fingerprint = hmac.new(_secret(), json.dumps(recipe, sort_keys=True).encode(), 'sha256').hexdigest()[:16]
+        # a changed recipe gets a new key: the state it produced before is never used again
+        self._key = f'login-state:{project_id}:{fingerprint}'
+        self._state = None
+        self._refreshed = False
+        self._lock = threading.Lock()
+
+    def _cached(self):
+        token = _cache().get(self._key)
+        return decrypt(token) if token else None
+
+    def state(self):
+        """The cached storage_state, signing in first when there is none"""
+        with self._lock:
+            if self._state is None:
+                self._state = self._cached()
+                metrics.incr('login_state_cache', outcome='hit' if self._state else 'miss')
+                if self._state is None:
+                    self._state = self._login()
+            return self._state
+
+    def refresh(self):
+        """A capture found itself signed out: sign in again, once; later calls get that same state"""
+        with self._lock:
+            if not self._refreshed:
+                self._refreshed = True
+                logging.info(f"[Login] {self._key}: session is stale, signing in again")
+                self._state = self._login(stale=self._state)
+            return self._state
+
+    def _login(self, stale=None):
+        """Sign in, unless another process is already doing it: then wait for its state"""
+        cache = _cache()
+        timeout = getattr(settings, 'LOGIN_TIMEOUT', 60)
+        lock_key = f'{self._key}:lock'
+        deadline = time.monotonic() + timeout
+        locked = cache.add(lock_key, os.getpid(), timeout)
+        while not locked:
+            time.sleep(0.5)
+            current = self._cached()
+            if current and current != stale:
+                return current
+            if time.monotonic() > deadline:
+                break  # the other sign-in is stuck; do our own
+            locked = cache.add(lock_key, os.getpid(), timeout)
+
+        try:
+            current = self._cached()
+            if current and current != stale:
+                return current  # signed in by another capture while we took the lock
+            started = time.perf_counter()
+            try:
+                state = self._sign_in(self.recipe)
+            except Exception:
+                metrics.incr('login_sign_ins', outcome='failure')
+                raise
+            metrics.incr('login_sign_ins', outcome='success')
+            metrics.observe('login_sign_in_seconds', time.perf_counter() - started)
+            cache.set(self._key, encrypt(state), state_ttl(state))
+            logging.info(f"[Login] {self._key}: signed in, {len(state.get('cookies', []))} cookie(s) cached")
+            return state
+        finally:
+            if locked:
+                cache.delete(lock_key)
@@ -0,0 +1,129 @@
+# screenshots/caching.py
+"""
+Read-through cache for project pages and list APIs.
+
+Keys embed a generation number: one per project and one for the lists.
+Invalidating just bumps the generation, so every variant (pagination
+cursor, ?fields=, filters...) of the old data becomes unreachable at once
+and expires on its own.
+"""
+import hashlib
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+
+LIST_SCOPE = 'list'
+
+_MISS = object()
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def cache_enabled():
+    return getattr(settings, 'RESPONSE_CACHE_ENABLED', True)
+
+
+def _generation(scope):
+    cache = _cache()
+    key = f'pages:gen:{scope}'
+    cache.add(key, 1, None)
+    return cache.get(key, 1)
+
+
+def _bump(scope):
+    cache = _cache()
+    key = f'pages:gen:{scope}'
+    try:
+        cache.incr(key)
+    except ValueError:
+        # never read yet (or evicted): any new value differs from what cached keys used
+        cache.set(key, 2, None)
+
+
+def _variant(request):
+    """Distinguish responses of the same view by their query string"""
+    query = request.GET.urlencode() if request is not None else ''
+    return hashlib.md5(query.encode()).hexdigest() if query else '-'
+
+
+def list_key(view, request=None):
+    return f'pages:{LIST_SCOPE}:{_generation(LIST_SCOPE)}:{view}:{_variant(request)}'
+
+
+def project_key(view, project_id, request=None):
+    return f'pages:project:{project_id}:{_generation(project_id)}:{view}:{_variant(request)}'
+
+
+def _lookup(view, key):
+    """Cached value for key (or _MISS), counted as a hit / miss"""
+    try:
+        value = _cache().get(key, _MISS)
+    except Exception as e:
+        logging.warning(f"[Cache] Read failed for {key}: {e}")
+        value = _MISS
+    metrics.incr('response_cache_requests', result='miss' if value is _MISS else 'hit', view=view)
+    return value
+
+
+def _store(key, value):
+    if value is None:
+        return
+    try:
+        _cache().set(key, value, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+    except Exception as e:
+        logging.warning(f"[Cache] Write failed for {key}: {e}")
+
+
+def cached(view, key, build):
+    """Return the cached value for key, or build(), store and return it (None is never cached)"""
+    if not cache_enabled():
+        return build()
+
+    value = _lookup(view, key)
+    if value is _MISS:
+        value = build()
+        _store(key, value)
+    return value
+
+
+async def acached(view, key, build):
+    """cached() for async views: build is a coroutine function, cache I/O runs off the event loop"""
+    if not cache_enabled():
+        return await build()
+
+    value = await sync_to_async(_lookup, thread_sensitive=False)(view, key)
+    if value is _MISS:
+        value = await build()
+        await sync_to_async(_store, thread_sensitive=False)(key, value)
+    return value
+
+
+def invalidate_project(project_id):
+    """Drop every cached page/API response that shows this project"""
+    try:
+        _bump(project_id)
+        _bump(LIST_SCOPE)
+        metrics.incr('response_cache_invalidations')
+    except Exception as e:
+        logging.warning(f"[Cache] Invalidation failed for project {project_id}: {e}")
+
+
+def cache_stats():
+    """Hit / miss counts per view from the shared metrics"""
+    stats = {}
+    for entry in metrics.snapshot():
+        if entry['name'] != 'response_cache_requests':
+            continue
+        view_stats = stats.setdefault(entry['labels'].get('view'), {'hit': 0, 'miss': 0})
+        view_stats[entry['labels'].get('result')] = int(entry['value'])
+
+    for view_stats in stats.values():
+        total = view_stats['hit'] + view_stats['miss']
+        view_stats['hit_ratio'] = round(view_stats['hit'] / total, 3) if total else None
+    return stats
@@ -0,0 +1,123 @@
+# screenshots/cleanup.py
+"""
+File removal that should never run inside a web request:
+purging soft-deleted projects and garbage-collecting orphaned media.
+"""
+import logging
+import os
+import shutil
+import time
+
+from django.conf import settings
+
+from .models import Artifact, Project, Screenshot
+from .storage import CAS_PREFIX, artifact_path, is_artifact
+
+# legacy (pre content-addressed) captures live in these folders of media/users_projects
+LEGACY_ROOT = 'users_projects'
+LEGACY_FOLDERS = ('normal_screenshots', 'mockup_screenshots')
+
+QUERY_CHUNK = 500
+
+
+def purge_project(project_id):
+    """Delete a soft-deleted project's rows and files"""
+    project = Project.all_objects.filter(id=project_id).first()
+    if project is None:
+        return False
+
+    project_folder = project.get_project_folder()
+    # cascades to the screenshots; their artifact references are released by signals
+    project.delete()
+
+    if os.path.exists(project_folder):
+        shutil.rmtree(project_folder, ignore_errors=True)
+    logging.info(f"[Cleanup] Purged project {project_id}")
+    return True
+
+
+def remove_legacy_files(paths):
+    """Remove legacy media files that no screenshot row points at any more"""
+    removed = 0
+    for path in paths:
+        if not path or is_artifact(path):
+            continue
+        if Screenshot.objects.filter(original_path=path).exists() or Screenshot.objects.filter(mockup_path=path).exists():
+            continue
+        full_path = artifact_path(path)
+        try:
+            os.remove(full_path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logging.warning(f"[Cleanup] Could not remove {full_path}: {e}")
+    return removed
+
+
+def _media_candidates(grace_seconds):
+    """Yield MEDIA_ROOT-relative paths of files the GC is allowed to consider"""
+    media_root = str(settings.MEDIA_ROOT)
+    cutoff = time.time() - grace_seconds
+
+    for top in (CAS_PREFIX, LEGACY_ROOT):
+        for dirpath, dirnames, filenames in os.walk(os.path.join(media_root, top)):
+            dirnames.sort()
+            if top == LEGACY_ROOT and os.path.basename(dirpath) not in LEGACY_FOLDERS:
+                continue
+            for filename in sorted(filenames):
+                full_path = os.path.join(dirpath, filename)
+                try:
+                    # files still being written / not yet recorded are left alone
+                    if os.path.getmtime(full_path) > cutoff:
+                        continue
+                except OSError:
+                    continue
+                yield os.path.relpath(full_path, media_root).replace('\\', '/')
+
+
+def _referenced(paths):
+    """The subset of paths that still have an Artifact row or Screenshot pointing at them"""
+    cas = [p for p in paths if is_artifact(p) and not os.path.basename(p).startswith('.tmp-')]
+    legacy = [p for p in paths if not is_artifact(p)]
+
+    referenced = set(Artifact.objects.filter(name__in=cas).values_list('name', flat=True))
+    referenced |= set(Screenshot.objects.filter(original_path__in=legacy).values_list('original_path', flat=True))
+    referenced |= set(Screenshot.objects.filter(mockup_path__in=legacy).values_list('mockup_path', flat=True))
+    return referenced
+
+
+def collect_orphans(batch_size=None, grace_seconds=None, dry_run=False):
+    """Delete up to batch_size media files that no row references; returns what was (or would be) removed"""
+    batch_size = batch_size or getattr(settings, 'MEDIA_GC_BATCH_SIZE', 500)
+    if grace_seconds is None:
+        grace_seconds = getattr(settings, 'MEDIA_GC_GRACE_SECONDS', 3600)
+
+    removed = []
+    chunk = []
+
+    def flush():
+        referenced = _referenced(chunk)
+        for path in chunk:
+            if path in referenced or len(removed) >= batch_size:
+                continue
+            if not dry_run:
+                try:
+                    os.remove(artifact_path(path))
+                except OSError as e:
+                    logging.warning(f"[Cleanup] Could not remove {path}: {e}")
+                    continue
+            removed.append(path)
+        chunk.clear()
+
+    for path in _media_candidates(grace_seconds):
+        chunk.append(path)
+        if len(chunk) >= QUERY_CHUNK:
+            flush()
+        if len(removed) >= batch_size:
+            break
+    if chunk and len(removed) < batch_size:
+        flush()
+
+    logging.info(f"[Cleanup] {'Found' if dry_run else 'Removed'} {len(removed)} orphaned media file(s)")
+    return removed
@@ -0,0 +1,151 @@
+# screenshots/engines/__init__.py
+"""
+Capture engines (Playwright, Selenium, ScreenshotOne, placeholder).
+
+Each engine lives in its own module and is only imported when a
+ScreenshotService first uses it, so processes that never capture (the web
+workers) don't load Playwright, Selenium or webdriver_manager. Which engines
+run, and in what order, comes from CAPTURE_ENGINES.
+
+Kept free of Django like timing.py; settings are read by screenshots.worker.
+"""
+import importlib
+import logging
+import os
+from urllib.parse import urlsplit
+
+# name -> "module.Class" inside this package
+ENGINES = {
+    'playwright': 'playwright.PlaywrightEngine',
+    'selenium': 'selenium.SeleniumEngine',
+    'screenshotone': 'screenshotone.ScreenshotOneEngine',
+    'placeholder': 'placeholder.PlaceholderEngine',
+}
+
+# tried in order; devices an engine couldn't capture go to the next one
+DEFAULT_ENGINES = ('playwright', 'screenshotone')
+
+# engines that run somewhere else: their health is shared by every host (screenshots.health)
+REMOTE_ENGINES = ('screenshotone',)
+
+
+def engine_class(name):
+    """Import and return the engine class registered as name"""
+    try:
+        path = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown capture engine {name!r} (choose from {', '.join(ENGINES)})") from None
+    module, _, attr = path.rpartition('.')
+    return getattr(importlib.import_module(f'.{module}', __name__), attr)
+
+
+def capture_options(project):
+    """Delays and timeouts (ms) for a capture: the project's values, else the defaults"""
+    # ✅ Use DB values if available, else fallback to hardcoded defaults
+    page_delay = project.page_delay if project and project.page_delay else 1000
+    scroll_delay = project.scroll_delay if project and project.scroll_delay else 50
+    timeout = project.timeout if project and project.timeout else 120000
+    return {
+        'page_delay': page_delay,
+        'scroll_delay': scroll_delay,
+        'timeout': timeout,
+        'navigation_timeout': timeout + 40000,  # ✅ derived value
+    }
+
+
+def same_page(url, other):
+    """Whether two URLs point at the same page (query, fragment and trailing slash ignored)"""
+    a, b = urlsplit(url), urlsplit(other)
+    return (a.scheme, a.netloc, a.path.rstrip('/')) == (b.scheme, b.netloc, b.path.rstrip('/'))
+
+
+def origin_of(url):
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+
+def page_folder(output_folder, index):
+    """Folder of one page's screenshots in a multi-page capture (created if missing)"""
+    folder = os.path.join(output_folder, f'page_{index:04d}')
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+class Engine:
+    """Base class: capture(url, devices, ...) returns one result dict per device"""
+
+    name = None
+    # whether capture() honours options['preview'] (quick above-the-fold captures)
+    supports_preview = False
+    # whether capture() starts from options['login'] (a signed-in browser state); engines that
+    # can't are skipped for projects with a login recipe rather than capture the signed-out page
+    supports_login = False
+
+    def __init__(self, max_capture_pixels=None):
+        # ✅ memory budget: full-page captures are clipped to this many pixels (None = no limit)
+        self.max_capture_pixels = max_capture_pixels
+
+    def capture(self, url, devices, output_folder, options, progress_callback=None):
+        """Capture devices (list of (device_name, config, device_type)) into output_folder
+
+        options come from capture_options(), plus 'login' for logged-in captures (a
+        screenshots.auth.LoginSession: engines that can, start from its state()) and
+        'preview' ({'scale', 'quality'}) for phase-one previews (see supports_preview);
+        progress_callback (optional) is called with each device result as soon as it is saved
+        """
+        raise NotImplementedError
+
+    def capture_pages(self, urls, devices, output_folder, options, concurrency=1):
+        """Capture devices on every page of urls; yields (index, results) as each page finishes
+
+        Each page's files go to page_folder(output_folder, index). This default
+        captures one page after another; engines able to share a browser between
+        pages override it.
+        """
+        for index, url in enumerate(urls):
+            yield index, self.capture(url, devices, page_folder(output_folder, index), options)
+
+    def close(self):
+        """Release anything the engine keeps between captures"""
+
+    def clip_height(self, width, page_height):
+        """Height a full-page capture may have within max_capture_pixels, plus what was cut"""
+        if not self.max_capture_pixels:
+            return page_height, []
+        max_height = max(1, self.max_capture_pixels // width)
+        if page_height <= max_height:
+            return page_height, []
+        logging.warning(f"[{self.name}] Page is {page_height}px tall, capturing the top {max_height}px")
+        return max_height, [{
+            'kind': 'truncated',
+            'detail': f'page is {width}x{page_height}, captured the top {width}x{max_height} '
+                      f'(CAPTURE_MAX_PIXELS {self.max_capture_pixels})',
+        }]
+
+    def filepath(self, output_folder, device_name, config):
+        """(filename, path) of a device's screenshot"""
+        safe_device_name = device_name.replace(" ", "_").lower()
+        filename = f"{safe_device_name}_{config['width']}x{config['height']}.png"
+        return filename, os.path.join(output_folder, filename)
+
+    def success(self, path, filename, device_name, config, device_type, **extra):
+        return {
+            'success': True,
+            'path': path,
+            'device_name': device_name,
+            'width': config['width'],
+            'height': config['height'],
+            'filename': filename,
+            'device_type': device_type,
+            'source': self.name,
+            **extra,
+        }
+
+    def failure(self, error, device_name, device_type):
+        return {
+            'success': False,
+            'error': str(error),
+            'device_name': device_name,
+            'device_type': device_type,
+            'source': self.name,
+        }
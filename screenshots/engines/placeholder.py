@@ -0,0 +1,71 @@
+# screenshots/engines/placeholder.py
+"""Placeholder images, for when no browser or API is available (development, demos)"""
+import logging
+
+from PIL import Image, ImageDraw, ImageFont
+
+from ..timing import PhaseTimer
+from . import Engine
+
+
+class PlaceholderEngine(Engine):
+    """Create a placeholder screenshot when browsers are unavailable"""
+
+    name = 'placeholder'
+
+    def capture(self, url, devices, output_folder, options, progress_callback=None):
+        results = []
+        for device_name, config, device_type in devices:
+            timer = PhaseTimer()
+            try:
+                filename, filepath = self.filepath(output_folder, device_name, config)
+                with timer.phase('rasterization'):
+                    img = self.render(url, device_name, config)
+                with timer.phase('save'):
+                    img.save(filepath, 'PNG')
+
+                logging.info(f"Placeholder screenshot created: {filepath}")
+                result = self.success(filepath, filename, device_name, config, device_type, timings=timer.take())
+            except Exception as e:
+                logging.error(f"Error creating placeholder screenshot: {str(e)}")
+                result = self.failure(e, device_name, device_type)
+
+            results.append(result)
+            if progress_callback:
+                progress_callback(result)
+        return results
+
+    def render(self, url, device_name, config):
+        # Create placeholder image
+        img = Image.new('RGB', (config['width'], config['height']), color='#f0f0f0')
+        draw = ImageDraw.Draw(img)
+
+        try:
+            font = ImageFont.load_default()
+        except Exception:
+            font = None
+
+        # Draw placeholder content
+        text_lines = [
+            "Screenshot Placeholder",
+            "",
+            f"Device: {device_name}",
+            f"Resolution: {config['width']}x{config['height']}",
+            f"URL: {url}",
+            "",
+            "This is a placeholder image.",
+            "In production, this would be a",
+            "real screenshot of the website."
+        ]
+
+        y = 50
+        for line in text_lines:
+            text_bbox = draw.textbbox((0, 0), line, font=font)
+            text_width = text_bbox[2] - text_bbox[0]
+            x = (config['width'] - text_width) // 2
+            draw.text((x, y), line, fill='#333333', font=font)
+            y += 30
+
+        # Add a border
+        draw.rectangle([10, 10, config['width']-10, config['height']-10], outline='#cccccc', width=2)
+        return img
@@ -0,0 +1,552 @@
+# screenshots/engines/playwright.py
+"""Playwright (headless Chromium): the primary engine, and the warm browser used by live captures"""
+import asyncio
+import io
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urljoin
+
+from PIL import Image
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright
+
+from ..timing import PhaseTimer
+from . import Engine, origin_of, page_folder, same_page
+
+CHROMIUM_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-accelerated-2d-canvas',
+    '--no-first-run',
+    '--no-zygote',
+    '--disable-gpu',
+    '--single-process',
+]
+
+# end of a crawl, on the results queue
+_DONE = object()
+
+# restores the localStorage entries of a storage_state origin into the current page
+SET_LOCAL_STORAGE = "items => items.forEach(item => localStorage.setItem(item.name, item.value))"
+
+
+def guard_requests(context, allow_url):
+    """Abort every request of context whose URL allow_url refuses, redirect targets included
+
+    Requests are fetched here without following redirects, so each hop is checked
+    before the browser makes it (Chromium doesn't route the hops of a redirect it
+    follows itself).
+    """
+    def handle(route):
+        url = route.request.url
+        if not allow_url(url):
+            logging.warning(f"[Playwright] Blocked request to {url}")
+            route.abort('blockedbyclient')
+            return
+        try:
+            response = route.fetch(max_redirects=0)
+        except Exception:
+            route.abort('failed')
+            return
+        location = response.headers.get('location')
+        if 300 <= response.status < 400 and location and not allow_url(urljoin(url, location)):
+            logging.warning(f"[Playwright] Blocked redirect from {url} to {location}")
+            route.abort('blockedbyclient')
+            return
+        route.fulfill(response=response)
+
+    context.route('**/*', handle)
+
+
+class PlaywrightEngine(Engine):
+    """Capture multiple devices in one Playwright session"""
+
+    name = 'playwright'
+    supports_preview = True
+    supports_login = True
+
+    def __init__(self, max_capture_pixels=None):
+        super().__init__(max_capture_pixels)
+        # long-lived browser, only set once start_browser() is called
+        self._playwright = None
+        self._browser = None
+        self._browser_thread = None
+        # set inside session(): captures open pages in this context instead of their own
+        self._shared_context = None
+        # (thread, browser) of the capture in progress: sign_in() reuses it from that thread
+        self._in_use = None
+
+    def capture(self, url, devices, output_folder, options, progress_callback=None):
+        # logged-in captures get a context of their own: a shared one would hand the cookies to other projects
+        if self._shared_context is not None and not options.get('login'):
+            logging.info("[Playwright] Using the shared session")
+            return self._capture_in_context(self._shared_context, url, devices, output_folder, options,
+                                            progress_callback, shared=True)
+
+        # ✅ Reuse the warm per-process browser when the worker started one
+        browser = self._warm_browser()
+        if browser is not None:
+            logging.info("[Playwright] Using warm Chromium")
+            return self._capture_in_browser(browser, url, devices, output_folder, options, progress_callback)
+
+        logging.info("[Playwright] Launching Chromium...")
+        with sync_playwright() as p:
+            browser = self._launch_chromium(p)
+            previous, self._in_use = self._in_use, (threading.get_ident(), browser)
+            try:
+                return self._capture_in_browser(browser, url, devices, output_folder, options, progress_callback)
+            finally:
+                self._in_use = previous
+                browser.close()
+                logging.info("[Playwright] Browser closed")
+
+    def _capture_clip(self, page, width):
+        """Screenshot options that keep a full-page capture within max_capture_pixels, plus what was cut"""
+        if not self.max_capture_pixels:
+            return {}, []
+        return self._clip(width, page.evaluate("document.documentElement.scrollHeight"))
+
+    def _clip(self, width, page_height):
+        height, guardrails = self.clip_height(width, page_height)
+        if not guardrails:
+            return {}, []
+        return {'clip': {'x': 0, 'y': 0, 'width': width, 'height': height}}, guardrails
+
+    def _launch_chromium(self, playwright):
+        """Launch headless Chromium with the flags used for every capture"""
+        return playwright.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+
+    def _capture_in_browser(self, browser, url, devices, output_folder, options, progress_callback=None):
+        """Capture every device in a fresh context of an already running browser"""
+        login = options.get('login')
+        context = browser.new_context(storage_state=login.state() if login else None)
+        return self._capture_in_context(context, url, devices, output_folder, options, progress_callback)
+
+    def _capture_in_context(self, context, url, devices, output_folder, options, progress_callback=None,
+                            shared=False):
+        """Capture every device in one page of context (closed afterwards unless shared)"""
+        results = []
+        timeout = options['timeout']
+
+        logging.info("[Playwright] Chromium Creating a Page")
+        page = context.new_page()
+        logging.info("[Playwright] Page Created")
+        # ✅ set global timeouts
+        # ✅ get the timeout from project db through variables
+        page.set_default_timeout(timeout)
+        page.set_default_navigation_timeout(options['navigation_timeout'])
+
+        # ✅ per-phase timings, attached to each device result
+        timer = PhaseTimer()
+        try:
+            # ✅ Load page
+            logging.info(f"[Playwright] Navigating to {url}")
+            with timer.phase('navigation'):
+                page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+            login = options.get('login')
+            if login and self._signed_out(page, login):
+                with timer.phase('login'):
+                    self._sign_in_again(page, url, login, timeout)
+            if options.get('preview'):
+                # ✅ phase one: no delays, no scrolling, just what is above the fold
+                for device in devices:
+                    result = self._capture_preview(page, device, output_folder, options['preview'], timer)
+                    results.append(result)
+                    if progress_callback:
+                        progress_callback(result)
+                return results
+
+            # buffer delay for initial animations, gotten from db
+            with timer.phase('page_delay'):
+                page.wait_for_timeout(options['page_delay'])  # ✅ user-configurable - can change
+
+            for device_name, config, device_type in devices:
+                logging.info(f"[Playwright] Switching to device {device_name} , To Capture Screenshot")
+                with timer.phase('viewport'):
+                    # ✅ Adjust viewport for device
+                    page.set_viewport_size({
+                        "width": config["width"],
+                        "height": config["height"]
+                    })
+
+                    # small pause after viewport change
+                    page.wait_for_timeout(1000)
+
+                with timer.phase('scrolling'):
+                    # ✅ Scroll step-by-step to trigger lazy-load / animations
+                    logging.info(f" → Scrolling to each section of this website : To capture each step/section and combine later")
+                    scroll_height = page.evaluate("document.body.scrollHeight")
+                    for pos in range(0, scroll_height, config["height"] // 2):
+                        page.evaluate(f"window.scrollTo(0, {pos})")
+                        # delay per scroll section of the website
+                        page.wait_for_timeout(options['scroll_delay'])
+
+                    # ✅ Scroll back to top before screenshot
+                    page.evaluate("window.scrollTo(0, 0)")
+                    # back to top delay
+                    page.wait_for_timeout(500)
+
+                    # lazy content may have grown the page while scrolling
+                    clip, guardrails = self._capture_clip(page, config['width'])
+
+                # ✅ Save screenshot
+                filename, filepath = self.filepath(output_folder, device_name, config)
+
+                logging.info(f"[Playwright] Taking screenshot → {filename}")
+                with timer.phase('rasterization'):
+                    image = page.screenshot(
+                        full_page=True,
+                        type="png",
+                        timeout=timeout,
+                        animations="disabled",
+                        caret="hide",
+                        **clip
+                    )
+                with timer.phase('save'):
+                    with open(filepath, 'wb') as f:
+                        f.write(image)
+
+                logging.info(f"[Playwright] ✅ Screenshot saved: {filename}")
+                result = self.success(filepath, filename, device_name, config, device_type,
+                                      timings=timer.take(), guardrails=guardrails)
+                results.append(result)
+                if progress_callback:
+                    progress_callback(result)
+
+            logging.info("[Playwright] All screenshots complete ✅")
+
+        except Exception as e:
+            logging.error(f"[Playwright] ❌ Error: {str(e)}", exc_info=True)
+            # ✅ report the devices that weren't captured instead of dropping them
+            for device_name, config, device_type in devices[len(results):]:
+                result = self.failure(e, device_name, device_type)
+                results.append(result)
+                if progress_callback:
+                    progress_callback(result)
+
+        finally:
+            if shared:
+                page.close()
+            else:
+                context.close()
+
+        return results
+
+    def _capture_preview(self, page, device, output_folder, preview, timer):
+        """Above-the-fold JPEG of one device, downscaled by preview['scale']"""
+        device_name, config, device_type = device
+        with timer.phase('viewport'):
+            page.set_viewport_size({"width": config["width"], "height": config["height"]})
+        with timer.phase('rasterization'):
+            image = page.screenshot(type="jpeg", quality=preview['quality'], animations="disabled", caret="hide")
+
+        filename, filepath = self.filepath(output_folder, device_name, config)
+        filename, filepath = filename[:-len('.png')] + '_preview.jpg', filepath[:-len('.png')] + '_preview.jpg'
+        with timer.phase('save'):
+            with Image.open(io.BytesIO(image)) as im:
+                im = im.convert('RGB')
+                im.thumbnail((max(1, int(im.width * preview['scale'])), max(1, int(im.height * preview['scale']))))
+                im.save(filepath, 'JPEG', quality=preview['quality'])
+
+        logging.info(f"[Playwright] ✅ Preview saved: {filename}")
+        return self.success(filepath, filename, device_name, config, device_type, timings=timer.take())
+
+    # ---------------------------
+    # ✅ LOGIN (see screenshots.auth)
+    # ---------------------------
+    def sign_in(self, recipe, timeout=60000):
+        """Run a login recipe in a fresh context and return its storage_state (cookies + localStorage)"""
+        browser = self._thread_browser()
+        if browser is not None:
+            return self._run_recipe(browser, recipe, timeout)
+        with sync_playwright() as p:
+            browser = self._launch_chromium(p)
+            try:
+                return self._run_recipe(browser, recipe, timeout)
+            finally:
+                browser.close()
+
+    def _thread_browser(self):
+        """A running sync browser this thread may drive (the sync API is bound to its thread)"""
+        if self._in_use and self._in_use[0] == threading.get_ident():
+            return self._in_use[1]
+        if self._warm_browser() is not None and self._browser_thread == threading.get_ident():
+            return self._browser
+        return None
+
+    def _run_recipe(self, browser, recipe, timeout):
+        logging.info(f"[Playwright] Signing in at {recipe['url']}")
+        context = browser.new_context()
+        try:
+            page = context.new_page()
+            page.set_default_timeout(timeout)
+            page.goto(recipe['url'], wait_until="domcontentloaded")
+            for step in recipe['steps']:
+                if 'fill' in step:
+                    page.fill(step['fill'], step['value'])
+                elif 'click' in step:
+                    page.click(step['click'])
+                elif 'press' in step:
+                    page.press(step['press'], step['key'])
+                elif 'wait_for' in step:
+                    page.wait_for_selector(step['wait_for'])
+                elif 'wait' in step:
+                    page.wait_for_timeout(step['wait'])
+            page.wait_for_load_state("domcontentloaded")
+            if recipe.get('logged_in_selector'):
+                page.wait_for_selector(recipe['logged_in_selector'])
+            return context.storage_state()
+        finally:
+            context.close()
+
+    def _signed_out(self, page, login):
+        if login.logged_in_selector:
+            return page.query_selector(login.logged_in_selector) is None
+        return same_page(page.url, login.login_url)
+
+    def _sign_in_again(self, page, url, login, timeout):
+        """The stored session is stale: refresh it (once per capture), load it into the context and reload"""
+        state = login.refresh()
+        page.context.clear_cookies()
+        page.context.add_cookies(state.get('cookies', []))
+        for origin in state.get('origins', []):
+            if origin['origin'] == origin_of(page.url):
+                page.evaluate(SET_LOCAL_STORAGE, origin['localStorage'])
+        page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+        if self._signed_out(page, login):
+            raise RuntimeError('still signed out after signing in again (check the login recipe)')
+
+    # ---------------------------
+    # ✅ MULTI-PAGE CRAWL (one browser context, pages captured concurrently)
+    # ---------------------------
+    def capture_pages(self, urls, devices, output_folder, options, concurrency=1):
+        """Capture up to concurrency pages at a time in one browser context; yields (index, results)
+
+        The sync API drives one page at a time, so the crawl runs on the async
+        API in its own thread and event loop. Results come back through a queue:
+        the caller (and its database writes) stays in this thread.
+        """
+        finished = queue.Queue()
+        stop = threading.Event()
+        # signing in drives a sync browser, so it happens here rather than in the crawl's event loop
+        login = options.get('login')
+        state = login.state() if login else None
+
+        def run():
+            try:
+                asyncio.run(self._crawl(urls, devices, output_folder, options, concurrency, finished.put, stop,
+                                        state))
+            except BaseException as e:
+                finished.put(e)
+            finally:
+                finished.put(_DONE)
+
+        thread = threading.Thread(target=run, name='playwright-crawl', daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = finished.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()  # the caller stopped early: pages not started yet are skipped
+            thread.join()
+
+    async def _crawl(self, urls, devices, output_folder, options, concurrency, emit, stop, state=None):
+        logging.info(f"[Playwright] Crawling {len(urls)} page(s), {concurrency} at a time...")
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+            try:
+                # ✅ one context: connections, HTTP cache and cookies are shared by every page
+                context = await browser.new_context(storage_state=state)
+                slots = asyncio.Semaphore(max(1, concurrency))
+
+                async def capture(index, url):
+                    async with slots:
+                        if stop.is_set():
+                            return
+                        folder = page_folder(output_folder, index)
+                        emit((index, await self._capture_page(context, url, devices, folder, options)))
+
+                await asyncio.gather(*(capture(index, url) for index, url in enumerate(urls)))
+            finally:
+                await browser.close()
+                logging.info("[Playwright] Crawl browser closed")
+
+    async def _capture_page(self, context, url, devices, output_folder, options):
+        """Async twin of _capture_in_context, for one page of a crawl"""
+        results = []
+        timeout = options['timeout']
+        page = await context.new_page()
+        page.set_default_timeout(timeout)
+        page.set_default_navigation_timeout(options['navigation_timeout'])
+
+        timer = PhaseTimer()
+        try:
+            logging.info(f"[Playwright] Navigating to {url}")
+            with timer.phase('navigation'):
+                await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+            login = options.get('login')
+            if login and await self._signed_out_async(page, login):
+                with timer.phase('login'):
+                    # refresh() blocks (and may drive a sync browser): run it off the event loop
+                    state = await asyncio.to_thread(login.refresh)
+                    await context.clear_cookies()
+                    await context.add_cookies(state.get('cookies', []))
+                    for origin in state.get('origins', []):
+                        if origin['origin'] == origin_of(page.url):
+                            await page.evaluate(SET_LOCAL_STORAGE, origin['localStorage'])
+                    await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+                    if await self._signed_out_async(page, login):
+                        raise RuntimeError('still signed out after signing in again (check the login recipe)')
+            with timer.phase('page_delay'):
+                await page.wait_for_timeout(options['page_delay'])
+
+            for device_name, config, device_type in devices:
+                with timer.phase('viewport'):
+                    await page.set_viewport_size({"width": config["width"], "height": config["height"]})
+                    await page.wait_for_timeout(1000)
+
+                with timer.phase('scrolling'):
+                    scroll_height = await page.evaluate("document.body.scrollHeight")
+                    for pos in range(0, scroll_height, config["height"] // 2):
+                        await page.evaluate(f"window.scrollTo(0, {pos})")
+                        await page.wait_for_timeout(options['scroll_delay'])
+                    await page.evaluate("window.scrollTo(0, 0)")
+                    await page.wait_for_timeout(500)
+
+                    clip, guardrails = {}, []
+                    if self.max_capture_pixels:
+                        clip, guardrails = self._clip(
+                            config['width'], await page.evaluate("document.documentElement.scrollHeight"))
+
+                filename, filepath = self.filepath(output_folder, device_name, config)
+                with timer.phase('rasterization'):
+                    image = await page.screenshot(full_page=True, type="png", timeout=timeout,
+                                                  animations="disabled", caret="hide", **clip)
+                with timer.phase('save'):
+                    with open(filepath, 'wb') as f:
+                        f.write(image)
+
+                logging.info(f"[Playwright] ✅ Screenshot saved: {url} → {filename}")
+                results.append(self.success(filepath, filename, device_name, config, device_type,
+                                            timings=timer.take(), guardrails=guardrails))
+
+        except Exception as e:
+            logging.error(f"[Playwright] ❌ Error on {url}: {str(e)}")
+            for device_name, config, device_type in devices[len(results):]:
+                results.append(self.failure(e, device_name, device_type))
+
+        finally:
+            await page.close()
+
+        return results
+
+    async def _signed_out_async(self, page, login):
+        if login.logged_in_selector:
+            return await page.query_selector(login.logged_in_selector) is None
+        return same_page(page.url, login.login_url)
+
+    @contextmanager
+    def session(self):
+        """Share one browser context (HTTP cache, cookies, connections) between the captures inside"""
+        if self._shared_context is not None:
+            yield  # nested: the outer session's context is used
+            return
+        try:
+            context = self.start_browser().new_context()
+        except Exception as e:
+            logging.warning(f"[Playwright] No shared session, captures run separately: {e}")
+            yield
+            return
+
+        self._shared_context = context
+        try:
+            yield
+        finally:
+            self._shared_context = None
+            try:
+                context.close()
+            except Exception as e:
+                logging.warning(f"[Playwright] Error closing shared session: {e}")
+
+    # ---------------------------
+    # ✅ WARM BROWSER (one per worker process)
+    # ---------------------------
+    def start_browser(self):
+        """Launch a long-lived Chromium that later captures reuse (called by worker warm-up)"""
+        if self._warm_browser() is not None:
+            return self._browser
+
+        self.close()
+        logging.info("[Playwright] Launching warm Chromium...")
+        self._playwright = sync_playwright().start()
+        try:
+            self._browser = self._launch_chromium(self._playwright)
+        except Exception:
+            # stop the driver too: a started sync_playwright leaves its event loop set on this thread
+            self.close()
+            raise
+        self._browser_thread = threading.get_ident()
+        return self._browser
+
+    def close(self):
+        """Shut down the warm browser, if any"""
+        try:
+            if self._browser is not None:
+                self._browser.close()
+            if self._playwright is not None:
+                self._playwright.stop()
+        except Exception as e:
+            logging.warning(f"[Playwright] Error closing warm browser: {e}")
+        finally:
+            self._browser = None
+            self._playwright = None
+
+    def _warm_browser(self):
+        """Return the warm browser if it is still connected"""
+        if self._browser is not None and self._browser.is_connected():
+            return self._browser
+        return None
+
+    def capture_bytes(self, url, config, timeout, delay=0, full_page=False, image_type='png', quality=None,
+                      allow_url=None):
+        """Capture one viewport on the warm browser and return the encoded image (nothing is written to disk)
+
+        timeout (ms) bounds navigation and the screenshot together; allow_url (optional)
+        is asked about every request the page makes (see guard_requests)
+        """
+        browser = self.start_browser()
+        deadline = time.monotonic() + timeout / 1000
+
+        def remaining():
+            return max(1, int((deadline - time.monotonic()) * 1000))
+
+        context = browser.new_context(
+            viewport={'width': config['width'], 'height': config['height']},
+            user_agent=config.get('user_agent'),
+        )
+        try:
+            if allow_url:
+                guard_requests(context, allow_url)
+            page = context.new_page()
+            page.goto(url, wait_until="domcontentloaded", timeout=remaining())
+            if delay:
+                page.wait_for_timeout(min(delay, remaining()))
+
+            options = {'full_page': full_page, 'type': image_type, 'timeout': remaining(),
+                       'animations': "disabled", 'caret': "hide"}
+            if full_page:
+                options.update(self._capture_clip(page, config['width'])[0])
+            if image_type == 'jpeg' and quality:
+                options['quality'] = quality
+            return page.screenshot(**options)
+        finally:
+            context.close()
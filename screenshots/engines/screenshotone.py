@@ -0,0 +1,172 @@
+# screenshots/engines/screenshotone.py
+"""
+ScreenshotOne API: remote capture, the fallback when Chromium can't run.
+
+Devices are requested concurrently (at most `concurrency` at a time) over one
+pooled HTTP session and each image is streamed straight to its file.
+Connection errors, timeouts, 429 and 5xx responses are retried with
+exponential backoff (Retry-After is honoured); other 4xx fail at once.
+
+Every device result carries a 'cost' report: attempts, HTTP status, bytes,
+seconds, credits used (one per rendered screenshot) and, when credit_price
+is set, the price.
+"""
+import logging
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from ..timing import PhaseTimer
+from . import Engine
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RetryableError(Exception):
+    """A response or connection failure worth another attempt"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ScreenshotOneEngine(Engine):
+    """Fallback: ScreenshotOne API"""
+
+    name = 'screenshotone'
+
+    def __init__(self, max_capture_pixels=None, access_key=None, base_url="https://api.screenshotone.com/take",
+                 concurrency=3, timeout=90, max_attempts=4, retry_base_seconds=1.0, retry_max_seconds=30.0,
+                 credit_price=None):
+        super().__init__(max_capture_pixels)
+        # 🔑 ScreenshotOne API key (None: every capture fails, see capture())
+        self.access_key = access_key or os.getenv("SCREENSHOTONE_KEY")
+        self.base_url = base_url
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.credit_price = credit_price
+
+        # ✅ keep-alive connections shared by every request of this engine
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def capture(self, url, devices, output_folder, options, progress_callback=None):
+        if not self.access_key:
+            raise RuntimeError("SCREENSHOTONE_KEY is not configured")
+        logging.info(f"[ScreenshotOne] Starting fallback capture of {len(devices)} device(s)...")
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(devices) or 1),
+                                thread_name_prefix='screenshotone') as pool:
+            futures = {pool.submit(self._capture_device, url, device, output_folder): device for device in devices}
+            # results are reported from this thread, as they complete
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['device_name']] = result
+                if progress_callback:
+                    progress_callback(result)
+
+        credits = sum(r['cost']['credits'] for r in results.values())
+        logging.info(f"[ScreenshotOne] All devices processed ✅ ({credits} credit(s))")
+        return [results[device_name] for device_name, _, _ in devices]
+
+    def _params(self, url, config):
+        return {
+            "url": url,
+            "access_key": self.access_key,
+            "format": "png",
+            "viewport_width": str(config["width"]),
+            "viewport_height": str(config["height"]),
+            "full_page": "true",
+            "full_page_algorithm": "by_sections",
+            "full_page_scroll_delay": "1000",
+        }
+
+    def _capture_device(self, url, device, output_folder):
+        device_name, config, device_type = device
+        filename, filepath = self.filepath(output_folder, device_name, config)
+        timer = PhaseTimer()
+        cost = {'attempts': 0, 'status': None, 'bytes': 0, 'seconds': 0.0, 'credits': 0}
+        started = time.perf_counter()
+
+        try:
+            logging.info(f"[ScreenshotOne] Requesting screenshot for {device_name} → {url}")
+            for attempt in range(1, self.max_attempts + 1):
+                cost['attempts'] = attempt
+                try:
+                    cost['status'], cost['bytes'] = self._download(self._params(url, config), filepath, timer)
+                    break
+                except RetryableError as e:
+                    if attempt == self.max_attempts:
+                        raise
+                    delay = self._backoff(attempt, e.retry_after)
+                    logging.warning(f"[ScreenshotOne] {device_name}: {e}, retrying in {delay:.1f}s "
+                                    f"({attempt}/{self.max_attempts})")
+                    time.sleep(delay)
+
+            cost['credits'] = 1
+            logging.info(f"[ScreenshotOne] ✅ Screenshot saved: {filename}")
+            result = self.success(filepath, filename, device_name, config, device_type, timings=timer.take())
+        except Exception as e:
+            error = self._redact(str(e))
+            logging.error(f"[ScreenshotOne] ❌ Failed for {device_name}: {error}")
+            if os.path.exists(filepath):
+                os.remove(filepath)  # partial download
+            result = self.failure(error, device_name, device_type)
+
+        cost['seconds'] = round(time.perf_counter() - started, 3)
+        if self.credit_price is not None:
+            cost['price'] = round(cost['credits'] * self.credit_price, 6)
+        result['cost'] = cost
+        return result
+
+    def _download(self, params, filepath, timer):
+        """One request, streamed into filepath; returns (status, bytes written)"""
+        try:
+            # the API navigates, scrolls and rasterizes remotely: one phase until the response starts
+            with timer.phase('rasterization'):
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout, stream=True)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise RetryableError(self._redact(f'{e.__class__.__name__}: {e}')) from e
+
+        with response:
+            if response.status_code in RETRY_STATUSES:
+                raise RetryableError(f'HTTP {response.status_code}', response.headers.get('Retry-After'))
+            if response.status_code >= 400:
+                # not raise_for_status(): its message has the URL, access key included
+                raise RuntimeError(f'HTTP {response.status_code} {response.reason}')
+
+            written = 0
+            try:
+                with timer.phase('save'), open(filepath, 'wb') as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+                        written += len(chunk)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                raise RetryableError(self._redact(f'download interrupted: {e}')) from e
+            return response.status_code, written
+
+    def _redact(self, text):
+        return text.replace(self.access_key, '***') if self.access_key else text
+
+    def _backoff(self, attempt, retry_after=None):
+        """Seconds before the next attempt: Retry-After when given, else exponential with jitter"""
+        try:
+            if retry_after is not None:
+                return min(float(retry_after), self.retry_max_seconds)
+        except ValueError:
+            pass  # an HTTP date; fall back to our own schedule
+        delay = self.retry_base_seconds * 2 ** (attempt - 1)
+        return min(delay, self.retry_max_seconds) * random.uniform(0.5, 1.0)
@@ -0,0 +1,285 @@
+# screenshots/engines/selenium.py
+"""
+Selenium (chromedriver): an alternative to Playwright.
+
+The chromedriver binary is resolved once per process (CHROMEDRIVER_PATH, else
+webdriver_manager, which looks it up over the network) and one Chrome session
+is kept per engine: a capture navigates once and switches devices by changing
+the viewport, like the Playwright engine, and takes the same full-page PNG
+through the DevTools protocol. The session's profile directory is removed
+when it is closed.
+
+Logged-in captures start from the login's storage_state like Playwright's:
+its cookies through Network.setCookies, its localStorage by a script run
+before the page's own, and a capture that finds itself signed out refreshes
+the login once and reloads.
+"""
+import base64
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from webdriver_manager.chrome import ChromeDriverManager
+
+from ..timing import PhaseTimer
+from . import Engine, same_page
+
+# pid -> chromedriver path, resolved once per process
+_driver_paths = {}
+_driver_lock = threading.Lock()
+
+# true once every <img> on the page has loaded (or failed)
+IMAGES_LOADED = "return Array.from(document.images).every(img => img.complete)"
+
+# restores the localStorage of a storage_state, before the page's scripts run ({origin: items})
+SET_LOCAL_STORAGE = ("(origins => (origins[location.origin] || [])"
+                     ".forEach(item => localStorage.setItem(item.name, item.value)))({})")
+
+
+def cdp_cookies(state):
+    """storage_state cookies for Network.setCookies: session cookies (expires -1) get no expiry"""
+    cookies = []
+    for cookie in state.get('cookies', []):
+        cookie = dict(cookie)
+        if cookie.get('expires', -1) <= 0:
+            cookie.pop('expires', None)
+        cookies.append(cookie)
+    return cookies
+
+
+def driver_path():
+    """Path of the chromedriver binary, looked up on first use only"""
+    pid = os.getpid()
+    with _driver_lock:
+        if pid not in _driver_paths:
+            _driver_paths[pid] = os.environ.get('CHROMEDRIVER_PATH') or ChromeDriverManager().install()
+            logging.info(f"[Selenium] Using chromedriver {_driver_paths[pid]}")
+        return _driver_paths[pid]
+
+
+class SeleniumEngine(Engine):
+    """Capture multiple devices in one reused Chrome session"""
+
+    name = 'selenium'
+    supports_login = True
+
+    def __init__(self, max_capture_pixels=None):
+        super().__init__(max_capture_pixels)
+        self._driver = None
+        self._profile_dir = None
+        self._login_script = None
+
+    # ---------------------------
+    # ✅ SESSION (one per engine, reused across captures)
+    # ---------------------------
+    def start(self):
+        """Return the live Chrome session, starting one if needed"""
+        if self._driver is not None:
+            try:
+                self._driver.current_url  # raises if chromedriver or Chrome died
+                return self._driver
+            except Exception as e:
+                logging.warning(f"[Selenium] Session lost ({e}), starting a new one")
+                self.close()
+
+        chrome_options = ChromeOptions()
+        chrome_options.add_argument('--headless=new')
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--disable-extensions')
+        chrome_options.add_argument('--disable-logging')
+        chrome_options.add_argument('--ignore-certificate-errors')
+        chrome_options.add_argument('--disable-background-timer-throttling')
+        chrome_options.add_argument('--disable-backgrounding-occluded-windows')
+        chrome_options.add_argument('--disable-renderer-backgrounding')
+        chrome_options.add_argument('--hide-scrollbars')
+        # driver.get() returns at DOMContentLoaded, like the Playwright engine's goto
+        chrome_options.page_load_strategy = 'eager'
+
+        self._profile_dir = tempfile.mkdtemp(prefix='chrome_data_')
+        chrome_options.add_argument(f'--user-data-dir={self._profile_dir}')
+
+        logging.info("[Selenium] Starting Chrome session...")
+        try:
+            self._driver = webdriver.Chrome(service=Service(driver_path()), options=chrome_options)
+        except Exception:
+            self.close()
+            raise
+        return self._driver
+
+    def close(self):
+        """Quit the session and remove its profile directory"""
+        try:
+            if self._driver is not None:
+                self._driver.quit()
+        except Exception as e:
+            logging.warning(f"[Selenium] Error closing session: {e}")
+        finally:
+            self._driver = None
+            self._login_script = None
+            if self._profile_dir:
+                shutil.rmtree(self._profile_dir, ignore_errors=True)
+                self._profile_dir = None
+
+    def _reset(self, driver):
+        """Forget the previous capture's cookies / cache (Playwright gets a fresh context instead)"""
+        self._load_login(driver, None)
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+        driver.get('about:blank')
+
+    # ---------------------------
+    # ✅ LOGIN (storage_state of screenshots.auth.LoginSession)
+    # ---------------------------
+    def _load_login(self, driver, state):
+        """Replace the session's cookies and localStorage with state's (None: just drop the previous ones)"""
+        if self._login_script:
+            driver.execute_cdp_cmd('Page.removeScriptToEvaluateOnNewDocument', {'identifier': self._login_script})
+            self._login_script = None
+        if state is None:
+            return
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        driver.execute_cdp_cmd('Network.setCookies', {'cookies': cdp_cookies(state)})
+        origins = {origin['origin']: origin['localStorage'] for origin in state.get('origins', [])}
+        if origins:
+            self._login_script = driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+                'source': SET_LOCAL_STORAGE.format(json.dumps(origins)),
+            })['identifier']
+
+    def _signed_out(self, driver, login):
+        if login.logged_in_selector:
+            return not driver.find_elements(By.CSS_SELECTOR, login.logged_in_selector)
+        return same_page(driver.current_url, login.login_url)
+
+    def _navigate(self, driver, url, timeout):
+        driver.get(url)
+        WebDriverWait(driver, timeout).until(
+            lambda d: d.execute_script("return document.readyState") != 'loading'
+        )
+
+    # ---------------------------
+    # ✅ CAPTURE
+    # ---------------------------
+    def capture(self, url, devices, output_folder, options, progress_callback=None):
+        results = []
+        if not devices:
+            return results
+        driver = self.start()
+        timeout = options['timeout'] / 1000
+        driver.set_page_load_timeout(options['navigation_timeout'] / 1000)
+        driver.set_script_timeout(timeout)
+
+        # ✅ per-phase timings, attached to each device result
+        timer = PhaseTimer()
+        try:
+            # the first device's viewport before loading, so the page lays out for it
+            self._set_viewport(driver, devices[0][1])
+            login = options.get('login')
+            if login:
+                self._load_login(driver, login.state())
+
+            logging.info(f"[Selenium] Navigating to {url}")
+            with timer.phase('navigation'):
+                self._navigate(driver, url, timeout)
+            if login and self._signed_out(driver, login):
+                with timer.phase('login'):
+                    # the stored session is stale: refresh it (once per capture) and reload
+                    self._load_login(driver, login.refresh())
+                    self._navigate(driver, url, timeout)
+                    if self._signed_out(driver, login):
+                        raise RuntimeError('still signed out after signing in again (check the login recipe)')
+            with timer.phase('page_delay'):
+                self._pause(driver, options['page_delay'])
+
+            for device_name, config, device_type in devices:
+                logging.info(f"[Selenium] Switching to device {device_name} , To Capture Screenshot")
+                with timer.phase('viewport'):
+                    self._set_viewport(driver, config)
+                    self._pause(driver, 1000)
+
+                with timer.phase('scrolling'):
+                    # ✅ Scroll step-by-step to trigger lazy-load / animations
+                    scroll_height = driver.execute_script("return document.body.scrollHeight")
+                    for y in range(0, scroll_height, config["height"] // 2):
+                        driver.execute_script(f"window.scrollTo(0, {y});")
+                        self._pause(driver, options['scroll_delay'])
+
+                    driver.execute_script("window.scrollTo(0, 0);")
+                    # lazy images triggered by the scroll, within the usual back-to-top pause
+                    try:
+                        WebDriverWait(driver, 0.5, poll_frequency=0.05).until(
+                            lambda d: d.execute_script(IMAGES_LOADED)
+                        )
+                    except Exception:
+                        pass
+
+                filename, filepath = self.filepath(output_folder, device_name, config)
+                logging.info(f"[Selenium] Taking screenshot → {filename}")
+                with timer.phase('rasterization'):
+                    image, guardrails = self._full_page_png(driver, config['width'])
+                with timer.phase('save'):
+                    with open(filepath, 'wb') as f:
+                        f.write(image)
+
+                logging.info(f"[Selenium] ✅ Screenshot saved: {filename}")
+                result = self.success(filepath, filename, device_name, config, device_type,
+                                      timings=timer.take(), guardrails=guardrails)
+                results.append(result)
+                if progress_callback:
+                    progress_callback(result)
+
+        except Exception as e:
+            logging.error(f"[Selenium] ❌ Error: {str(e)}", exc_info=True)
+            # ✅ report the devices that weren't captured instead of dropping them
+            for device_name, config, device_type in devices[len(results):]:
+                result = self.failure(e, device_name, device_type)
+                results.append(result)
+                if progress_callback:
+                    progress_callback(result)
+            # don't hand a possibly wedged session to the next capture
+            self.close()
+        else:
+            try:
+                self._reset(driver)
+            except Exception:
+                self.close()
+
+        return results
+
+    def _set_viewport(self, driver, config):
+        """Exact CSS viewport of the device (window sizes include browser UI)"""
+        driver.execute_cdp_cmd('Emulation.setDeviceMetricsOverride', {
+            'width': config['width'],
+            'height': config['height'],
+            'deviceScaleFactor': 1,
+            'mobile': False,
+        })
+
+    def _pause(self, driver, ms):
+        """Let the page run for ms (timers / animations), without blocking on a Python sleep"""
+        if ms:
+            driver.execute_async_script(
+                "const done = arguments[arguments.length - 1]; setTimeout(done, arguments[0]);", ms
+            )
+
+    def _full_page_png(self, driver, width):
+        """The whole page as PNG bytes, clipped to max_capture_pixels like the Playwright engine"""
+        layout = driver.execute_cdp_cmd('Page.getLayoutMetrics', {})
+        size = layout.get('cssContentSize') or layout['contentSize']
+        height, guardrails = self.clip_height(width, math.ceil(size['height']))
+        shot = driver.execute_cdp_cmd('Page.captureScreenshot', {
+            'format': 'png',
+            'captureBeyondViewport': True,
+            'clip': {'x': 0, 'y': 0, 'width': width, 'height': height, 'scale': 1},
+        })
+        return base64.b64decode(shot['data']), guardrails
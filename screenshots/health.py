@@ -0,0 +1,104 @@
+# screenshots/health.py
+"""
+Capture engine health: one circuit breaker per engine.
+
+  closed     captures go through; ENGINE_FAILURE_THRESHOLD failed captures in
+             a row open the circuit
+  open       the engine is skipped (its devices go straight to the next
+             engine) for ENGINE_RESET_SECONDS
+  half_open  the next capture is let through as a probe, by one process
+             only; success closes the circuit, failure opens it again
+
+A capture counts as failed when the engine raised or captured none of its
+devices, so one bad device (or one dead website) doesn't trip it on its own.
+
+State lives in the cache (ENGINE_HEALTH_CACHE_ALIAS): per host for the local
+browser engines, since a broken Chromium is a per-node problem, and shared
+by every host for remote ones (ScreenshotOne). Every transition is exported
+as metrics: engine_captures, engine_circuit_transitions, engine_circuit_state.
+"""
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import metrics
+from .engines import REMOTE_ENGINES
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+# engine_circuit_state gauge values
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class EngineHealth:
+    """Circuit breakers for the capture engines"""
+
+    def __init__(self, failure_threshold=None, reset_seconds=None, probe_seconds=None):
+        self.failure_threshold = failure_threshold or getattr(settings, 'ENGINE_FAILURE_THRESHOLD', 5)
+        self.reset_seconds = reset_seconds or getattr(settings, 'ENGINE_RESET_SECONDS', 60)
+        # a probe that never reports back (killed worker) frees the slot after this long
+        self.probe_seconds = probe_seconds or getattr(settings, 'ENGINE_PROBE_SECONDS', 300)
+        self.node = socket.gethostname()
+
+    def _cache(self):
+        return caches[getattr(settings, 'ENGINE_HEALTH_CACHE_ALIAS', 'default')]
+
+    def _key(self, engine):
+        scope = 'global' if engine in REMOTE_ENGINES else self.node
+        return f'engine-health:{scope}:{engine}'
+
+    def state(self, engine):
+        """{'state', 'failures', 'opened_at'} of an engine's circuit"""
+        return self._cache().get(self._key(engine)) or {'state': CLOSED, 'failures': 0, 'opened_at': None}
+
+    def _set(self, engine, current, **changes):
+        previous = current['state']
+        state = {**current, **changes}
+        self._cache().set(self._key(engine), state, None)
+        if state['state'] != previous:
+            metrics.incr('engine_circuit_transitions', engine=engine, state=state['state'])
+            logging.warning(f"[Health] {engine} circuit {previous} → {state['state']} "
+                            f"({state['failures']} failures in a row)")
+        scope = 'global' if engine in REMOTE_ENGINES else self.node
+        metrics.set_gauge('engine_circuit_state', STATE_VALUES[state['state']], engine=engine, node=scope)
+        return state
+
+    def allow(self, engine):
+        """Whether a capture may use the engine now (claims the probe when half-open)"""
+        state = self.state(engine)
+        if state['state'] == CLOSED:
+            return True
+        if state['state'] == OPEN:
+            if time.time() - state['opened_at'] < self.reset_seconds:
+                metrics.incr('engine_captures', engine=engine, outcome='skipped')
+                return False
+            state = self._set(engine, state, state=HALF_OPEN)
+
+        # ✅ half-open: only one capture probes the engine
+        if self._cache().add(f'{self._key(engine)}:probe', os.getpid(), self.probe_seconds):
+            logging.info(f"[Health] Probing {engine}")
+            return True
+        metrics.incr('engine_captures', engine=engine, outcome='skipped')
+        return False
+
+    def record(self, engine, success):
+        """Report how a capture that allow() let through went"""
+        metrics.incr('engine_captures', engine=engine, outcome='success' if success else 'failure')
+        state = self.state(engine)
+        if state['state'] == HALF_OPEN:
+            self._cache().delete(f'{self._key(engine)}:probe')
+
+        if success:
+            if state['state'] != CLOSED or state['failures']:
+                self._set(engine, state, state=CLOSED, failures=0, opened_at=None)
+            return
+
+        failures = state['failures'] + 1
+        if state['state'] == HALF_OPEN or failures >= self.failure_threshold:
+            self._set(engine, state, state=OPEN, failures=failures, opened_at=time.time())
+        else:
+            self._set(engine, state, failures=failures)
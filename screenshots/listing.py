@@ -0,0 +1,122 @@
+# screenshots/listing.py
+"""
+Helpers shared by the JSON list endpoints:
+keyset (cursor) pagination, sparse field selection and conditional GET.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class ListParamError(ValueError):
+    """Raised for an invalid cursor, limit or field list (reported as HTTP 400)"""
+
+
+# ---------------------------
+# ✅ CURSOR PAGINATION (ordered by -created_at, -id)
+# ---------------------------
+def encode_cursor(obj):
+    raw = json.dumps({'c': obj.created_at.isoformat(), 'i': obj.pk})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = parse_datetime(data['c'])
+        pk = int(data['i'])
+    except (ValueError, KeyError, TypeError):
+        raise ListParamError('Invalid cursor')
+    if created_at is None:
+        raise ListParamError('Invalid cursor')
+    return created_at, pk
+
+
+def parse_limit(request):
+    value = request.GET.get('limit')
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ListParamError('limit must be an integer')
+    if limit < 1:
+        raise ListParamError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _page_queryset(queryset, cursor, limit):
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    # one extra row tells us whether there is a next page without a COUNT query
+    return queryset[:limit + 1]
+
+
+def _split_page(items, limit):
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def keyset_page(queryset, cursor, limit):
+    """Return (items, next_cursor) for the page after cursor, newest first"""
+    return _split_page(list(_page_queryset(queryset, cursor, limit)), limit)
+
+
+async def akeyset_page(queryset, cursor, limit):
+    """keyset_page() through the async ORM"""
+    return _split_page([item async for item in _page_queryset(queryset, cursor, limit)], limit)
+
+
+# ---------------------------
+# ✅ SPARSE FIELDS
+# ---------------------------
+def parse_fields(request, serializers):
+    """Return the requested subset of field names (all of them when ?fields= is absent)"""
+    value = request.GET.get('fields')
+    if not value:
+        return list(serializers)
+
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in serializers]
+    if unknown:
+        raise ListParamError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def serialize(obj, fields, serializers):
+    return {name: serializers[name](obj) for name in fields}
+
+
+# ---------------------------
+# ✅ CONDITIONAL GET
+# ---------------------------
+def conditional_json(request, data, last_modified=None):
+    """JsonResponse carrying ETag / Last-Modified, or 304 if the client copy is current"""
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True)
+    etag = f'"{hashlib.sha1(body.encode()).hexdigest()}"'
+    last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified_ts)
+    if response is not None:
+        return response
+
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    if last_modified_ts is not None:
+        response['Last-Modified'] = http_date(last_modified_ts)
+    # ✅ revalidate every time, but allow caching the body
+    response['Cache-Control'] = 'private, no-cache'
+    return response
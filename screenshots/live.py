@@ -0,0 +1,250 @@
+# screenshots/live.py
+"""
+Synchronous "capture now" for interactive previews.
+
+Captures run on a small per-process pool of threads, each owning a warm
+Chromium (Playwright's sync API is bound to the thread that started it).
+Requests carry a time budget: admission control turns a request away up
+front when the queue ahead of it can't be cleared within the budget, and
+a request still queued when its budget runs out is dropped. The encoded
+image is returned in memory; nothing touches the database or the disk.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from . import addresses, metrics
+from .worker import make_screenshot_service
+
+IMAGE_TYPES = {'png': 'image/png', 'jpeg': 'image/jpeg'}
+
+MIN_VIEWPORT, MAX_VIEWPORT = 200, 3840
+
+# weight of the newest capture in the running average used for admission
+EWMA_ALPHA = 0.2
+
+
+class CaptureRejected(Exception):
+    """The request can't be served within its budget (HTTP 503); retry_after is in seconds"""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CaptureParamError(ValueError):
+    """Invalid capture parameters (HTTP 400)"""
+
+
+# ---------------------------
+# ✅ REQUEST PARSING
+# ---------------------------
+def _int_param(params, name, default, low, high):
+    value = params.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise CaptureParamError(f'{name} must be an integer')
+    if not low <= value <= high:
+        raise CaptureParamError(f'{name} must be between {low} and {high}')
+    return value
+
+
+def check_url(url):
+    """Only http(s) URLs; private / loopback hosts unless LIVE_CAPTURE_ALLOW_PRIVATE"""
+    parsed = urlparse(url or '')
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise CaptureParamError('url must be an http(s) URL')
+    if getattr(settings, 'LIVE_CAPTURE_ALLOW_PRIVATE', False):
+        return url
+    try:
+        return addresses.check_public_url(url)
+    except ValueError as e:
+        raise CaptureParamError(f'url {e}')
+
+
+def allowed_url():
+    """Check for every request of a capture (redirects, subresources), or None when private hosts are allowed"""
+    if getattr(settings, 'LIVE_CAPTURE_ALLOW_PRIVATE', False):
+        return None
+    return addresses.is_public_url
+
+
+def parse_capture_request(params, device_configs):
+    """Validated capture options from query parameters (raises CaptureParamError)"""
+    url = check_url(params.get('url'))
+
+    device_type = params.get('device', 'desktop')
+    if device_type not in device_configs:
+        raise CaptureParamError(f"device must be one of {', '.join(device_configs)}")
+    devices = device_configs[device_type]
+    device_name = params.get('device_name') or next(iter(devices))
+    if device_name not in devices:
+        raise CaptureParamError(f"Unknown device_name for {device_type}")
+    config = dict(devices[device_name])
+
+    config['width'] = _int_param(params, 'width', config['width'], MIN_VIEWPORT, MAX_VIEWPORT)
+    config['height'] = _int_param(params, 'height', config['height'], MIN_VIEWPORT, MAX_VIEWPORT)
+
+    image_type = params.get('format', 'png')
+    if image_type not in IMAGE_TYPES:
+        raise CaptureParamError(f"format must be one of {', '.join(IMAGE_TYPES)}")
+
+    max_budget = getattr(settings, 'LIVE_CAPTURE_MAX_BUDGET_MS', 15000)
+    return {
+        'url': url,
+        'device_type': device_type,
+        'device_name': device_name,
+        'config': config,
+        'image_type': image_type,
+        'quality': _int_param(params, 'quality', None, 1, 100),
+        'full_page': params.get('full_page') in ('1', 'true'),
+        'delay': _int_param(params, 'delay', 0, 0, getattr(settings, 'LIVE_CAPTURE_MAX_DELAY_MS', 2000)),
+        'budget': _int_param(params, 'budget_ms', getattr(settings, 'LIVE_CAPTURE_BUDGET_MS', 8000), 500, max_budget),
+    }
+
+
+# ---------------------------
+# ✅ WARM BROWSER POOL
+# ---------------------------
+class CapturePool:
+    """Fixed set of capture threads, each with its own warm browser"""
+
+    def __init__(self, size, max_queue, initial_estimate):
+        self.size = size
+        self.max_queue = max_queue
+        self.estimate = initial_estimate  # seconds, running average of recent captures
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._threads = []
+
+    def start(self):
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f'live-capture-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _run(self):
+        service = make_screenshot_service()
+        try:
+            service.start_browser()
+        except Exception as e:
+            logging.warning(f"[Live] Could not pre-launch Chromium: {e}")
+
+        while True:
+            future, deadline, options = self._jobs.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    future.set_exception(TimeoutError('Capture budget expired while queued'))
+                    continue
+                started = time.monotonic()
+                try:
+                    image = self.capture(service, options, int(remaining * 1000))
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+                elapsed = time.monotonic() - started
+                with self._lock:
+                    self.estimate += EWMA_ALPHA * (elapsed - self.estimate)
+                future.set_result((image, started, elapsed))
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+    def capture(self, service, options, timeout):
+        return service.capture_bytes(
+            options['url'], options['config'], timeout,
+            delay=options['delay'], full_page=options['full_page'],
+            image_type=options['image_type'], quality=options['quality'], allow_url=allowed_url(),
+        )
+
+    def submit(self, options):
+        """Queue a capture if it can finish within its budget; returns a Future of (bytes, started, seconds)"""
+        budget = options['budget'] / 1000
+        with self._lock:
+            # captures ahead of this one, spread over the pool, plus this one
+            expected = (self._pending // self.size + 1) * self.estimate
+            if self._pending >= self.size + self.max_queue:
+                raise CaptureRejected('Capture queue is full', retry_after=max(1, round(expected)))
+            if expected > budget:
+                raise CaptureRejected(f'Expected capture time {expected:.1f}s exceeds the budget',
+                                      retry_after=max(1, round(expected - budget)))
+            self._pending += 1
+
+        future = Future()
+        self._jobs.put((future, time.monotonic() + budget, options))
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {'size': self.size, 'pending': self._pending, 'estimate_seconds': round(self.estimate, 3)}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool():
+    """This process's capture pool, started on first use"""
+    key = os.getpid()  # a forked child starts its own threads and browsers
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = CapturePool(
+                size=getattr(settings, 'LIVE_CAPTURE_POOL_SIZE', 2),
+                max_queue=getattr(settings, 'LIVE_CAPTURE_MAX_QUEUE', 4),
+                initial_estimate=getattr(settings, 'LIVE_CAPTURE_INITIAL_ESTIMATE', 2.0),
+            ).start()
+        return _pools[key]
+
+
+def record(result, started_at, **extra):
+    """Count a capture outcome and its end-to-end latency"""
+    metrics.incr('live_captures', result=result)
+    metrics.observe('live_capture_seconds', time.monotonic() - started_at, result=result)
+    if extra:
+        logging.info(f"[Live] {result} {extra}")
+
+
+# ---------------------------
+# ✅ RESPONSES (shared by the sync and async views)
+# ---------------------------
+def rejected_response(error, started_at):
+    record('rejected', started_at)
+    response = JsonResponse({'error': str(error)}, status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def failed_response(error, started_at, future):
+    future.cancel()  # still queued: the pool thread will skip it
+    if isinstance(error, TimeoutError):
+        record('timeout', started_at)
+        return JsonResponse({'error': 'Capture did not finish within the budget'}, status=504)
+    record('error', started_at, error=str(error))
+    return JsonResponse({'error': f'Capture failed: {error}'}, status=502)
+
+
+def image_response(result, options, started_at):
+    image, capture_started, capture_seconds = result
+    record('ok', started_at)
+
+    response = HttpResponse(image, content_type=IMAGE_TYPES[options['image_type']])
+    response['Cache-Control'] = 'no-store'
+    response['Server-Timing'] = (f'queue;dur={(capture_started - started_at) * 1000:.0f}, '
+                                 f'capture;dur={capture_seconds * 1000:.0f}')
+    response['X-Device'] = f"{options['device_name']} {options['config']['width']}x{options['config']['height']}"
+    return response
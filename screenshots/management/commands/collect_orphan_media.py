@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from screenshots.cleanup import collect_orphans
+
+
+class Command(BaseCommand):
+    help = "Delete media files (content-addressed or legacy) that no Screenshot / Artifact row references"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Maximum number of files to remove")
+        parser.add_argument('--grace-seconds', type=int, help="Skip files modified more recently than this")
+        parser.add_argument('--dry-run', action='store_true', help="Only list the orphans")
+
+    def handle(self, *args, **options):
+        removed = collect_orphans(
+            batch_size=options['batch_size'],
+            grace_seconds=options['grace_seconds'],
+            dry_run=options['dry_run'],
+        )
+        for path in removed:
+            self.stdout.write(path)
+        verb = 'Found' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(removed)} orphaned file(s)"))
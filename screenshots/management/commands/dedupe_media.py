@@ -0,0 +1,72 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from screenshots.models import Screenshot
+from screenshots.storage import is_artifact, store_file
+
+
+class Command(BaseCommand):
+    help = "Move legacy media/users_projects files into the content-addressed artifact storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be moved")
+        parser.add_argument('--keep-legacy', action='store_true', help="Don't delete the old files afterwards")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        migrated = {}  # legacy path -> artifact name
+        legacy_bytes = 0
+        rows = 0
+
+        screenshots = Screenshot.objects.exclude(original_path__startswith='cas/', mockup_path__startswith='cas/')
+        for screenshot in screenshots.iterator():
+            changed = []
+            for field, ext in (('original_path', None), ('mockup_path', '.webp')):
+                path = getattr(screenshot, field)
+                if not path or is_artifact(path):
+                    continue
+
+                full_path = os.path.join(settings.MEDIA_ROOT, path)
+                if not os.path.isfile(full_path):
+                    self.stderr.write(f"Missing file for screenshot {screenshot.id}: {path}")
+                    continue
+
+                legacy_bytes += os.path.getsize(full_path)
+                if dry_run:
+                    continue
+
+                # every row referencing the file takes its own artifact reference
+                name = store_file(full_path, ext=ext)
+                migrated[path] = name
+                setattr(screenshot, field, name)
+                changed.append(field)
+
+            if changed:
+                with transaction.atomic():
+                    screenshot.save(update_fields=changed)
+                rows += 1
+
+        if dry_run:
+            self.stdout.write(f"Would move {legacy_bytes} bytes of legacy files into the artifact storage")
+            return
+
+        stored_bytes = sum(os.path.getsize(os.path.join(settings.MEDIA_ROOT, name)) for name in set(migrated.values()))
+
+        if not options['keep_legacy']:
+            for path in migrated:
+                full_path = os.path.join(settings.MEDIA_ROOT, path)
+                if os.path.exists(full_path):
+                    os.remove(full_path)
+            self._prune_empty_dirs(os.path.join(settings.MEDIA_ROOT, 'users_projects'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {rows} screenshot(s): {legacy_bytes} legacy bytes now stored as {stored_bytes} bytes"
+        ))
+
+    def _prune_empty_dirs(self, root):
+        for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+            if dirpath != root and not os.listdir(dirpath):
+                os.rmdir(dirpath)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from screenshots.models import Project
+
+
+class Command(BaseCommand):
+    help = "Rebuild Project.screenshot_counter from the actual Screenshot rows"
+
+    def handle(self, *args, **options):
+        fixed = 0
+        for project in Project.objects.with_screenshot_count().iterator():
+            if project.screenshot_counter != project.num_screenshots:
+                Project.objects.filter(pk=project.pk).update(screenshot_counter=project.num_screenshots)
+                fixed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Recounted screenshots, {fixed} project(s) corrected"))
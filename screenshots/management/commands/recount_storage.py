@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from screenshots.quota import recount_usage
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-creator StorageUsage totals from the recorded Screenshot sizes"
+
+    def handle(self, *args, **options):
+        creators = recount_usage()
+        self.stdout.write(self.style.SUCCESS(f"Recounted storage usage for {creators} creator(s)"))
@@ -0,0 +1,157 @@
+# screenshots/media.py
+"""
+Media delivery for screenshots and mockups.
+
+After the access check the transfer is handed to the front proxy when
+MEDIA_ACCEL is set ('nginx' -> X-Accel-Redirect, 'sendfile' -> X-Sendfile).
+Otherwise the file is streamed by Django with Range, ETag and
+Last-Modified support.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_http_methods
+
+from .models import Artifact, Screenshot
+from .quota import touch
+from .storage import is_artifact
+
+CHUNK_SIZE = 64 * 1024
+
+# a 32-64 char hex digest in the file name means the URL changes whenever the content does
+CONTENT_HASH_RE = re.compile(r'(^|[^0-9a-f])[0-9a-f]{32,64}([^0-9a-f]|$)')
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def resolve_media_path(path):
+    """Absolute path of a MEDIA_ROOT-relative path, refusing anything outside MEDIA_ROOT"""
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    full_path = os.path.realpath(os.path.join(media_root, path))
+    if os.path.commonpath([media_root, full_path]) != media_root:
+        raise Http404("Invalid path")
+    return full_path
+
+
+def can_access(request, path):
+    """Only files that belong to an existing screenshot (or a live artifact) are served"""
+    if is_artifact(path):
+        return Artifact.objects.filter(name=path).exists()
+    return Screenshot.objects.filter(
+        Q(original_path=path) | Q(mockup_path=path), project__deleted_at__isnull=True
+    ).exists()
+
+
+def is_content_hashed(path):
+    return bool(CONTENT_HASH_RE.search(os.path.basename(path).lower()))
+
+
+def cache_control(path):
+    if is_content_hashed(path):
+        return 'public, max-age=31536000, immutable'
+    # legacy per-project paths are overwritten on regeneration, so clients must revalidate
+    return 'public, max-age=0, must-revalidate'
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single 'bytes=' range, None to ignore it, or 'invalid'"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None  # malformed or multi-range: serve the whole file
+
+    first, last = match.groups()
+    if first == '':
+        # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'invalid'
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def _file_range(full_path, start, end):
+    with open(full_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _accel_response(path, full_path, content_type):
+    mode = getattr(settings, 'MEDIA_ACCEL', None)
+    response = HttpResponse(content_type=content_type)
+    if mode == 'nginx':
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + path.lstrip('/')
+    elif mode == 'sendfile':
+        response['X-Sendfile'] = full_path
+    else:
+        return None
+    return response
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_media(request, path):
+    """Serve a screenshot / mockup file after checking it belongs to a screenshot"""
+    path = path.replace('\\', '/')
+    full_path = resolve_media_path(path)
+
+    if not os.path.isfile(full_path) or not can_access(request, path):
+        raise Http404("File not found")
+
+    # ✅ last access time drives LRU eviction when a creator is over quota
+    touch(path)
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+
+    # ✅ hand the transfer to nginx / apache; they do ranges and conditional requests themselves
+    response = _accel_response(path, full_path, content_type)
+    if response is not None:
+        response['Cache-Control'] = cache_control(path)
+        return response
+
+    stat = os.stat(full_path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        not_modified['Cache-Control'] = cache_control(path)
+        return not_modified
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header and request.headers.get('If-Range', etag) in (etag, http_date(last_modified)):
+        byte_range = parse_range(range_header, stat.st_size)
+
+    if byte_range == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_file_range(full_path, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control(path)
+    return response
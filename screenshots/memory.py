@@ -0,0 +1,53 @@
+# screenshots/memory.py
+"""
+Memory guardrails for capture workers.
+
+  * CAPTURE_MAX_PIXELS: full-page captures taller than this budget allows
+    are clipped at the bottom (reported as 'truncated' in the task result)
+  * MOCKUP_MAX_PIXELS: the most screenshot pixels a mockup may decode; the
+    mockup only shows the top of a page, so PNGs are decoded partially and
+    larger inputs are downscaled (JPEG) or rejected
+  * IMAGE_MAX_PIXELS: Pillow's decompression-bomb limit (Image.MAX_IMAGE_PIXELS)
+  * WORKER_MAX_RSS_MB: after each task a prefork child whose RSS went over
+    this is replaced (Celery's worker_max_memory_per_child)
+"""
+import logging
+import os
+import resource
+
+from django.conf import settings
+from PIL import Image
+
+from . import metrics
+
+
+def rss_bytes():
+    """Current resident set size of this process"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # no /proc: fall back to the peak, which is all getrusage offers
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+
+def configure_pillow():
+    """Apply IMAGE_MAX_PIXELS to Pillow's decompression-bomb check"""
+    limit = getattr(settings, 'IMAGE_MAX_PIXELS', Image.MAX_IMAGE_PIXELS)
+    Image.MAX_IMAGE_PIXELS = limit
+
+
+def check_worker_memory(task_name=None):
+    """Log and count a worker that went over WORKER_MAX_RSS_MB; returns the RSS in bytes
+
+    Only reports: replacing the process is left to Celery (worker_max_memory_per_child,
+    prefork pool only).
+    """
+    rss = rss_bytes()
+    limit_mb = getattr(settings, 'WORKER_MAX_RSS_MB', None)
+    if limit_mb and rss > limit_mb * 1024 * 1024:
+        metrics.incr('worker_memory_over_limit')
+        logging.warning(f"[Memory] Worker {os.getpid()} at {rss // (1024 * 1024)} MB after {task_name}, "
+                        f"over the {limit_mb} MB limit")
+    return rss
@@ -0,0 +1,192 @@
+# screenshots/metrics.py
+"""
+Lightweight metrics shared between web and worker processes.
+
+Values live in a Django cache (METRICS_CACHE_ALIAS) so every process that
+points at the same backend (e.g. Redis) contributes to the same series.
+With a locmem cache the numbers are per-process only: check_shared_cache()
+logs an error at startup unless CACHE_LOCMEM says that is intended.
+
+prometheus_text() renders the same data for the /metrics endpoint.
+"""
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# seconds; covers quick DB work up to slow full-page captures
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, math.inf)
+
+# floats are stored as integer micro-units so backends with int-only INCR (Redis) work
+SCALE = 1_000_000
+
+INDEX_KEY = 'metrics:index'
+
+# series this process already knows are in the index -> when that was last checked
+_registered = {}
+
+# re-check the index now and then in case the cache was cleared or evicted it
+REGISTER_RECHECK_SECONDS = 60
+
+
+def _cache():
+    return caches[getattr(settings, 'METRICS_CACHE_ALIAS', 'default')]
+
+
+def check_shared_cache():
+    """Log an error when web and workers would each count into their own locmem cache"""
+    alias = getattr(settings, 'METRICS_CACHE_ALIAS', 'default')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND', '')
+    if backend.endswith('LocMemCache') and not getattr(settings, 'CACHE_LOCMEM', False):
+        logging.error(f"[Metrics] cache '{alias}' is per-process locmem: the web process and the Celery workers "
+                      "won't share metrics, login sessions or response invalidation. Set CACHE_REDIS_URL "
+                      "(or CACHE_LOCMEM=1 for a single process)")
+        return False
+    return True
+
+
+def _series_id(kind, name, labels):
+    return (kind, name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+def _key(series, suffix=''):
+    kind, name, labels = series
+    label_str = ','.join(f'{k}={v}' for k, v in labels)
+    return f'metrics:{kind}:{name}:{label_str}:{suffix}'
+
+
+def _register(series):
+    """Record the series in the shared index so snapshot() can find it"""
+    now = time.monotonic()
+    if now - _registered.get(series, -REGISTER_RECHECK_SECONDS) < REGISTER_RECHECK_SECONDS:
+        return
+    cache = _cache()
+    for _ in range(3):
+        index = cache.get(INDEX_KEY) or set()
+        if series in index:
+            break
+        index.add(series)
+        cache.set(INDEX_KEY, index, None)
+        # read back: another process may have overwritten the index concurrently
+        if series in (cache.get(INDEX_KEY) or set()):
+            break
+    _registered[series] = now
+
+
+def _add(key, amount):
+    cache = _cache()
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(key, amount, None)
+
+
+def incr(name, amount=1, **labels):
+    """Increase a counter"""
+    try:
+        series = _series_id('counter', name, labels)
+        _register(series)
+        _add(_key(series), int(amount * SCALE))
+    except Exception as e:
+        logging.warning(f"[Metrics] Could not record {name}: {e}")
+
+
+def set_gauge(name, value, **labels):
+    """Set a gauge to the given value"""
+    try:
+        series = _series_id('gauge', name, labels)
+        _register(series)
+        _cache().set(_key(series), int(value * SCALE), None)
+    except Exception as e:
+        logging.warning(f"[Metrics] Could not record {name}: {e}")
+
+
+def observe(name, value, **labels):
+    """Record one observation (usually seconds) in a histogram"""
+    try:
+        series = _series_id('histogram', name, labels)
+        _register(series)
+        _add(_key(series, 'count'), 1)
+        _add(_key(series, 'sum'), int(value * SCALE))
+        # only the bucket the value falls in; snapshot() makes them cumulative
+        bound = next(b for b in DEFAULT_BUCKETS if value <= b)
+        _add(_key(series, f'bucket={bound}'), 1)
+    except Exception as e:
+        logging.warning(f"[Metrics] Could not record {name}: {e}")
+
+
+def snapshot():
+    """Return every known series with its current values"""
+    cache = _cache()
+    series_list = sorted(cache.get(INDEX_KEY) or set())
+    data = []
+
+    for series in series_list:
+        kind, name, labels = series
+        entry = {'kind': kind, 'name': name, 'labels': dict(labels)}
+
+        if kind == 'histogram':
+            entry['count'] = cache.get(_key(series, 'count'), 0)
+            entry['sum'] = cache.get(_key(series, 'sum'), 0) / SCALE
+            counts = cache.get_many([_key(series, f'bucket={bound}') for bound in DEFAULT_BUCKETS])
+            cumulative, entry['buckets'] = 0, []
+            for bound in DEFAULT_BUCKETS:
+                cumulative += counts.get(_key(series, f'bucket={bound}'), 0)
+                entry['buckets'].append((bound, cumulative))
+        else:
+            entry['value'] = cache.get(_key(series), 0) / SCALE
+
+        data.append(entry)
+
+    return data
+
+
+# ---------------------------
+# ✅ PROMETHEUS EXPOSITION
+# ---------------------------
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = {**labels, **extra}
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs.items()) + '}'
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return str(value)
+
+
+def prometheus_text(data=None):
+    """Render snapshot() in the Prometheus text exposition format (version 0.0.4)"""
+    namespace = getattr(settings, 'METRICS_NAMESPACE', 'screenshots')
+    families = {}
+    for entry in snapshot() if data is None else data:
+        families.setdefault((entry['kind'], entry['name']), []).append(entry)
+
+    lines = []
+    for (kind, name), entries in sorted(families.items(), key=lambda item: item[0][1]):
+        family = f'{namespace}_{name}' if namespace else name
+        if kind == 'counter':
+            family += '_total'
+        lines.append(f'# TYPE {family} {kind}')
+
+        for entry in entries:
+            labels = entry['labels']
+            if kind == 'histogram':
+                for bound, count in entry['buckets']:
+                    lines.append(f'{family}_bucket{_labels(labels, le=_number(bound))} {count}')
+                lines.append(f'{family}_sum{_labels(labels)} {_number(entry["sum"])}')
+                lines.append(f'{family}_count{_labels(labels)} {entry["count"]}')
+            else:
+                lines.append(f'{family}{_labels(labels)} {_number(entry["value"])}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:19
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_screenshot_counter(apps, schema_editor):
+    Project = apps.get_model('screenshots', 'Project')
+    for project in Project.objects.annotate(num_screenshots=Count('screenshots')).iterator():
+        Project.objects.filter(pk=project.pk).update(screenshot_counter=project.num_screenshots)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0006_alter_project_page_delay_alter_project_scroll_delay'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='screenshot_counter',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Cached number of screenshots'),
+        ),
+        migrations.RunPython(backfill_screenshot_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0007_project_screenshot_counter'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_at', 'id'], name='project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['creator_id', 'created_at', 'id'], name='project_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['creator_name'], name='project_creator_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screenshot',
+            index=models.Index(fields=['project', 'created_at', 'id'], name='screenshot_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screenshot',
+            index=models.Index(fields=['project', 'device_type', 'created_at'], name='screenshot_project_device_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screenshot',
+            index=models.Index(fields=['created_at', 'id'], name='screenshot_created_idx'),
+        ),
+    ]
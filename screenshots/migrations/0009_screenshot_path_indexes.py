@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0008_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='screenshot',
+            index=models.Index(fields=['original_path'], name='screenshot_original_path_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='screenshot',
+            index=models.Index(fields=['mockup_path'], name='screenshot_mockup_path_idx'),
+        ),
+    ]
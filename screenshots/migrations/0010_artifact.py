@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0009_screenshot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Artifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Storage name, derived from the content hash', max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0, help_text='Size in bytes')),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='Screenshot fields pointing at this file')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:30
+
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_storage_usage(apps, schema_editor):
+    Artifact = apps.get_model('screenshots', 'Artifact')
+    Screenshot = apps.get_model('screenshots', 'Screenshot')
+    StorageUsage = apps.get_model('screenshots', 'StorageUsage')
+
+    artifact_sizes = dict(Artifact.objects.values_list('name', 'size'))
+
+    def size_of(name):
+        if not name:
+            return 0
+        if name in artifact_sizes:
+            return artifact_sizes[name]
+        full_path = os.path.join(settings.MEDIA_ROOT, name)
+        return os.path.getsize(full_path) if os.path.isfile(full_path) else 0
+
+    totals = {}
+    for screenshot in Screenshot.objects.select_related('project').iterator():
+        original_bytes, mockup_bytes = size_of(screenshot.original_path), size_of(screenshot.mockup_path)
+        Screenshot.objects.filter(pk=screenshot.pk).update(original_bytes=original_bytes, mockup_bytes=mockup_bytes)
+
+        usage = totals.setdefault(screenshot.project.creator_id, [0, 0])
+        usage[0] += original_bytes + mockup_bytes
+        usage[1] += int(bool(screenshot.original_path)) + int(bool(screenshot.mockup_path))
+
+    StorageUsage.objects.bulk_create(
+        [StorageUsage(creator_id=creator_id, bytes=b, files=f) for creator_id, (b, f) in totals.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0011_project_deleted_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('creator_id', models.CharField(max_length=100, unique=True)),
+                ('bytes', models.BigIntegerField(default=0, help_text="Bytes referenced by the creator's screenshots")),
+                ('files', models.IntegerField(default=0, help_text="Files referenced by the creator's screenshots")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'storage usage',
+            },
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='last_accessed_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Last time a file was served', null=True),
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='mockup_bytes',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Size of the mockup file'),
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='original_bytes',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Size of the original file'),
+        ),
+        migrations.RunPython(backfill_storage_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0013_webhooks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screenshot',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Seconds spent per capture phase'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0014_screenshot_timings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaptureProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(blank=True, default='', max_length=255)),
+                ('cpu_path', models.CharField(help_text='cProfile output (pstats format)', max_length=500)),
+                ('summary_path', models.CharField(help_text='Plain-text summary of hotspots and allocations', max_length=500)),
+                ('json_path', models.CharField(help_text='The summary as JSON', max_length=500)),
+                ('summary', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profiles', to='screenshots.project')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
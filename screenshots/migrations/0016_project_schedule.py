@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0015_capture_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='next_capture_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='schedule_devices',
+            field=models.JSONField(blank=True, default=list, help_text='Device types captured on schedule (empty = all)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='schedule_interval',
+            field=models.PositiveIntegerField(blank=True, help_text='Minutes between scheduled captures (empty = not scheduled)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['next_capture_at'], name='project_next_capture_idx'),
+        ),
+    ]
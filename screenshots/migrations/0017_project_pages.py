@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0016_project_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='max_depth',
+            field=models.PositiveIntegerField(blank=True, help_text='Deepest URL path captured, / is 0 (empty = any)', null=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='max_pages',
+            field=models.PositiveIntegerField(default=50, help_text='Most pages captured per run'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='page_urls',
+            field=models.JSONField(blank=True, default=list, help_text='Pages to capture (empty = website_url, or the sitemap)'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='sitemap_url',
+            field=models.URLField(blank=True, default='', help_text='sitemap.xml listing the pages to capture', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='screenshot',
+            name='page_url',
+            field=models.URLField(blank=True, default='', help_text='Captured page', max_length=2000),
+        ),
+    ]
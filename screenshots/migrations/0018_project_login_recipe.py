@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0017_project_pages'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='login_recipe',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Encrypted login recipe'),
+        ),
+    ]
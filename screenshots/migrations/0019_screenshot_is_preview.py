@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screenshots', '0018_project_login_recipe'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screenshot',
+            name='is_preview',
+            field=models.BooleanField(default=False, help_text='Low-resolution preview awaiting the full capture'),
+        ),
+    ]
@@ -1,8 +1,29 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count
 from django.utils import timezone
 import os
 
 
+def screenshot_counter_enabled():
+    """Whether Project.screenshot_counter is kept up to date (see SCREENSHOT_COUNTER_ENABLED)"""
+    return getattr(settings, 'SCREENSHOT_COUNTER_ENABLED', True)
+
+
+class ProjectQuerySet(models.QuerySet):
+
+    def with_screenshot_count(self):
+        """Annotate every project with its screenshot count in the same query"""
+        return self.annotate(num_screenshots=Count('screenshots'))
+
+
+class ProjectManager(models.Manager.from_queryset(ProjectQuerySet)):
+    """Default manager: hides soft-deleted projects"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Project(models.Model):
     """Model to store website screenshot projects"""
     
@@ -18,18 +39,63 @@ class Project(models.Model):
     scroll_delay = models.IntegerField(default=100, help_text="Delay per scroll step in ms")
     timeout = models.IntegerField(default=120000, help_text="Global timeout in ms")
 
-    
+    # ✅ denormalized count, maintained by screenshots.signals when SCREENSHOT_COUNTER_ENABLED
+    screenshot_counter = models.PositiveIntegerField(default=0, editable=False, help_text="Cached number of screenshots")
+
+    # ✅ optional completion webhook (see screenshots.webhooks)
+    webhook_url = models.URLField(max_length=500, blank=True, default='', help_text="Notified when a screenshot task finishes")
+
+    # ✅ soft delete: set by the delete API, rows and files are purged by a background task
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # ✅ recurring captures (see screenshots.scheduling)
+    schedule_interval = models.PositiveIntegerField(null=True, blank=True, help_text="Minutes between scheduled captures (empty = not scheduled)")
+    schedule_devices = models.JSONField(default=list, blank=True, help_text="Device types captured on schedule (empty = all)")
+    next_capture_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # ✅ multi-page capture (see screenshots.pages): these pages instead of website_url
+    page_urls = models.JSONField(default=list, blank=True, help_text="Pages to capture (empty = website_url, or the sitemap)")
+    sitemap_url = models.URLField(max_length=500, blank=True, default='', help_text="sitemap.xml listing the pages to capture")
+    max_pages = models.PositiveIntegerField(default=50, help_text="Most pages captured per run")
+    max_depth = models.PositiveIntegerField(null=True, blank=True, help_text="Deepest URL path captured, / is 0 (empty = any)")
+
+    # ✅ logged-in captures (see screenshots.auth): the login recipe, encrypted since it holds credentials
+    login_recipe = models.TextField(blank=True, default='', editable=False, help_text="Encrypted login recipe")
+
+    objects = ProjectManager()
+    all_objects = ProjectQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
-        
+        indexes = [
+            # keyset listing (-created_at, -id), optionally narrowed by creator
+            models.Index(fields=['created_at', 'id'], name='project_created_idx'),
+            models.Index(fields=['creator_id', 'created_at', 'id'], name='project_creator_created_idx'),
+            # admin list_filter
+            models.Index(fields=['creator_name'], name='project_creator_name_idx'),
+            # due schedules
+            models.Index(fields=['next_capture_at'], name='project_next_capture_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} (by {self.creator_name})"
 
     
     @property
     def screenshot_count(self):
-        """Get the number of screenshots for this project"""
+        """Get the number of screenshots for this project (annotation, then counter, then COUNT query)"""
+        annotated = getattr(self, 'num_screenshots', None)
+        if annotated is not None:
+            return annotated
+        if screenshot_counter_enabled():
+            return self.screenshot_counter
         return self.screenshots.count()
+
+    def recount_screenshots(self):
+        """Reset the denormalized counter from the real number of rows"""
+        self.screenshot_counter = self.screenshots.count()
+        Project.objects.filter(pk=self.pk).update(screenshot_counter=self.screenshot_counter)
+        return self.screenshot_counter
     
     def get_project_folder(self):
         """Get the folder path for this project"""
@@ -61,14 +127,63 @@ class Screenshot(models.Model):
     height = models.IntegerField(help_text="Screenshot height in pixels")
     original_path = models.CharField(max_length=500, help_text="Path to original screenshot")
     mockup_path = models.CharField(max_length=500, help_text="Path to mockup image")
+    # ✅ page of a multi-page project this was captured from (empty = the project's website_url)
+    page_url = models.URLField(max_length=2000, blank=True, default='', help_text="Captured page")
+    # ✅ quick above-the-fold capture, replaced in place by the full one (see tasks.generate_screenshots)
+    is_preview = models.BooleanField(default=False, help_text="Low-resolution preview awaiting the full capture")
     created_at = models.DateTimeField(auto_now_add=True)
+
+    # ✅ storage accounting (see screenshots.quota): sizes recorded at write time, access time for LRU eviction
+    original_bytes = models.PositiveBigIntegerField(default=0, editable=False, help_text="Size of the original file")
+    mockup_bytes = models.PositiveBigIntegerField(default=0, editable=False, help_text="Size of the mockup file")
+    last_accessed_at = models.DateTimeField(null=True, blank=True, editable=False, help_text="Last time a file was served")
+
+    # ✅ seconds per capture phase (see screenshots.timing), e.g. {"navigation": 1.2, "mockup_encode": 0.4}
+    timings = models.JSONField(default=dict, blank=True, editable=False, help_text="Seconds spent per capture phase")
     
     class Meta:
         ordering = ['-created_at']
-        
+        indexes = [
+            # project page / per-project list ordered by -created_at, -id
+            models.Index(fields=['project', 'created_at', 'id'], name='screenshot_project_created_idx'),
+            # per-project, per-device lookups (latest capture of a device)
+            models.Index(fields=['project', 'device_type', 'created_at'], name='screenshot_project_device_idx'),
+            # global keyset listing
+            models.Index(fields=['created_at', 'id'], name='screenshot_created_idx'),
+            # media access check (screenshots.media.can_access)
+            models.Index(fields=['original_path'], name='screenshot_original_path_idx'),
+            models.Index(fields=['mockup_path'], name='screenshot_mockup_path_idx'),
+        ]
+
     def __str__(self):
         return f"{self.device_name} - {self.project.name}"
+
+    def save(self, *args, **kwargs):
+        # atomic so the post_save counter update commits together with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
     
+    @property
+    def stored_bytes(self):
+        """Bytes charged to the creator for this screenshot"""
+        return self.original_bytes + self.mockup_bytes
+
+    @property
+    def stored_files(self):
+        return int(bool(self.original_path)) + int(bool(self.mockup_path))
+
+    @property
+    def original_url(self):
+        """Public URL of the original screenshot, resolved through the artifact storage"""
+        from .storage import artifact_url
+        return artifact_url(self.original_path)
+
+    @property
+    def mockup_url(self):
+        """Public URL of the mockup, resolved through the artifact storage"""
+        from .storage import artifact_url
+        return artifact_url(self.mockup_path)
+
     @property
     def original_filename(self):
         """Get the filename from original_path"""
@@ -77,4 +192,94 @@ class Screenshot(models.Model):
     @property
     def mockup_filename(self):
         """Get the filename from mockup_path"""
-        return os.path.basename(str(self.mockup_path)) if self.mockup_path else None
\ No newline at end of file
+        return os.path.basename(str(self.mockup_path)) if self.mockup_path else None
+
+
+class Artifact(models.Model):
+    """Reference-counted, content-addressed file (see screenshots.storage)"""
+
+    name = models.CharField(max_length=255, unique=True, help_text="Storage name, derived from the content hash")
+    size = models.BigIntegerField(default=0, help_text="Size in bytes")
+    ref_count = models.PositiveIntegerField(default=0, help_text="Screenshot fields pointing at this file")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class StorageUsage(models.Model):
+    """Per-creator storage total, kept up to date incrementally (see screenshots.quota)"""
+
+    creator_id = models.CharField(max_length=100, unique=True)
+    bytes = models.BigIntegerField(default=0, help_text="Bytes referenced by the creator's screenshots")
+    files = models.IntegerField(default=0, help_text="Files referenced by the creator's screenshots")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'storage usage'
+
+    def __str__(self):
+        return f"{self.creator_id}: {self.bytes} bytes"
+
+
+class WebhookDelivery(models.Model):
+    """One webhook event waiting for (or done with) delivery, see screenshots.webhooks"""
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    DELIVERED = 'delivered'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (SENDING, 'Sending'), (DELIVERED, 'Delivered'), (FAILED, 'Failed')]
+
+    url = models.URLField(max_length=500)
+    event = models.CharField(max_length=100)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            # due events of one endpoint, batched into a single request
+            models.Index(fields=['url', 'status', 'next_attempt_at'], name='webhook_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} -> {self.url} ({self.status})"
+
+
+class CaptureProfile(models.Model):
+    """Profile of one generate_screenshots run, see screenshots.profiling"""
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='profiles')
+    task_id = models.CharField(max_length=255, blank=True, default='')
+    # artifact storage names (content-addressed, released when the row is deleted)
+    cpu_path = models.CharField(max_length=500, help_text="cProfile output (pstats format)")
+    summary_path = models.CharField(max_length=500, help_text="Plain-text summary of hotspots and allocations")
+    json_path = models.CharField(max_length=500, help_text="The summary as JSON")
+    summary = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Profile of {self.project_id} ({self.task_id})"
+
+    @property
+    def paths(self):
+        return [self.cpu_path, self.summary_path, self.json_path]
+
+    def urls(self):
+        from .storage import artifact_url
+        return {
+            'cpu': artifact_url(self.cpu_path),
+            'summary': artifact_url(self.summary_path),
+            'json': artifact_url(self.json_path),
+        }
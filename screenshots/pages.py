@@ -0,0 +1,185 @@
+# screenshots/pages.py
+"""
+Multi-page projects.
+
+A project normally captures its website_url. When it has page_urls (a list)
+or a sitemap_url (sitemap.xml, a sitemap index, optionally gzipped), every
+page listed there is captured instead, each Screenshot row recording its
+page_url. Two limits keep a crawl bounded:
+
+  max_pages  pages captured per run (at most SITE_MAX_PAGES)
+  max_depth  deepest URL path captured: / is 0, /blog is 1, /blog/post is 2
+             (empty = any depth)
+
+Sitemaps are refused past SITEMAP_MAX_BYTES, downloaded or decompressed, and
+on private / loopback addresses (unless SITEMAP_ALLOW_PRIVATE): every fetch and
+every redirect hop is checked, nested sitemaps included.
+
+Nested sitemap indexes are followed up to SITEMAP_MAX_NESTING levels.
+"""
+import logging
+import xml.etree.ElementTree as ElementTree
+import zlib
+from urllib.parse import urljoin, urlparse
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
+
+from . import addresses
+
+SITEMAP_MAX_REDIRECTS = 5
+
+
+def max_pages_limit():
+    return getattr(settings, 'SITE_MAX_PAGES', 500)
+
+
+def path_depth(url):
+    """Number of path segments of url ('/' is 0)"""
+    return len([part for part in urlparse(url).path.split('/') if part])
+
+
+def is_page_url(url):
+    try:
+        URLValidator(schemes=['http', 'https'])(url)
+    except ValidationError:
+        return False
+    return True
+
+
+def is_multi_page(project):
+    return bool(project.page_urls or project.sitemap_url)
+
+
+# ---------------------------
+# ✅ SITEMAPS
+# ---------------------------
+def max_sitemap_bytes():
+    return getattr(settings, 'SITEMAP_MAX_BYTES', 10 * 1024 * 1024)
+
+
+def gunzip(content, max_bytes):
+    """Decompress a gzipped sitemap, refusing more than max_bytes of output (a gzip bomb inflates 1000x)"""
+    inflater = zlib.decompressobj(wbits=31)
+    data = inflater.decompress(content, max_bytes)
+    if inflater.unconsumed_tail or (len(data) >= max_bytes and not inflater.eof):
+        raise ValueError(f'sitemap is larger than {max_bytes} bytes once decompressed')
+    return data
+
+
+def parse_sitemap(content):
+    """(kind, locations) of a sitemap document: kind is 'urlset' or 'sitemapindex'"""
+    if content[:2] == b'\x1f\x8b':
+        content = gunzip(content, max_sitemap_bytes())
+    root = ElementTree.fromstring(content)
+    # tags are namespaced ({http://www.sitemaps.org/schemas/sitemap/0.9}loc); match on the local name
+    kind = root.tag.rsplit('}', 1)[-1]
+    if kind not in ('urlset', 'sitemapindex'):
+        raise ValueError(f'not a sitemap (root element <{kind}>)')
+    locations = [el.text.strip() for el in root.iter() if el.tag.rsplit('}', 1)[-1] == 'loc' and el.text]
+    return kind, locations
+
+
+def check_sitemap_url(url):
+    """Raise ValueError when url is on a private address (and SITEMAP_ALLOW_PRIVATE is off)"""
+    if not getattr(settings, 'SITEMAP_ALLOW_PRIVATE', False):
+        try:
+            addresses.check_public_url(url)
+        except ValueError as e:
+            raise ValueError(f'sitemap {url} {e}')
+    return url
+
+
+def fetch_sitemap(url):
+    """Body of a sitemap, refused past SITEMAP_MAX_BYTES; redirects are followed one checked hop at a time"""
+    max_bytes = max_sitemap_bytes()
+    for _ in range(SITEMAP_MAX_REDIRECTS + 1):
+        check_sitemap_url(url)
+        with requests.get(url, timeout=getattr(settings, 'SITEMAP_TIMEOUT', 15), stream=True,
+                          allow_redirects=False) as response:
+            if response.is_redirect:
+                url = urljoin(url, response.headers['location'])
+                continue
+            response.raise_for_status()
+            content = bytearray()
+            for chunk in response.iter_content(64 * 1024):
+                content += chunk
+                if len(content) > max_bytes:
+                    raise ValueError(f'sitemap {url} is larger than {max_bytes} bytes')
+        return bytes(content)
+    raise ValueError(f'sitemap {url}: more than {SITEMAP_MAX_REDIRECTS} redirects')
+
+
+def sitemap_urls(sitemap_url, max_pages, max_depth=None):
+    """Page URLs listed by a sitemap (following nested indexes), within the limits"""
+    nesting = getattr(settings, 'SITEMAP_MAX_NESTING', 3)
+    pending, seen_sitemaps, urls = [(sitemap_url, 0)], set(), []
+    while pending and len(urls) < max_pages:
+        url, level = pending.pop(0)
+        if url in seen_sitemaps:
+            continue
+        seen_sitemaps.add(url)
+        kind, locations = parse_sitemap(fetch_sitemap(url))
+        if kind == 'sitemapindex':
+            if level < nesting:
+                pending.extend((location, level + 1) for location in locations)
+            else:
+                logging.warning(f"[Pages] {url}: sitemap index nested deeper than {nesting}, ignored")
+            continue
+        urls = limit_pages(urls + locations, max_pages, max_depth)
+    return urls
+
+
+def limit_pages(urls, max_pages, max_depth=None):
+    """http(s) URLs of urls, without duplicates, at most max_depth deep, the first max_pages only"""
+    pages = []
+    for url in dict.fromkeys(urls):
+        if len(pages) >= max_pages:
+            break
+        if is_page_url(url) and (max_depth is None or path_depth(url) <= max_depth):
+            pages.append(url)
+    return pages
+
+
+def page_urls(project):
+    """The pages a multi-page project captures this run"""
+    max_pages = min(project.max_pages, max_pages_limit())
+    if project.page_urls:
+        return limit_pages(project.page_urls, max_pages, project.max_depth)
+    urls = sitemap_urls(project.sitemap_url, max_pages, project.max_depth)
+    logging.info(f"[Pages] {project.sitemap_url}: {len(urls)} page(s) to capture")
+    return urls
+
+
+# ---------------------------
+# ✅ API INPUT
+# ---------------------------
+def clean_pages(data, project):
+    """Apply page_urls / sitemap_url / max_pages / max_depth from request data to project (raises ValueError)"""
+    if 'page_urls' in data:
+        urls = data['page_urls'] or []
+        if not isinstance(urls, list) or not all(isinstance(url, str) and is_page_url(url) for url in urls):
+            raise ValueError('page_urls must be a list of http(s) URLs')
+        if len(urls) > max_pages_limit():
+            raise ValueError(f'page_urls may list at most {max_pages_limit()} pages')
+        project.page_urls = list(dict.fromkeys(urls))
+
+    if 'sitemap_url' in data:
+        sitemap_url = data['sitemap_url'] or ''
+        if sitemap_url and not (isinstance(sitemap_url, str) and is_page_url(sitemap_url)):
+            raise ValueError('sitemap_url must be an http(s) URL')
+        project.sitemap_url = sitemap_url
+
+    if 'max_pages' in data:
+        max_pages = data['max_pages']
+        if not isinstance(max_pages, int) or isinstance(max_pages, bool) or not 1 <= max_pages <= max_pages_limit():
+            raise ValueError(f'max_pages must be a whole number from 1 to {max_pages_limit()}')
+        project.max_pages = max_pages
+
+    if 'max_depth' in data:
+        max_depth = data['max_depth']
+        if max_depth is not None and (not isinstance(max_depth, int) or isinstance(max_depth, bool) or max_depth < 0):
+            raise ValueError('max_depth must be a whole number, 0 or more')
+        project.max_depth = max_depth
@@ -0,0 +1,226 @@
+# screenshots/profiling.py
+"""
+Opt-in profiling of generate_screenshots ({"profile": true} on the generate request).
+
+A profiled run collects:
+
+  * a cProfile of the whole task, saved as cpu.prof (open it with
+    `python -m pstats` or snakeviz)
+  * tracemalloc snapshots around MockupService.create_mockup and
+    _fit_screenshot_to_device: time, peak and net Python allocations and
+    the top allocating lines of each call, plus the process RSS before and
+    after (Pillow's pixel buffers are not visible to tracemalloc)
+
+Both go into the artifact storage next to a plain-text and a JSON summary,
+and a CaptureProfile row points at them. Unprofiled runs never reach this module.
+"""
+import copy
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+
+from .memory import rss_bytes
+
+# allocation sites left out of the summaries (the measuring itself, imports)
+IGNORED_FILES = (tracemalloc.__file__, '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>',
+                 '<unknown>')
+
+
+class TaskProfiler:
+    """cProfile of a task plus tracemalloc measurements of the instrumented mockup calls"""
+
+    def __init__(self, top=None, frames=None):
+        self.top = top or getattr(settings, 'CAPTURE_PROFILE_TOP', 20)
+        self.frames = frames or getattr(settings, 'CAPTURE_PROFILE_FRAMES', 10)
+        self.profile = cProfile.Profile()
+        self.memory = []  # one record per instrumented call
+        self._stack = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.disable()
+        if self._started_tracing:
+            tracemalloc.stop()
+        return False
+
+    # ---------------------------
+    # ✅ MEMORY AROUND MOCKUP CALLS
+    # ---------------------------
+    def instrument(self, mockup_service):
+        """A copy of the service whose create_mockup / _fit_screenshot_to_device are measured"""
+        service = copy.copy(mockup_service)  # shares the decoded templates, leaves the original untouched
+        for name in ('create_mockup', '_fit_screenshot_to_device'):
+            method = getattr(type(service), name).__get__(service)
+            setattr(service, name, self._wrap(name, method))
+        return service
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def measured(*args, **kwargs):
+            return self._measure(name, method, args, kwargs)
+        return measured
+
+    def _fold_peak(self):
+        # reset_peak() is global: hand the peak so far to every open measurement first
+        _, peak = tracemalloc.get_traced_memory()
+        for frame in self._stack:
+            frame['peak'] = max(frame['peak'], peak)
+        tracemalloc.reset_peak()
+
+    def _measure(self, name, method, args, kwargs):
+        # the snapshots are bookkeeping, keep them out of the CPU profile
+        self.profile.disable()
+        self._fold_peak()
+        before = tracemalloc.take_snapshot()
+        current, _ = tracemalloc.get_traced_memory()
+        frame = {'peak': current}
+        self._stack.append(frame)
+        rss_before = rss_bytes()
+        self.profile.enable()
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - started
+            self.profile.disable()
+            self._fold_peak()
+            self._stack.pop()
+            net = tracemalloc.get_traced_memory()[0] - current
+            rss_after = rss_bytes()
+            diff = [stat for stat in tracemalloc.take_snapshot().compare_to(before, 'lineno')
+                    if stat.size_diff and stat.traceback[0].filename not in IGNORED_FILES]
+            self.memory.append({
+                'call': name,
+                'args': _describe(args),
+                'seconds': round(seconds, 4),
+                'peak_bytes': frame['peak'] - current,
+                'net_bytes': net,
+                'rss_before': rss_before,
+                'rss_after': rss_after,
+                'top': [
+                    {'where': str(stat.traceback[0]), 'size_diff': stat.size_diff, 'count_diff': stat.count_diff}
+                    for stat in diff[:self.top]
+                ],
+            })
+            self.profile.enable()
+
+    # ---------------------------
+    # ✅ REPORTS
+    # ---------------------------
+    def hotspots(self, sort='cumulative'):
+        stats = pstats.Stats(self.profile)
+        stats.sort_stats(sort)
+        rows = []
+        for func in stats.fcn_list[:self.top]:
+            calls, primitive, tottime, cumtime, _ = stats.stats[func]
+            filename, line, function = func
+            rows.append({
+                'function': f'{os.path.basename(filename)}:{line}({function})',
+                'calls': calls,
+                'tottime': round(tottime, 4),
+                'cumtime': round(cumtime, 4),
+            })
+        return rows
+
+    def summary(self):
+        return {
+            'hotspots': self.hotspots('cumulative'),
+            'self_time': self.hotspots('tottime'),
+            'memory': self.memory,
+        }
+
+    def summary_text(self, summary=None):
+        summary = summary or self.summary()
+        out = io.StringIO()
+        out.write('Hotspots (cumulative time)\n')
+        pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(self.top)
+        out.write('Hotspots (own time)\n')
+        pstats.Stats(self.profile, stream=out).sort_stats('tottime').print_stats(self.top)
+
+        out.write('Memory around mockup calls (Python allocations; pixel buffers show in RSS)\n\n')
+        for record in summary['memory']:
+            out.write(f"{record['call']}{record['args']}: {record['seconds']}s, "
+                      f"peak +{_mb(record['peak_bytes'])} MB, net {_mb(record['net_bytes'])} MB, "
+                      f"RSS {_mb(record['rss_before'])} -> {_mb(record['rss_after'])} MB\n")
+            for stat in record['top']:
+                out.write(f"    {stat['size_diff']:>+12,} B  {stat['count_diff']:>+7} blocks  {stat['where']}\n")
+            out.write('\n')
+        return out.getvalue()
+
+    def write(self, folder):
+        """Write cpu.prof, summary.txt and summary.json to folder; returns (paths, summary)"""
+        summary = self.summary()
+        paths = {
+            'cpu': os.path.join(folder, 'cpu.prof'),
+            'summary': os.path.join(folder, 'summary.txt'),
+            'json': os.path.join(folder, 'summary.json'),
+        }
+        self.profile.dump_stats(paths['cpu'])
+        with open(paths['summary'], 'w') as f:
+            f.write(self.summary_text(summary))
+        with open(paths['json'], 'w') as f:
+            json.dump(summary, f, indent=2)
+        return paths, summary
+
+
+def _describe(args):
+    """Short, log-friendly description of call arguments (images by size, paths by name)"""
+    parts = []
+    for arg in args:
+        if hasattr(arg, 'size') and hasattr(arg, 'mode'):
+            parts.append(f'<{arg.mode} {arg.size[0]}x{arg.size[1]}>')
+        elif isinstance(arg, str):
+            parts.append(os.path.basename(arg) or arg)
+        else:
+            parts.append(repr(arg))
+    return f"({', '.join(parts)})"
+
+
+def _mb(value):
+    return round(value / (1024 * 1024), 1)
+
+
+def save(profiler, project_id, task_id=''):
+    """Store the reports as artifacts and record a CaptureProfile; returns what the task result reports"""
+    from .models import CaptureProfile
+    from .storage import release, store_file
+
+    work_dir = tempfile.mkdtemp(prefix='profile_')
+    stored = []
+    try:
+        paths, summary = profiler.write(work_dir)
+        for key in ('cpu', 'summary', 'json'):
+            stored.append(store_file(paths[key]))
+        profile = CaptureProfile.objects.create(
+            project_id=project_id, task_id=task_id or '',
+            cpu_path=stored[0], summary_path=stored[1], json_path=stored[2], summary=summary,
+        )
+    except Exception:
+        for name in stored:
+            release(name)
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'id': profile.id,
+        'urls': profile.urls(),
+        'hotspots': summary['hotspots'][:5],
+        'memory': [{k: v for k, v in record.items() if k != 'top'} for record in summary['memory']],
+    }
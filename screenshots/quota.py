@@ -0,0 +1,197 @@
+# screenshots/quota.py
+"""
+Per-creator storage accounting and quota enforcement.
+
+Every Screenshot records the size of its files when they are written;
+StorageUsage keeps one running total per creator_id that is adjusted on
+create / update / delete, so reading the usage is a single-row lookup.
+Sizes are charged per reference: a file shared by two screenshots (see
+screenshots.storage) counts for both.
+
+When a creator is over STORAGE_QUOTA_BYTES, eviction brings usage down to
+STORAGE_QUOTA_TARGET_RATIO of the quota: first mockups (derivatives, can be
+rebuilt by regenerating) least recently served first, then whole
+screenshots superseded by a newer capture of the same device, oldest
+first. The latest original of every device is never evicted.
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import metrics
+from .models import Artifact, Project, Screenshot, StorageUsage
+from .storage import is_artifact, release
+
+EVICTION_BATCH = 100
+
+
+def quota_for(creator_id):
+    """Quota in bytes for a creator (STORAGE_QUOTA_OVERRIDES, then STORAGE_QUOTA_BYTES); None is unlimited"""
+    overrides = getattr(settings, 'STORAGE_QUOTA_OVERRIDES', {})
+    if str(creator_id) in overrides:
+        return overrides[str(creator_id)]
+    return getattr(settings, 'STORAGE_QUOTA_BYTES', None)
+
+
+def file_size(name):
+    """Size of a stored file: the Artifact row for CAS names, the file itself for legacy paths"""
+    if not name:
+        return 0
+    if is_artifact(name):
+        size = Artifact.objects.filter(name=name).values_list('size', flat=True).first()
+        if size is not None:
+            return size
+    full_path = os.path.join(settings.MEDIA_ROOT, name)
+    return os.path.getsize(full_path) if os.path.isfile(full_path) else 0
+
+
+def creator_of(project_id):
+    return Project.all_objects.filter(pk=project_id).values_list('creator_id', flat=True).first()
+
+
+def adjust_usage(creator_id, bytes_delta, files_delta=0):
+    """Add to a creator's running storage total (never below zero)"""
+    if creator_id is None or not (bytes_delta or files_delta):
+        return
+    StorageUsage.objects.get_or_create(creator_id=str(creator_id))
+    StorageUsage.objects.filter(creator_id=str(creator_id)).update(
+        bytes=Greatest(F('bytes') + bytes_delta, 0),
+        files=Greatest(F('files') + files_delta, 0),
+        updated_at=timezone.now(),
+    )
+
+
+def get_usage(creator_id):
+    """Current usage and quota of a creator"""
+    usage = StorageUsage.objects.filter(creator_id=str(creator_id)).values('bytes', 'files', 'updated_at').first()
+    usage = usage or {'bytes': 0, 'files': 0, 'updated_at': None}
+    quota = quota_for(creator_id)
+    return {
+        'creator_id': str(creator_id),
+        'bytes': usage['bytes'],
+        'files': usage['files'],
+        'quota_bytes': quota,
+        'used_ratio': round(usage['bytes'] / quota, 4) if quota else None,
+        'updated_at': usage['updated_at'].isoformat() if usage['updated_at'] else None,
+    }
+
+
+def recount_usage():
+    """Rebuild every creator's total from the recorded screenshot sizes; returns the number of creators"""
+    totals = {}
+    for creator_id, original_bytes, mockup_bytes, original_path, mockup_path in Screenshot.objects.values_list(
+        'project__creator_id', 'original_bytes', 'mockup_bytes', 'original_path', 'mockup_path'
+    ).iterator():
+        usage = totals.setdefault(creator_id, [0, 0])
+        usage[0] += original_bytes + mockup_bytes
+        usage[1] += int(bool(original_path)) + int(bool(mockup_path))
+
+    with transaction.atomic():
+        StorageUsage.objects.exclude(creator_id__in=list(totals)).delete()
+        for creator_id, (total_bytes, total_files) in totals.items():
+            StorageUsage.objects.update_or_create(
+                creator_id=creator_id, defaults={'bytes': total_bytes, 'files': total_files}
+            )
+    return len(totals)
+
+
+def touch(path):
+    """Record that a file was served, at most once per STORAGE_ACCESS_TOUCH_INTERVAL per path"""
+    interval = getattr(settings, 'STORAGE_ACCESS_TOUCH_INTERVAL', 300)
+    cache = caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+    try:
+        if not cache.add(f'media:touch:{path}', 1, interval):
+            return
+    except Exception as e:
+        logging.warning(f"[Quota] Access throttle unavailable: {e}")
+    Screenshot.objects.filter(Q(original_path=path) | Q(mockup_path=path)).update(last_accessed_at=timezone.now())
+
+
+def _creator_screenshots(creator_id):
+    return Screenshot.objects.filter(project__creator_id=str(creator_id))
+
+
+def _evict_mockups(creator_id, excess):
+    """Drop least recently served mockups until excess bytes are freed; returns (count, bytes)"""
+    count = freed = 0
+    candidates = (_creator_screenshots(creator_id).exclude(mockup_path='')
+                  .order_by(Coalesce('last_accessed_at', 'created_at'), 'id'))
+    while freed < excess:
+        batch = list(candidates[:EVICTION_BATCH])
+        if not batch:
+            break
+        for screenshot in batch:
+            name, size = screenshot.mockup_path, screenshot.mockup_bytes
+            with transaction.atomic():
+                screenshot.mockup_path = ''
+                screenshot.mockup_bytes = 0
+                screenshot.save(update_fields=['mockup_path', 'mockup_bytes'])
+                adjust_usage(creator_id, -size, -1)
+                release(name)
+            count += 1
+            freed += size
+            if freed >= excess:
+                break
+    return count, freed
+
+
+def _evict_old_generations(creator_id, excess):
+    """Delete screenshots a newer capture of the same device (and page) supersedes, oldest first; returns (count, bytes)"""
+    newer = Screenshot.objects.filter(
+        project=OuterRef('project'),
+        device_type=OuterRef('device_type'),
+        device_name=OuterRef('device_name'),
+        # pages of a multi-page project are separate captures, not generations of each other
+        page_url=OuterRef('page_url'),
+    ).filter(Q(created_at__gt=OuterRef('created_at')) | Q(created_at=OuterRef('created_at'), id__gt=OuterRef('id')))
+
+    count = freed = 0
+    candidates = _creator_screenshots(creator_id).filter(Exists(newer)).order_by('created_at', 'id')
+    while freed < excess:
+        batch = list(candidates[:EVICTION_BATCH])
+        if not batch:
+            break
+        for screenshot in batch:
+            # usage, counter, artifact references and caches are updated by the post_delete signals
+            screenshot.delete()
+            count += 1
+            freed += screenshot.stored_bytes
+            if freed >= excess:
+                break
+    return count, freed
+
+
+def enforce_quota(creator_id):
+    """Evict files until the creator is back under quota; returns a report, or None when within quota"""
+    quota = quota_for(creator_id)
+    if quota is None:
+        return None
+
+    used = get_usage(creator_id)['bytes']
+    if used <= quota:
+        return None
+
+    target = int(quota * getattr(settings, 'STORAGE_QUOTA_TARGET_RATIO', 0.9))
+    mockups, mockup_bytes = _evict_mockups(creator_id, used - target)
+    screenshots, screenshot_bytes = _evict_old_generations(creator_id, used - target - mockup_bytes)
+
+    metrics.incr('storage_evictions', mockups, kind='mockup')
+    metrics.incr('storage_evictions', screenshots, kind='screenshot')
+
+    after = get_usage(creator_id)['bytes']
+    report = {
+        'quota_bytes': quota,
+        'bytes_before': used,
+        'bytes_after': after,
+        'evicted_mockups': mockups,
+        'evicted_screenshots': screenshots,
+        'over_quota': after > quota,
+    }
+    logging.info(f"[Quota] Creator {creator_id} over quota, evicted {mockups} mockup(s) and {screenshots} screenshot(s): {report}")
+    return report
@@ -0,0 +1,119 @@
+# screenshots/scheduling.py
+"""
+Recurring captures.
+
+A project with a schedule_interval (minutes) is captured again every
+interval, for its schedule_devices (all device types when empty), exactly
+like a generate request: each run adds a new set of screenshots (the
+storage quota evicts old ones). Celery beat runs run_capture_schedules
+every minute; dispatch():
+
+  * claims the due projects by moving their next_capture_at forward (a
+    conditional UPDATE, so two schedulers never take the same project)
+  * groups them by domain and queues one capture_scheduled_batch task per
+    group of at most SCHEDULE_BATCH_SIZE, which captures them one after
+    another in a single browser context (HTTP cache, cookies and
+    connections are shared between pages of the same site)
+
+Start times are spread: a new schedule first runs at a random point of its
+first interval, and every run adds up to SCHEDULE_JITTER_SECONDS (at most
+a tenth of the interval) so schedules set up together don't stay aligned.
+"""
+import logging
+import random
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .models import Project
+
+DEVICE_TYPES = ('mobile', 'tablet', 'desktop')
+
+
+def domain_of(url):
+    """Host name a project's captures are grouped by (www. ignored)"""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def jitter_seconds(interval):
+    window = min(getattr(settings, 'SCHEDULE_JITTER_SECONDS', 300), interval * 60 / 10)
+    return random.uniform(0, window)
+
+
+def first_run(interval, now=None):
+    """When a new (or changed) schedule first fires: somewhere within its first interval"""
+    now = now or timezone.now()
+    return now + timedelta(seconds=random.uniform(0, interval * 60))
+
+
+def next_run(interval, now=None):
+    now = now or timezone.now()
+    return now + timedelta(minutes=interval, seconds=jitter_seconds(interval))
+
+
+def clean_schedule(data, project):
+    """Apply schedule_interval / schedule_devices from request data to project (raises ValueError)"""
+    if 'schedule_devices' in data:
+        devices = data['schedule_devices'] or []
+        if not isinstance(devices, list) or any(d not in DEVICE_TYPES for d in devices):
+            raise ValueError(f"schedule_devices must be a list of {', '.join(DEVICE_TYPES)}")
+        project.schedule_devices = list(dict.fromkeys(devices))
+
+    if 'schedule_interval' in data:
+        interval = data['schedule_interval']
+        minimum = getattr(settings, 'SCHEDULE_MIN_INTERVAL', 15)
+        if interval is not None and (not isinstance(interval, int) or isinstance(interval, bool) or interval < minimum):
+            raise ValueError(f'schedule_interval must be a whole number of minutes, at least {minimum}')
+        if interval != project.schedule_interval:
+            project.schedule_interval = interval
+            project.next_capture_at = first_run(interval) if interval else None
+
+
+def claim(project, now):
+    """Move a due project's next run forward; False if another scheduler got there first"""
+    return Project.objects.filter(id=project.id, next_capture_at=project.next_capture_at).update(
+        next_capture_at=next_run(project.schedule_interval, now)
+    ) == 1
+
+
+def batches(projects, size):
+    """[(domain, [projects])], at most size projects each"""
+    by_domain = {}
+    for project in projects:
+        by_domain.setdefault(domain_of(project.website_url), []).append(project)
+    return [
+        (domain, group[start:start + size])
+        for domain, group in by_domain.items()
+        for start in range(0, len(group), size)
+    ]
+
+
+def dispatch(now=None):
+    """Queue the captures of every due project; returns counts for the task result"""
+    from .tasks import capture_scheduled_batch
+
+    now = now or timezone.now()
+    limit = getattr(settings, 'SCHEDULE_DISPATCH_LIMIT', 500)
+    # schedules set without the API (admin, shell) get their first run spread like the others
+    for project in Project.objects.filter(schedule_interval__isnull=False, next_capture_at__isnull=True).only(
+            'id', 'schedule_interval')[:limit]:
+        Project.objects.filter(id=project.id, next_capture_at__isnull=True).update(
+            next_capture_at=first_run(project.schedule_interval, now))
+
+    due = (Project.objects.filter(schedule_interval__isnull=False, next_capture_at__lte=now)
+           .only('id', 'website_url', 'schedule_interval', 'next_capture_at')
+           .order_by('next_capture_at')[:limit])
+    claimed = [project for project in due if claim(project, now)]
+
+    groups = batches(claimed, getattr(settings, 'SCHEDULE_BATCH_SIZE', 10))
+    for domain, group in groups:
+        capture_scheduled_batch.delay([project.id for project in group])
+        logging.info(f"[Schedule] {domain}: {len(group)} project(s) queued in one batch")
+
+    metrics.incr('scheduled_captures', len(claimed))
+    metrics.incr('scheduled_batches', len(groups))
+    return {'due': len(claimed), 'batches': len(groups)}
@@ -1,26 +1,39 @@
+import io
 import os
 import logging
-from playwright.sync_api import sync_playwright
-import asyncio
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options as ChromeOptions
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
-from PIL import Image, ImageDraw, ImageFont , ImageOps
-import tempfile
-import uuid
-import requests
-
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+import math
+import struct
+import zlib
+from contextlib import contextmanager
+from PIL import Image, ImageOps
+
+from .engines import DEFAULT_ENGINES, ENGINES, capture_options, engine_class, page_folder
+from .timing import PhaseTimer
 
 
 class ScreenshotService:
-    """Service for capturing website screenshots using browser automation"""
+    """Service for capturing website screenshots using browser automation
+
+    The capture itself is done by engines (screenshots.engines), imported the
+    first time they are used and tried in the order given.
+    """
     
-    def __init__(self):
+    def __init__(self, max_capture_pixels=None, engines=None, health=None, engine_options=None, login_sessions=None):
+        # ✅ memory budget: full-page captures are clipped to this many pixels (None = no limit)
+        self.max_capture_pixels = max_capture_pixels
+        # ✅ capture engines, in order: devices one couldn't capture go to the next
+        self.engine_names = tuple(engines or DEFAULT_ENGINES)
+        unknown = [name for name in self.engine_names if name not in ENGINES]
+        if unknown:
+            raise ValueError(f"Unknown capture engine(s): {', '.join(unknown)}")
+        self._engines = {}
+        # ✅ extra constructor arguments per engine name, e.g. {'screenshotone': {'concurrency': 3}}
+        self.engine_options = engine_options or {}
+        # ✅ optional circuit breakers (screenshots.health.EngineHealth)
+        self.health = health
+        # ✅ optional logged-in captures: (project, sign_in) -> LoginSession or None (screenshots.auth.login_session)
+        self.login_sessions = login_sessions
+
         self.device_configs = {
             'mobile': {
                 'iPhone 12': {'width': 390, 'height': 844, 'user_agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15'},
@@ -39,379 +52,253 @@ class ScreenshotService:
             }
         }
     
-    def capture_screenshot(self, url, devices, output_folder, project):
-        """Capture screenshot for specified device type"""
-        logging.info("Main capture_screenshot function entered")
-        try:
-            logging.info("🎬 Trying Playwright for screenshots...")
-            return self._capture_with_playwright(url, devices, output_folder, project)        
-        except:
-            logging.info(f"[ScreenshotService] Playwright failed:", exc_info=True)
-            logging.info("⚡ Trying ScreenshotOne API For Web Screenshots...")
-            return self._capture_with_screenshotone(url, devices, output_folder)
-        # except Exception as e:
-        #     logging.error(f"[ScreenshotService] All Sreenshot Methods failed")
-        #     return [{'success': False, 'error': str(playwright_error)}]
-            
-            # -------------------------------------------------------------
-            
-            # Try Playwright first, then Selenium, finally placeholder
-        #     try:
-        #         logging.info("Main Function Entered")
-        #         return self._capture_with_playwright(url, device_name, config, output_folder)
-        #     except Exception as playwright_error:
-        #         logging.warning(f"Playwright failed, trying Selenium: {str(playwright_error)}")
-        #         # try:
-        #         #     return self._capture_with_selenium(url, device_name, config, output_folder)
-        #         # except Exception as selenium_error:
-        #         #     logging.warning(f"Selenium also failed, creating placeholder: {str(selenium_error)}")
-        #         return self._create_placeholder_screenshot(url, device_name, config, output_folder)
-                
-        # except Exception as e:
-        #     logging.error(f"Error capturing screenshot: {str(e)}")
-        #     return {'success': False, 'error': str(e)}
-    
-    
-    
-    # ---------------------------
-    # ✅ PLAYWRIGHT
-    # ---------------------------
-    def _capture_with_playwright(self, url, devices, output_folder, project):
-        """
-        Capture multiple screenshots in one Playwright session
-        (devices = list of (device_name, config, device_type))
-        """
-        results = []
-                    
-        # delay variables
-        # ✅ Use DB values if available, else fallback to hardcoded defaults
-        page_delay = project.page_delay if project and project.page_delay else 1000
-        scroll_delay = project.scroll_delay if project and project.scroll_delay else 50
-        timeout = project.timeout if project and project.timeout else 120000
-        navigation_timeout = timeout + 40000  # ✅ derived value
-
-        logging.info("[Playwright] Launching Chromium...")
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-accelerated-2d-canvas',
-                    '--no-first-run',
-                    '--no-zygote',
-                    '--disable-gpu',
-                    '--single-process',
-                ]
-            )
-            context = browser.new_context()
-            # ✅ set global timeouts
-            # ✅ get the timeout from project db through variables
-            context.set_default_timeout(timeout)
-            context.set_default_navigation_timeout(navigation_timeout)
-            
-            logging.info("[Playwright] Chromium Creating a Page")
-            page = context.new_page()
-            logging.info("[Playwright] Page Created")
-
-            try:
-                # ✅ Load page
-                logging.info(f"[Playwright] Navigating to {url}")
-                page.goto(url, wait_until="domcontentloaded", timeout=timeout)
-                # buffer delay for initial animations, gotten from db
-                page.wait_for_timeout(page_delay)  # ✅ user-configurable - can change
-
-                for device_name, config, device_type in devices:
-                    # logging.info(f"[Playwright] Switching to device {device_name} ({config['width']}x{config['height']}) , To Capture Screenshot")
-                    logging.info(f"[Playwright] Switching to device {device_name} , To Capture Screenshot")
-                    # ✅ Adjust viewport for device
-                    page.set_viewport_size({
-                        "width": config["width"],
-                        "height": config["height"]
-                    })
-
-                    # small pause for reflow
-                    # small pause after viewport change
-                    page.wait_for_timeout(1000)
-
-                    # ✅ Scroll step-by-step to trigger lazy-load / animations
-                    logging.info(f" → Scrolling to each section of this website : To capture each step/section and combine later")
-                    scroll_height = page.evaluate("document.body.scrollHeight")
-                    for pos in range(0, scroll_height, config["height"] // 2):
-                        page.evaluate(f"window.scrollTo(0, {pos})")
-                        # delay per scroll section of the website
-                        page.wait_for_timeout(scroll_delay) 
-
-                    # ✅ Scroll back to top before screenshot
-                    page.evaluate("window.scrollTo(0, 0)")
-                    # back to top delay
-                    page.wait_for_timeout(500)
-
-                    # ✅ Save screenshot
-                    safe_device_name = device_name.replace(" ", "_").lower()
-                    filename = f"{safe_device_name}_{config['width']}x{config['height']}.png"
-                    filepath = os.path.join(output_folder, filename)
-
-                    logging.info(f"[Playwright] Taking screenshot → {filename}")
-                    page.screenshot(
-                        path=filepath,
-                        full_page=True,
-                        type="png",
-                        timeout=timeout,
-                        animations="disabled",
-                        caret="hide"
-                    )
-
-                    logging.info(f"[Playwright] ✅ Screenshot saved: {filename}")
-                    results.append({
-                        'success': True,
-                        'path': filepath,
-                        'device_name': device_name,
-                        'width': config['width'],
-                        'height': config['height'],
-                        'filename': filename,
-                        'device_type': device_type,
-                    })
-                    
-                logging.info("[Playwright] All screenshots complete ✅")
-
-            except Exception as e:
-                logging.error(f"[Playwright] ❌ Error: {str(e)}", exc_info=True)
-                
-            finally:
-                browser.close()
-                logging.info("[Playwright] Browser closed")
-
-        return results
 
+    def engine(self, name):
+        """This service's instance of an engine, imported and created on first use"""
+        if name not in self._engines:
+            self._engines[name] = engine_class(name)(max_capture_pixels=self.max_capture_pixels,
+                                                     **self.engine_options.get(name, {}))
+        return self._engines[name]
 
+    def capture_screenshot(self, url, devices, output_folder, project, progress_callback=None):
+        """Capture screenshot for specified device type
 
-    # ---------------------------
-    # ✅ USING SCREENSHOTONE API FOR SCREENSHOT CAPTURE
-    # ---------------------------
-    def _capture_with_screenshotone(self, url, devices, output_folder):
-        """Fallback: ScreenshotOne API"""
-        results = []
-        base_api = "https://api.screenshotone.com/take"
-        # 🔑 ScreenshotOne API key
-        self.screenshotone_key = os.getenv("SCREENSHOTONE_KEY", "LI_FkMla6fscKA")
-
-        logging.info("[ScreenshotOne] Starting fallback capture...")
-
-        for device_name, config, device_type in devices:
-            params = {
-                "url": url,
-                "access_key": self.screenshotone_key,
-                "format": "png",
-                "viewport_width": str(config["width"]),
-                "viewport_height": str(config["height"]),
-                "full_page": "true",
-                "full_page_algorithm": "by_sections",
-                "full_page_scroll_delay": "1000",
-            }
+        Each engine gets the devices the previous ones couldn't capture; engines
+        whose circuit is open (see screenshots.health) are skipped, and so are
+        engines that can't carry a project's login. Returns one result per
+        device, failures included.
 
-            safe_device_name = device_name.replace(" ", "_").lower()
-            filename = f"{safe_device_name}_{config['width']}x{config['height']}.png"
-            filepath = os.path.join(output_folder, filename)
+        progress_callback (optional) is called with each device result as soon as it is saved
+        """
+        logging.info("Main capture_screenshot function entered")
+        return self._capture(url, devices, output_folder, self.options(project), self.engine_names,
+                             progress_callback)
+
+    def options(self, project):
+        """capture_options() of the project, plus its login session when it has a login recipe"""
+        options = capture_options(project)
+        if self.login_sessions and project is not None:
+            login = self.login_sessions(
+                project, lambda recipe: self.engine('playwright').sign_in(recipe, options['timeout']))
+            if login is not None:
+                options['login'] = login
+        return options
+
+    def _capture(self, url, devices, output_folder, options, engine_names, progress_callback=None):
+        """capture_screenshot() with options ready and a given list of engines"""
+        captured, failed = {}, {}
+        pending = list(devices)
+
+        def on_result(result):
+            # failures may still be captured by a later engine, so only report successes here
+            if progress_callback and result['success']:
+                progress_callback(result)
+
+        for name in engine_names:
+            if not pending:
+                break
+            if options.get('login') and not engine_class(name).supports_login:
+                logging.info(f"[ScreenshotService] Skipping {name}: can't capture logged in")
+                for device_name, _, device_type in pending:
+                    failed.setdefault(device_name, {
+                        'success': False, 'error': f"{name} can't capture logged in", 'device_name': device_name,
+                        'device_type': device_type, 'source': name,
+                    })
+                continue
+            if self.health and not self.health.allow(name):
+                logging.info(f"[ScreenshotService] Skipping {name}: circuit open")
+                continue
 
+            logging.info(f"🎬 Trying {name} for {len(pending)} device(s)...")
             try:
-                logging.info(f"[ScreenshotOne] Requesting screenshot for {device_name} → {url}")
-                # logging.debug(f"[ScreenshotOne] API Params: {params}")
-
-                r = requests.get(base_api, params=params, timeout=90)
-                r.raise_for_status()
-
-                with open(filepath, "wb") as f:
-                    f.write(r.content)
-
-                logging.info(f"[ScreenshotOne] ✅ Screenshot saved: {filename}")
-
-                results.append({
-                    "success": True,
-                    "path": filepath,
-                    "device_name": device_name,
-                    "width": config["width"],
-                    "height": config["height"],
-                    "filename": filename,
-                    "device_type": device_type,
-                    "source": "screenshotone"
-                })
+                results = {r['device_name']: r for r in
+                           self.engine(name).capture(url, pending, output_folder, options, on_result)}
+                error = 'no result returned'
             except Exception as e:
-                logging.error(f"[ScreenshotOne] ❌ Failed for {device_name}: {e}", exc_info=True)
-                results.append({
-                    "success": False,
-                    "error": str(e),
-                    "device_name": device_name,
-                    "device_type": device_type,
-                })
+                logging.info(f"[ScreenshotService] {name} failed:", exc_info=True)
+                results, error = {}, e
+
+            remaining = []
+            for device in pending:
+                device_name, _, device_type = device
+                result = results.get(device_name) or {
+                    'success': False, 'error': str(error), 'device_name': device_name,
+                    'device_type': device_type, 'source': name,
+                }
+                if result['success']:
+                    captured[device_name] = result
+                else:
+                    failed[device_name] = result
+                    remaining.append(device)
+            if self.health:
+                self.health.record(name, len(remaining) < len(pending))
+            pending = remaining
+
+        out = []
+        for device_name, _, device_type in devices:
+            result = captured.get(device_name) or failed.get(device_name) or {
+                'success': False, 'error': 'every capture engine is unavailable (circuit open)',
+                'device_name': device_name, 'device_type': device_type,
+            }
+            if not result['success']:
+                logging.error(f"[ScreenshotService] ❌ {device_name} not captured: {result['error']}")
+                if progress_callback:
+                    progress_callback(result)
+            out.append(result)
+        return out
+
+    def capture_previews(self, url, devices, output_folder, project, scale=0.5, quality=60):
+        """Quick above-the-fold, low-resolution captures shown while the full ones run; [] when unavailable
+
+        Only the first engine is asked, and only if it supports previews; its
+        circuit breaker isn't touched: a missing preview just means waiting for
+        the full capture.
+        """
+        name = self.engine_names[0]
+        if self.health and self.health.state(name)['state'] != 'closed':
+            return []
+        engine = self.engine(name)
+        if not engine.supports_preview:
+            return []
+        options = self.options(project)
+        options['preview'] = {'scale': scale, 'quality': quality}
+        try:
+            return engine.capture(url, devices, output_folder, options)
+        except Exception as e:
+            logging.warning(f"[ScreenshotService] No previews from {name}: {e}")
+            return []
 
-        logging.info("[ScreenshotOne] All devices processed ✅")
-        return results
+    def capture_pages(self, urls, devices, output_folder, project, concurrency=1):
+        """Capture devices on every page of urls; yields (url, results) as each page finishes
 
-    
+        The first engine crawls all pages (Playwright: concurrently, in one
+        browser context); devices it couldn't capture on a page, and pages left
+        when it fails altogether, go to the other engines as in capture_screenshot.
+        """
+        options = self.options(project)
+        first, fallbacks = self.engine_names[0], self.engine_names[1:]
+        done = set()
+
+        if options.get('login') and not engine_class(first).supports_login:
+            logging.info(f"[ScreenshotService] Skipping {first}: can't capture logged in")
+        elif self.health and not self.health.allow(first):
+            logging.info(f"[ScreenshotService] Skipping {first}: circuit open")
+        else:
+            try:
+                for index, results in self.engine(first).capture_pages(urls, devices, output_folder, options,
+                                                                        concurrency):
+                    if self.health:
+                        self.health.record(first, any(r['success'] for r in results))
+                    done.add(index)
+                    failed = [device for device, result in zip(devices, results) if not result['success']]
+                    if failed and fallbacks:
+                        retried = {r['device_name']: r for r in self._capture(
+                            urls[index], failed, page_folder(output_folder, index), options, fallbacks)}
+                        results = [retried.get(r['device_name'], r) for r in results]
+                    yield urls[index], results
+            except Exception:
+                logging.error(f"[ScreenshotService] {first} crawl failed after {len(done)} page(s):", exc_info=True)
+                if self.health:
+                    self.health.record(first, False)
+
+        for index, url in enumerate(urls):
+            if index not in done:
+                yield url, self._capture(url, devices, page_folder(output_folder, index), options, fallbacks)
+
+    @contextmanager
+    def session(self):
+        """Captures inside share one browser session (cache, cookies) when the first engine supports it"""
+        name = self.engine_names[0]
+        if self.health and self.health.state(name)['state'] == 'open':
+            yield  # the captures will skip this engine anyway
+            return
+        engine = self.engine(name)
+        if not hasattr(engine, 'session'):
+            yield
+            return
+        with engine.session():
+            yield
 
     # ---------------------------
-    # ✅ SELENIUM CAPTURE
+    # ✅ WARM BROWSER (one per worker process)
     # ---------------------------
-    def _capture_with_selenium(self, url, devices, output_folder):
-        """Capture multiple screenshots using Selenium as fallback to Playwright"""
-        results = []
-
-        for device_name, config, device_type in devices:
-            try:
-                chrome_options = ChromeOptions()
-                chrome_options.add_argument('--headless')
-                chrome_options.add_argument('--no-sandbox')
-                chrome_options.add_argument('--disable-dev-shm-usage')
-                chrome_options.add_argument('--disable-gpu')
-                chrome_options.add_argument('--disable-extensions')
-                chrome_options.add_argument('--disable-logging')
-                chrome_options.add_argument('--disable-web-security')
-                chrome_options.add_argument('--ignore-certificate-errors')
-                chrome_options.add_argument('--single-process')
-                chrome_options.add_argument('--disable-software-rasterizer')
-                chrome_options.add_argument('--disable-background-timer-throttling')
-                chrome_options.add_argument('--disable-backgrounding-occluded-windows')
-                chrome_options.add_argument('--disable-renderer-backgrounding')
-                chrome_options.add_argument(f'--window-size={config["width"]},{config["height"]}')
-                chrome_options.add_argument(f'--user-agent={config.get("user_agent", "Mozilla/5.0")}')
-
-                temp_dir = tempfile.mkdtemp(prefix=f'chrome_data_{uuid.uuid4().hex[:8]}_')
-                chrome_options.add_argument(f'--user-data-dir={temp_dir}')
-
-                driver = webdriver.Chrome(
-                    service=Service(ChromeDriverManager().install()),
-                    options=chrome_options
-                )
+    def start_browser(self):
+        """Launch the Playwright engine's long-lived Chromium (called by worker warm-up)"""
+        return self.engine('playwright').start_browser()
 
-                try:
-                    driver.set_window_size(config['width'], config['height'])
-                    driver.get(url)
+    def close_browser(self):
+        """Shut down every engine that was started"""
+        for engine in self._engines.values():
+            engine.close()
 
-                    WebDriverWait(driver, 10).until(
-                        EC.presence_of_element_located((By.TAG_NAME, "body"))
-                    )
-                    time.sleep(5)
+    def capture_bytes(self, url, config, timeout, delay=0, full_page=False, image_type='png', quality=None,
+                      allow_url=None):
+        """Capture one viewport on the warm browser and return the encoded image (nothing is written to disk)"""
+        return self.engine('playwright').capture_bytes(
+            url, config, timeout, delay=delay, full_page=full_page, image_type=image_type, quality=quality,
+            allow_url=allow_url,
+        )
 
-                    scroll_height = driver.execute_script("return document.body.scrollHeight")
-                    for y in range(0, scroll_height, config["height"] // 2):
-                        driver.execute_script(f"window.scrollTo(0, {y});")
-                        time.sleep(1)
 
-                    driver.execute_script("window.scrollTo(0, 0);")
-                    time.sleep(3)
 
-                    safe_device_name = device_name.replace(' ', '_').lower()
-                    filename = f"{safe_device_name}_{config['width']}x{config['height']}.png"
-                    filepath = os.path.join(output_folder, filename)
+# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++ MOCKUP SERVICES +++++++++++++++++++++++++++++++++++
 
-                    driver.save_screenshot(filepath)
 
-                    logging.info(f"[Selenium] Screenshot captured for {device_name}: {filepath}")
 
-                    results.append({
-                        'success': True,
-                        'path': filepath,
-                        'device_name': device_name,
-                        'width': config['width'],
-                        'height': config['height'],
-                        'filename': filename,
-                        'device_type': device_type,
-                        'source': 'selenium'
-                    })
+class ScreenshotTooLarge(Exception):
+    """A screenshot can't be decoded within the mockup's pixel budget"""
 
-                finally:
-                    driver.quit()
 
-            except Exception as e:
-                logging.error(f"[Selenium] ❌ Failed for {device_name}: {str(e)}", exc_info=True)
-                results.append({
-                    'success': False,
-                    'error': str(e),
-                    'device_name': device_name,
-                    'device_type': device_type,
-                    'source': 'selenium'
-                })
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# channels per PNG colour type (grey, RGB, palette, grey + alpha, RGBA)
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
 
-        return results
-
-    
-    
-    
-    # ---------------------------
-    # ✅ PLACEHOLDER CAPTURE
-    # ---------------------------
-    def _create_placeholder_screenshot(self, url, device_name, config, output_folder):
-        """Create a placeholder screenshot when browsers are unavailable"""
-        try:
-            # Generate filename
-            safe_device_name = device_name.replace(' ', '_').lower()
-            filename = f"{safe_device_name}_{config['width']}x{config['height']}.png"
-            filepath = os.path.join(output_folder, filename)
-            
-            # Create placeholder image
-            img = Image.new('RGB', (config['width'], config['height']), color='#f0f0f0')
-            draw = ImageDraw.Draw(img)
-            
-            try:
-                font = ImageFont.load_default()
-            except:
-                font = None
-            
-            # Draw placeholder content
-            text_lines = [
-                f"Screenshot Placeholder",
-                f"",
-                f"Device: {device_name}",
-                f"Resolution: {config['width']}x{config['height']}",
-                f"URL: {url}",
-                f"",
-                f"This is a placeholder image.",
-                f"In production, this would be a",
-                f"real screenshot of the website."
-            ]
-            
-            y = 50
-            for line in text_lines:
-                text_bbox = draw.textbbox((0, 0), line, font=font)
-                text_width = text_bbox[2] - text_bbox[0]
-                x = (config['width'] - text_width) // 2
-                draw.text((x, y), line, fill='#333333', font=font)
-                y += 30
-            
-            # Add a border
-            draw.rectangle([10, 10, config['width']-10, config['height']-10], outline='#cccccc', width=2)
-            
-            img.save(filepath, 'WEBP')
-            
-            logging.info(f"Placeholder screenshot created: {filepath}")
-            
-            return {
-                'success': True,
-                'path': filepath,
-                'device_name': device_name,
-                'width': config['width'],
-                'height': config['height'],
-                'filename': filename
-            }
-            
-        except Exception as e:
-            logging.error(f"Error creating placeholder screenshot: {str(e)}")
-            return {'success': False, 'error': str(e)}
 
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
 
 
-# ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++ MOCKUP SERVICES +++++++++++++++++++++++++++++++++++
+def png_top(path, rows):
+    """A PNG (bytes) of the first rows of the PNG at path, decompressing no further; None if it's interlaced
 
+    Each scanline is filtered against the one above only, so the first rows'
+    compressed-stream prefix is a complete image once the height is cut.
+    """
+    with open(path, 'rb') as f:
+        if f.read(8) != PNG_SIGNATURE:
+            return None
+        head, inflater, data = [], zlib.decompressobj(), b''
+        needed = None
+        while True:
+            length, kind = struct.unpack('>I4s', f.read(8))
+            chunk = f.read(length)
+            f.read(4)  # crc
+            if kind == b'IHDR':
+                width, _, bit_depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', chunk)
+                if interlace:
+                    return None
+                needed = rows * (1 + math.ceil(width * PNG_CHANNELS[color_type] * bit_depth / 8))
+                chunk = struct.pack('>II', width, rows) + chunk[8:]
+            if kind == b'IDAT':
+                data += inflater.decompress(chunk, needed - len(data))
+                if len(data) >= needed:
+                    break
+            elif kind == b'IEND':
+                break
+            else:
+                head.append(_png_chunk(kind, chunk))
+    return PNG_SIGNATURE + b''.join(head) + _png_chunk(b'IDAT', zlib.compress(data, 1)) + _png_chunk(b'IEND', b'')
 
 
 class MockupService:
     """Service for creating device mockups from screenshots using real device PNG overlays"""
 
-    def __init__(self):
+    def __init__(self, max_pixels=None):
         base_dir = os.path.join(os.path.dirname(__file__), "assets", "mockups")
 
+        # ✅ memory budget: most screenshot pixels decoded for one mockup (None = no limit)
+        self.max_pixels = max_pixels
+
         # ✅ Real device PNG overlays (must have transparent screen area)
         self.template_paths = {
             "mobile": os.path.join(base_dir, "mobile.png"),
@@ -426,6 +313,21 @@ class MockupService:
             "desktop": (415, 120, 4300, 2350),
         }
 
+        # decoded RGBA overlays, filled lazily (or up-front by load_templates)
+        self._templates = {}
+
+    def load_template(self, device_type):
+        """Return the decoded RGBA overlay for a device, decoding it only once"""
+        if device_type not in self._templates:
+            with Image.open(self.template_paths[device_type]) as template:
+                self._templates[device_type] = template.convert("RGBA")
+        return self._templates[device_type]
+
+    def load_templates(self):
+        """Decode every device overlay up-front (used by worker warm-up)"""
+        for device_type in self.template_paths:
+            self.load_template(device_type)
+
 
 
 
@@ -444,42 +346,54 @@ class MockupService:
 
             os.makedirs(output_folder, exist_ok=True)
 
-            # ✅ Load template (device overlay with transparent screen)
-            overlay = Image.open(self.template_paths[device_type]).convert("RGBA")
-
-            # ✅ Load screenshot
-            screenshot = Image.open(screenshot_path).convert("RGBA")
+            timer = PhaseTimer()
 
             # ✅ Get screen position
             left, top, right, bottom = self.screen_positions[device_type]
             screen_width = right - left
             screen_height = bottom - top
 
+            with timer.phase('mockup_decode'):
+                # ✅ Load template (device overlay with transparent screen)
+                overlay = self.load_template(device_type)
+
+                # ✅ Load screenshot (only the part the screen shows, within the pixel budget)
+                screenshot, source_height, guardrails = self._open_screenshot(screenshot_path, screen_width, screen_height)
+                screenshot = screenshot.convert("RGBA")
+
             # ✅ Resize screenshot to fit screen area
-            fitted_screenshot = self._fit_screenshot_to_device(screenshot, screen_width, screen_height)
+            with timer.phase('mockup_fit'):
+                fitted_screenshot = self._fit_screenshot_to_device(screenshot, screen_width, screen_height, source_height)
 
-            # ✅ Create base canvas same size as overlay
-            base = Image.new("RGBA", overlay.size, (0, 0, 0, 0))
+            with timer.phase('mockup_composite'):
+                # ✅ Create base canvas same size as overlay
+                base = Image.new("RGBA", overlay.size, (0, 0, 0, 0))
 
-            # ✅ Paste screenshot *first* (behind)
-            base.paste(fitted_screenshot, (left, top))
+                # ✅ Paste screenshot *first* (behind)
+                base.paste(fitted_screenshot, (left, top))
 
-            # ✅ Paste overlay on top (device frame)
-            base.alpha_composite(overlay)
+                # ✅ Paste overlay on top (device frame)
+                base.alpha_composite(overlay)
 
             # ✅ Save result
             base_filename = os.path.basename(screenshot_path)
             name, ext = os.path.splitext(base_filename)
             mockup_filename = f"mockup_{name}{ext}"
             mockup_path = os.path.join(output_folder, mockup_filename)
-            base.save(mockup_path, "WEBP")
+            with timer.phase('mockup_encode'):
+                base.save(mockup_path, "WEBP")
 
             return {
                 'success': True,
                 'path': mockup_path,
-                'filename': mockup_filename
+                'filename': mockup_filename,
+                'timings': timer.take(),
+                'guardrails': guardrails,
             }
 
+        except ScreenshotTooLarge as e:
+            logging.warning(f"[MockupService] {e}")
+            return {'success': False, 'error': str(e), 'guardrails': [{'kind': 'rejected', 'detail': str(e)}]}
         except Exception as e:
             logging.error(f"[MockupService] Error creating mockup: {str(e)}", exc_info=True)
             return {'success': False, 'error': str(e)}
@@ -489,24 +403,75 @@ class MockupService:
 
 
 
+    # ---------------------------
+    # ✅ DECODE WITHIN THE MEMORY BUDGET
+    # ---------------------------
+    def _open_screenshot(self, screenshot_path, target_width, target_height):
+        """Open a screenshot decoding no more than the mockup shows
+
+        Returns (image, full height of the page in image pixels, guardrails).
+
+        Raises ScreenshotTooLarge when it can't be brought within max_pixels.
+        """
+        guardrails = []
+        try:
+            screenshot = Image.open(screenshot_path)
+        except Image.DecompressionBombError as e:
+            raise ScreenshotTooLarge(f"Screenshot exceeds Image.MAX_IMAGE_PIXELS: {e}")
+        width, height = screenshot.size
+
+        # the fit keeps the top rows only; decode those (plus the LANCZOS kernel's reach) from PNGs
+        rows = math.ceil(width * target_height / target_width) + math.ceil(3 * max(1, width / target_width)) + 1
+        if rows < height and screenshot.format == 'PNG':
+            try:
+                top = png_top(screenshot_path, rows)
+            except (struct.error, zlib.error, KeyError):
+                top = None  # damaged or unusual PNG: decode it whole
+            if top:
+                screenshot.close()
+                screenshot = Image.open(io.BytesIO(top))
+
+        pixels = screenshot.width * screenshot.height
+        if self.max_pixels and pixels > self.max_pixels:
+            if screenshot.format != 'JPEG':
+                raise ScreenshotTooLarge(
+                    f"Screenshot {width}x{height} needs {pixels} pixels decoded, over MOCKUP_MAX_PIXELS {self.max_pixels}"
+                )
+            # JPEG decodes straight to 1/2, 1/4 or 1/8 scale
+            factor = min(8, 2 ** math.ceil(math.log2(math.sqrt(pixels / self.max_pixels))))
+            screenshot.draft('RGB', (math.ceil(width / factor), math.ceil(height / factor)))
+            guardrails.append({
+                'kind': 'downscaled',
+                'detail': f'screenshot {width}x{height} decoded at {screenshot.width}x{screenshot.height} '
+                          f'(MOCKUP_MAX_PIXELS {self.max_pixels})',
+            })
+            return screenshot, screenshot.height, guardrails
+        return screenshot, height, guardrails
+
     # ---------------------------
     # ✅ FIT SCREENSHOT TO MOCKUP DEVICE BY CUTTING IT DEPENDING ON SIZE
     # ---------------------------
-    def _fit_screenshot_to_device(self, screenshot, target_width, target_height):
-        """Resize + crop screenshot to fill the mockup screen area properly"""
+    def _fit_screenshot_to_device(self, screenshot, target_width, target_height, source_height=None):
+        """Resize + crop screenshot to fill the mockup screen area properly
+
+        source_height is the page's full height when only its top rows were decoded
+        """
         try:
             original_width, original_height = screenshot.size
+            source_height = source_height or original_height
 
             # Scale to match width
             scale = target_width / original_width
             new_width = target_width
-            new_height = int(original_height * scale)
-            resized = screenshot.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            new_height = int(source_height * scale)
 
             # Crop or pad vertically
             if new_height > target_height:
-                return resized.crop((0, 0, target_width, target_height))
+                # resample only the rows that stay: same pixels as resizing everything, then cropping
+                box = (0, 0, original_width, target_height * source_height / new_height)
+                return screenshot.resize((target_width, target_height), Image.Resampling.LANCZOS, box=box)
             else:
+                resized = screenshot.resize((new_width, new_height), Image.Resampling.LANCZOS)
                 background = Image.new("RGBA", (target_width, target_height), (255, 255, 255, 255))
                 background.paste(resized, (0, 0))
                 return background
@@ -0,0 +1,57 @@
+# screenshots/signals.py
+from django.db import transaction
+from django.db.models import F, PositiveIntegerField
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import invalidate_project
+from .quota import adjust_usage
+from .storage import release
+from .models import CaptureProfile, Project, Screenshot, screenshot_counter_enabled
+
+
+def adjust_screenshot_counter(project_id, delta):
+    """Add delta to a project's denormalized screenshot counter (never below zero)
+
+    updated_at is bumped as well so project lists revalidate (Last-Modified) when screenshots change
+    """
+    changes = {'updated_at': timezone.now()}
+    if screenshot_counter_enabled() and delta:
+        changes['screenshot_counter'] = Greatest(F('screenshot_counter') + delta, 0, output_field=PositiveIntegerField())
+    Project.objects.filter(pk=project_id).update(**changes)
+
+
+@receiver(post_save, sender=Screenshot)
+def screenshot_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_screenshot_counter(instance.project_id, 1)
+        adjust_usage(instance.project.creator_id, instance.stored_bytes, instance.stored_files)
+
+
+@receiver(post_delete, sender=Screenshot)
+def screenshot_deleted(sender, instance, **kwargs):
+    adjust_screenshot_counter(instance.project_id, -1)
+    adjust_usage(instance.project.creator_id, -instance.stored_bytes, -instance.stored_files)
+    # drop the artifact references; unreferenced files are removed after commit
+    release(instance.original_path)
+    release(instance.mockup_path)
+
+
+@receiver(post_delete, sender=CaptureProfile)
+def profile_deleted(sender, instance, **kwargs):
+    for name in instance.paths:
+        release(name)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_project(instance.pk))
+
+
+@receiver(post_save, sender=Screenshot)
+@receiver(post_delete, sender=Screenshot)
+def screenshot_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_project(instance.project_id))
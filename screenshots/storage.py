@@ -0,0 +1,160 @@
+# screenshots/storage.py
+"""
+Content-addressed, deduplicated storage for screenshots and mockups.
+
+Files are named by the SHA-256 of their bytes (cas/ab/cd/<digest>.<ext>),
+so identical captures are written once no matter which project or
+regeneration produced them. Each stored file has an Artifact row counting
+the Screenshot fields that point at it; the file is removed when the last
+reference is released.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import transaction
+from django.db.models import F
+
+CAS_PREFIX = 'cas'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names every file after the hash of its content"""
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        ext = os.path.splitext(name or '')[1].lower()
+        return self._save(self.name_for(self.digest(content), ext), content)
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # same name means same bytes: nothing to write
+            return name
+
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+
+        # write to a temp file and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                content.seek(0)
+                for chunk in content.chunks():
+                    f.write(chunk)
+            os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+            os.replace(tmp_path, full_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # never rename: a clash is the same content
+        return name
+
+    @staticmethod
+    def digest(content):
+        sha = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha.update(chunk)
+        return sha.hexdigest()
+
+    @staticmethod
+    def name_for(digest, ext=''):
+        return f"{CAS_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+
+def artifact_storage():
+    return storages['artifacts']
+
+
+def is_artifact(name):
+    return bool(name) and name.startswith(f'{CAS_PREFIX}/')
+
+
+def artifact_url(name):
+    """URL for a Screenshot path; legacy (pre-CAS) paths are still under MEDIA_URL"""
+    if not name:
+        return None
+    if is_artifact(name):
+        return artifact_storage().url(name)
+    return f"{settings.MEDIA_URL}{name}"
+
+
+def artifact_path(name):
+    """Absolute filesystem path for a Screenshot path (CAS or legacy)"""
+    if not name:
+        return None
+    if is_artifact(name):
+        return artifact_storage().path(name)
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def store_file(local_path, ext=None):
+    """Store a local file by content and take one reference on it; returns the storage name"""
+    from .models import Artifact
+
+    storage = artifact_storage()
+    ext = ext if ext is not None else os.path.splitext(local_path)[1].lower()
+    with open(local_path, 'rb') as f:
+        name = storage.save(f"upload{ext}", File(f))
+
+    with transaction.atomic():
+        artifact, created = Artifact.objects.select_for_update().get_or_create(
+            name=name, defaults={'size': storage.size(name), 'ref_count': 1}
+        )
+        if not created:
+            Artifact.objects.filter(pk=artifact.pk).update(ref_count=F('ref_count') + 1)
+            # a concurrent release may have removed the file after we checked for it
+            if not storage.exists(name):
+                with open(local_path, 'rb') as f:
+                    storage.save(f"upload{ext}", File(f))
+    return name
+
+
+def retain(name):
+    """Take one more reference on an already stored artifact"""
+    from .models import Artifact
+
+    if is_artifact(name):
+        Artifact.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def release(name):
+    """Drop one reference; the file is deleted (after commit) once nothing points at it"""
+    from .models import Artifact
+
+    if not is_artifact(name):
+        return
+
+    with transaction.atomic():
+        artifact = Artifact.objects.select_for_update().filter(name=name).first()
+        if artifact is None:
+            return
+        if artifact.ref_count > 1:
+            Artifact.objects.filter(pk=artifact.pk).update(ref_count=F('ref_count') - 1)
+            return
+        artifact.delete()
+
+    transaction.on_commit(lambda: _delete_if_unreferenced(name))
+
+
+def _delete_if_unreferenced(name):
+    from .models import Artifact
+
+    # re-check: the same content may have been stored again in the meantime
+    if Artifact.objects.filter(name=name).exists():
+        return
+    try:
+        artifact_storage().delete(name)
+    except OSError as e:
+        logging.warning(f"[Storage] Could not delete {name}: {e}")
@@ -1,28 +1,275 @@
 # screenshots/tasks.py
 import logging
 from celery import shared_task
-from .services import ScreenshotService, MockupService
 from .models import Project, Screenshot
+from .caching import invalidate_project
+from . import cleanup, metrics, pages, profiling, quota, scheduling, webhooks
+from .signals import adjust_screenshot_counter
+from .storage import store_file, release
+from .timing import PhaseTimer
+from .worker import get_screenshot_service, get_mockup_service
 from django.conf import settings
+from django.db import transaction
 import os
+import shutil
+import tempfile
+import time
+from contextlib import nullcontext
+
+
+def make_work_folders(prefix):
+    """Scratch folders for one capture; finished files are moved into the artifact storage"""
+    work_dir = tempfile.mkdtemp(prefix=prefix)
+    normal_folder = os.path.join(work_dir, 'normal_screenshots')
+    mockup_folder = os.path.join(work_dir, 'mockup_screenshots')
+    os.makedirs(normal_folder)
+    os.makedirs(mockup_folder)
+    return work_dir, normal_folder, mockup_folder
+
+
+def report_progress(task, stage, **meta):
+    """Publish a PROGRESS state for the running task (no-op when run outside a worker)"""
+    if not task.request.id or task.request.is_eager:
+        return
+    try:
+        task.update_state(state='PROGRESS', meta={'stage': stage, **meta})
+    except Exception as e:
+        logging.warning(f"[Celery] Could not report progress ({stage}): {e}")
+
+def record_timings(timings, device_type):
+    """Feed phase timings into the shared capture_phase_seconds histograms (served at /metrics)"""
+    for phase, seconds in timings.items():
+        metrics.observe('capture_phase_seconds', seconds, phase=phase, device_type=device_type)
+
+
+def record_cost(results):
+    """Count the paid API usage (e.g. ScreenshotOne credits) capture results report"""
+    for result in results:
+        cost = result.get('cost')
+        if cost:
+            metrics.incr('capture_api_credits', cost['credits'], engine=result.get('source'))
+            metrics.incr('capture_api_attempts', cost['attempts'], engine=result.get('source'))
+
+
+def collect_guardrails(guardrails, result, device_type, stage):
+    """Add the truncations / downscales a capture or mockup step reported to the task's list"""
+    for entry in result.get('guardrails') or []:
+        guardrails.append({**entry, 'device_type': device_type, 'stage': stage})
+        metrics.incr('capture_guardrails', kind=entry['kind'], stage=stage)
+        logging.warning(f"[Memory] {device_type} {stage}: {entry['kind']} - {entry['detail']}")
+
+
+def failure_entry(sr, **extra):
+    """What the task result reports about a device no engine could capture"""
+    return {'device_type': sr['device_type'], 'device_name': sr['device_name'],
+            'error': sr.get('error'), 'source': sr.get('source'), **extra}
+
+
+def build_screenshot(project, sr, mockup_service, mockup_folder, stored, guardrails, page_url=''):
+    """Mockup + storage for one captured device; returns the (unsaved) Screenshot row
+
+    Stored artifact names are appended to stored, so they can be released if the row is never saved
+    """
+    collect_guardrails(guardrails, sr, sr['device_type'], 'capture')
+
+    logging.info(f"[celery] Generating Mockup For → {sr['device_type']}")
+    mockup_result = mockup_service.create_mockup(
+        sr['path'],
+        sr['device_type'],
+        mockup_folder
+    )
+    collect_guardrails(guardrails, mockup_result, sr['device_type'], 'mockup')
+
+    timer = PhaseTimer()
+    with timer.phase('storage'):
+        # ✅ content-addressed: identical captures share one file
+        original_name = store_file(sr['path'])
+        stored.append(original_name)
+        mockup_name = ''
+        if mockup_result['success']:
+            mockup_name = store_file(mockup_result['path'], ext='.webp')
+            stored.append(mockup_name)
+
+    return Screenshot(
+        project=project,
+        device_type=sr['device_type'],
+        device_name=sr['device_name'],
+        width=sr['width'],
+        height=sr['height'],
+        original_path=original_name,
+        mockup_path=mockup_name,
+        page_url=page_url,
+        original_bytes=quota.file_size(original_name),
+        mockup_bytes=quota.file_size(mockup_name),
+        timings={**sr.get('timings', {}), **mockup_result.get('timings', {}), **timer.take()},
+    )
+
+
+def save_screenshots(project, screenshots, stored, replacements=()):
+    """INSERT the rows together with the counter and quota updates; returns the db_write timings
+
+    replacements: (preview row, full capture) pairs, written onto the preview rows in the same transaction
+    """
+    replaced, old_names, replaced_bytes, replaced_files = replace_previews(replacements)
+    db_timer = PhaseTimer()
+    try:
+        with db_timer.phase('db_write'), transaction.atomic():
+            Screenshot.objects.bulk_create(screenshots)
+            adjust_screenshot_counter(project.id, len(screenshots))
+            quota.adjust_usage(project.creator_id,
+                               sum(s.stored_bytes for s in screenshots) + replaced_bytes,
+                               sum(s.stored_files for s in screenshots) + replaced_files)
+            if replaced:
+                Screenshot.objects.bulk_update(replaced, REPLACED_FIELDS)
+                for name in old_names:
+                    release(name)
+    except Exception:
+        for name in stored:
+            release(name)
+        raise
+    invalidate_project(project.id)
+    return db_timer.take()
+
+
+def screenshot_result(screenshot):
+    result = {
+        "id": screenshot.id,
+        "device_type": screenshot.device_type,
+        "original_path": screenshot.original_path,
+        "mockup_path": screenshot.mockup_path,
+        "timings": screenshot.timings,
+    }
+    if screenshot.page_url:
+        result["page_url"] = screenshot.page_url
+    return result
+
+
+# what a full capture overwrites on the preview row it replaces
+REPLACED_FIELDS = ['width', 'height', 'original_path', 'mockup_path', 'original_bytes', 'mockup_bytes', 'timings',
+                   'is_preview']
+
+
+def replace_previews(replacements):
+    """Copy each full capture onto its preview row (kept, with its id); returns (rows, released names, bytes, files)"""
+    rows, old_names = [], []
+    delta_bytes = delta_files = 0
+    for preview, full in replacements:
+        old_names += [preview.original_path, preview.mockup_path]
+        delta_bytes -= preview.stored_bytes
+        delta_files -= preview.stored_files
+        for field in REPLACED_FIELDS:
+            setattr(preview, field, getattr(full, field))
+        delta_bytes += preview.stored_bytes
+        delta_files += preview.stored_files
+        rows.append(preview)
+    return rows, old_names, delta_bytes, delta_files
+
+
+def save_previews(task, project, device_list, screenshot_service, mockup_service, folder, mockup_folder, progress,
+                  started):
+    """Phase one: quick viewport captures + mockups, saved and announced before the full capture
+
+    Returns {device_type: preview row} (empty when the first engine can't make previews)
+    """
+    os.makedirs(folder, exist_ok=True)
+    results = screenshot_service.capture_previews(
+        project.website_url, device_list, folder, project,
+        scale=getattr(settings, 'PREVIEW_SCALE', 0.5), quality=getattr(settings, 'PREVIEW_QUALITY', 60),
+    )
+    stored, rows = [], {}
+    for sr in results:
+        if sr['success']:
+            row = build_screenshot(project, sr, mockup_service, mockup_folder, stored, [])
+            row.is_preview = True
+            rows[sr['device_type']] = row
+    if not rows:
+        return {}
+
+    save_screenshots(project, list(rows.values()), stored)
+    # ✅ the first image the user can see
+    first_image = time.perf_counter() - started
+    metrics.observe('capture_time_to_first_image_seconds', first_image, phase='preview')
+    for device_type, row in rows.items():
+        progress['devices'][device_type].update(stage='preview', preview=screenshot_result(row))
+    progress['first_image_seconds'] = round(first_image, 3)
+    report_progress(task, 'preview', **progress)
+    logging.info(f"[Preview] Project {project.id}: {len(rows)} preview(s) after {first_image:.2f}s")
+    return rows
+
+
+def discard_previews(rows):
+    """Delete preview rows whose full capture never came (their artifacts and quota are released)"""
+    ids = [row.id for row in rows]
+    if not ids:
+        return
+    try:
+        with transaction.atomic():
+            # rows already replaced by their full capture are not previews any more, and stay
+            Screenshot.objects.filter(id__in=ids, is_preview=True).delete()
+        logging.info(f"[Preview] Dropped {len(ids)} preview(s) without a full capture")
+    except Exception as e:
+        logging.error(f"[Preview] Could not drop previews {ids}: {e}", exc_info=True)
+
+
+def notify_completion(task, project_id, webhook_url, result):
+    """Queue the completion webhook (the request's URL, else the project's) with the task result"""
+    try:
+        if webhook_url is None:
+            webhook_url = Project.all_objects.filter(id=project_id).values_list('webhook_url', flat=True).first()
+        if webhook_url:
+            webhooks.notify(webhook_url, 'screenshots.completed',
+                            dict(result, project_id=project_id, task_id=task.request.id))
+    except Exception as e:
+        logging.error(f"[Webhook] Could not queue completion of project {project_id}: {e}", exc_info=True)
 
-def make_relative_path(abs_path):
-    return os.path.relpath(abs_path, settings.MEDIA_ROOT).replace("\\", "/")
 
 @shared_task(bind=True)
-def generate_screenshots(self, project_id, devices=None):
-    """Background task to generate screenshots + mockups"""
+def generate_screenshots(self, project_id, devices=None, webhook_url=None, profile=False):
+    """Background task to generate screenshots + mockups (webhook_url overrides the project's)"""
+    if profile:
+        result = _profiled_generate_screenshots(self, project_id, devices)
+    else:
+        result = _generate_screenshots(self, project_id, devices)
+    notify_completion(self, project_id, webhook_url, result)
+    return result
+
+
+def _profiled_generate_screenshots(self, project_id, devices):
+    """Run the task under cProfile + tracemalloc and keep the reports as artifacts"""
+    profiler = profiling.TaskProfiler()
+    with profiler:
+        result = _generate_screenshots(self, project_id, devices, profiler=profiler)
+    try:
+        result['profile'] = profiling.save(profiler, project_id, self.request.id)
+        logging.info(f"[Profile] Project {project_id} profiled → {result['profile']['urls']['summary']}")
+    except Exception as e:
+        logging.error(f"[Profile] Could not save the profile of project {project_id}: {e}", exc_info=True)
+        result['profile'] = {'error': str(e)}
+    return result
+
+
+def _generate_screenshots(self, project_id, devices, profiler=None, preview=True):
+    started = time.perf_counter()
+    work_dir = None
+    previews = {}  # preview rows still standing in for their full capture
     try:
         project = Project.objects.get(id=project_id)
         devices = devices or ['mobile', 'tablet', 'desktop']
 
-        normal_folder = project.get_normal_screenshots_folder()
-        mockup_folder = project.get_mockup_screenshots_folder()
-        os.makedirs(normal_folder, exist_ok=True)
-        os.makedirs(mockup_folder, exist_ok=True)
+        work_dir, normal_folder, mockup_folder = make_work_folders(f'capture_{project.id}_')
 
-        screenshot_service = ScreenshotService()
-        mockup_service = MockupService()
+        screenshot_service = get_screenshot_service()
+        mockup_service = get_mockup_service()
+        if profiler:
+            mockup_service = profiler.instrument(mockup_service)
+
+        # ✅ per-device progress, pushed to the result backend as it changes
+        progress = {
+            'project_id': project.id,
+            'total': 0,
+            'completed': 0,
+            'devices': {},
+        }
 
         # ✅ Build all device configs in one list
         device_list = []
@@ -33,117 +280,227 @@ def generate_screenshots(self, project_id, devices=None):
             device_name = list(screenshot_service.device_configs[device_type].keys())[0]
             config = screenshot_service.device_configs[device_type][device_name]
             device_list.append((device_name, config, device_type))
+            progress['devices'][device_type] = {'stage': 'pending', 'device_name': device_name}
+
+        if pages.is_multi_page(project):
+            return _generate_page_screenshots(self, project, device_list, normal_folder, mockup_folder,
+                                              screenshot_service, mockup_service)
+
+        progress['total'] = len(device_list)
+        report_progress(self, 'capturing', **progress)
+
+        def on_captured(sr):
+            progress['devices'][sr['device_type']]['stage'] = 'captured' if sr['success'] else 'failed'
+            report_progress(self, 'capturing', **progress)
 
-        
         logging.info("Celery Task Started : taking screenshot")
-        # ✅ Capture screenshots through wrapper
-        screenshot_results = screenshot_service.capture_screenshot(
-            project.website_url,
-            device_list,
-            normal_folder,
-            project
-        )
+        preview = preview and getattr(settings, 'CAPTURE_PREVIEW', True)
+        # ✅ both phases share one browser session: the full capture loads the page from a warm cache
+        with screenshot_service.session() if preview else nullcontext():
+            if preview:
+                previews = save_previews(self, project, device_list, screenshot_service, mockup_service,
+                                         os.path.join(normal_folder, 'preview'), mockup_folder, progress, started)
+
+            # ✅ Capture screenshots through wrapper
+            screenshot_results = screenshot_service.capture_screenshot(
+                project.website_url,
+                device_list,
+                normal_folder,
+                project,
+                progress_callback=on_captured
+            )
+        record_cost(screenshot_results)
         logging.info("Celery Task Continues : screenshot gotten")
+        report_progress(self, 'mockups', **progress)
 
 
-        results = []
+        screenshots = []
+        stored = []  # artifact references taken, released again if the rows are never saved
+        guardrails = []  # memory-budget truncations / downscales, reported in the result
+        failed = []  # devices no capture engine could capture
         for sr in screenshot_results:
+            if not sr['success']:
+                failed.append(failure_entry(sr))
             if sr['success']:
-                
-                logging.info(f"[celery] Generating Mockup For → {sr['device_type']}")
-                mockup_result = mockup_service.create_mockup(
-                    sr['path'],
-                    sr['device_type'],
-                    mockup_folder
-                )
+                screenshot = build_screenshot(project, sr, mockup_service, mockup_folder, stored, guardrails)
+                screenshots.append(screenshot)
 
-                screenshot = Screenshot.objects.create(
-                    project=project,
-                    device_type=sr['device_type'],
-                    device_name=sr['device_name'],
-                    width=sr['width'],
-                    height=sr['height'],
-                    original_path=make_relative_path(sr['path']),
-                    mockup_path=make_relative_path(mockup_result['path']) if mockup_result['success'] else ''
+                progress['completed'] += 1
+                progress['devices'][sr['device_type']].update(
+                    stage='mockup',
+                    original_path=screenshot.original_path,
+                    mockup_path=screenshot.mockup_path,
                 )
+                report_progress(self, 'mockups', **progress)
+
+        # ✅ one INSERT for every device, committed together with the counter update;
+        # devices that had a preview update its row instead
+        replacements = [(previews[s.device_type], s) for s in screenshots if s.device_type in previews]
+        new_rows = [s for s in screenshots if s.device_type not in previews]
+        db_timings = save_screenshots(project, new_rows, stored, replacements)
+        replaced = [preview for preview, _ in replacements]
+        # a device whose full capture failed loses its preview too: it is reported in 'failed' instead
+        discard_previews([row for row in previews.values() if row not in replaced])
+        had_previews, previews = bool(previews), {}
+        screenshots = new_rows + replaced
+        if not had_previews and screenshots:
+            metrics.observe('capture_time_to_first_image_seconds', time.perf_counter() - started, phase='full')
+
+        # ✅ one INSERT covers every device, so db_write is recorded per task
+        record_timings(db_timings, 'all')
+        for screenshot in screenshots:
+            record_timings(screenshot.timings, screenshot.device_type)
 
-                results.append({
-                    "id": screenshot.id,
-                    "device_type": sr['device_type'],
-                    "original_path": screenshot.original_path,
-                    "mockup_path": screenshot.mockup_path,
-                })
+        results = []
+        for screenshot in screenshots:
+            result = screenshot_result(screenshot)
+            results.append(result)
+            progress['devices'][screenshot.device_type].update(stage='done', **result)
+        report_progress(self, 'saved', **progress)
+
+        # ✅ keep the creator within their storage quota (evicts old mockups / generations)
+        quota_report = quota.enforce_quota(project.creator_id)
 
         logging.info("Celery Task Completed")
-        return {"success": True, "screenshots": results}
+        return {"success": True, "screenshots": results, "failed": failed, "timings": db_timings,
+                "guardrails": guardrails, "quota": quota_report,
+                "first_image_seconds": progress.get('first_image_seconds')}
 
     except Exception as e:
         logging.error(f"[Celery] Error: {str(e)}", exc_info=True)
+        discard_previews(previews.values())
         return {"success": False, "error": str(e)}
 
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+
+def _generate_page_screenshots(self, project, device_list, normal_folder, mockup_folder,
+                               screenshot_service, mockup_service):
+    """Multi-page project (see screenshots.pages): every page is captured, its rows saved as soon as it is done"""
+    urls = pages.page_urls(project)
+    if not urls:
+        return {"success": False, "error": "No pages to capture (check page_urls / sitemap_url and max_depth)"}
+
+    # ✅ per-page progress: pages are captured concurrently, so they finish in any order
+    progress = {
+        'project_id': project.id,
+        'pages': len(urls),
+        'pages_done': 0,
+        'total': len(urls) * len(device_list),
+        'completed': 0,
+    }
+    report_progress(self, 'capturing', **progress)
+
+    results, failed, guardrails = [], [], []
+    db_timings = {}
+    for url, page_results in screenshot_service.capture_pages(
+            urls, device_list, normal_folder, project,
+            concurrency=getattr(settings, 'SITE_CAPTURE_CONCURRENCY', 4)):
+        record_cost(page_results)
+        screenshots, stored = [], []
+        for sr in page_results:
+            if sr['success']:
+                screenshots.append(build_screenshot(project, sr, mockup_service, mockup_folder, stored, guardrails,
+                                                    page_url=url))
+            else:
+                failed.append(failure_entry(sr, page_url=url))
+
+        # ✅ streamed: each page's rows are committed (and shown) while the others are still captured
+        db_timings = save_screenshots(project, screenshots, stored)
+        record_timings(db_timings, 'all')
+        for screenshot in screenshots:
+            record_timings(screenshot.timings, screenshot.device_type)
+            results.append(screenshot_result(screenshot))
+
+        progress['pages_done'] += 1
+        progress['completed'] += len(screenshots)
+        report_progress(self, 'capturing', last_page=url, **progress)
+
+    quota_report = quota.enforce_quota(project.creator_id)
+    logging.info(f"[Pages] Project {project.id}: {len(urls)} page(s), {len(results)} screenshot(s) saved")
+    return {"success": True, "pages": len(urls), "screenshots": results, "failed": failed, "timings": db_timings,
+            "guardrails": guardrails, "quota": quota_report}
 
 
 @shared_task(bind=True)
 def regenerate_single_screenshot(self, screenshot_id):
-    """Regenerate screenshot + mockup for one device (override files in place)"""
+    """Regenerate screenshot + mockup for one device (the row now points at the new content)"""
+    work_dir = None
     try:
         screenshot = Screenshot.objects.get(id=screenshot_id)
         project = screenshot.project
 
-        logging.info(f"[Task] Regenerating screenshot {screenshot_id} for {project.website_url}")
+        # a page of a multi-page project is captured again from that page, not the home page
+        url = screenshot.page_url or project.website_url
+        logging.info(f"[Task] Regenerating screenshot {screenshot_id} for {url}")
 
-        screenshot_service = ScreenshotService()
-        mockup_service = MockupService()
+        screenshot_service = get_screenshot_service()
+        mockup_service = get_mockup_service()
 
-        # keep the same folders as before
-        normal_folder = project.get_normal_screenshots_folder()
-        mockup_folder = project.get_mockup_screenshots_folder()
-        os.makedirs(normal_folder, exist_ok=True)
-        os.makedirs(mockup_folder, exist_ok=True)
+        work_dir, normal_folder, mockup_folder = make_work_folders(f'regenerate_{screenshot.id}_')
 
         device_config = {
             "width": screenshot.width,
             "height": screenshot.height,
         }
 
-        # Always overwrite into the SAME FILE path
-        original_abs_path = os.path.join(settings.MEDIA_ROOT, screenshot.original_path)
-        mockup_abs_path   = os.path.join(settings.MEDIA_ROOT, screenshot.mockup_path) if screenshot.mockup_path else None
+        report_progress(self, 'capturing', screenshot_id=screenshot.id, device_type=screenshot.device_type)
 
-        # capture screenshot → force overwrite
         results = screenshot_service.capture_screenshot(
-            url=project.website_url,
+            url=url,
             devices=[(screenshot.device_name, device_config, screenshot.device_type)],
             output_folder=normal_folder,
             project = project,
-            # force_filename=os.path.basename(original_abs_path)  # 👈 reuse same filename
         )
+        record_cost(results)
 
         if results and results[0]["success"]:
             res = results[0]
 
-            # overwrite original file (replace existing content)
-            if res["path"] != original_abs_path:
-                import shutil
-                shutil.move(res["path"], original_abs_path)
+            guardrails = []
+            collect_guardrails(guardrails, res, screenshot.device_type, 'capture')
+            report_progress(self, 'mockups', screenshot_id=screenshot.id, device_type=screenshot.device_type)
+            mockup_result = mockup_service.create_mockup(res["path"], screenshot.device_type, mockup_folder)
+            collect_guardrails(guardrails, mockup_result, screenshot.device_type, 'mockup')
 
-            # regenerate mockup at same path
-            if mockup_abs_path:
-                mockup_service.create_mockup(original_abs_path, screenshot.device_type, mockup_folder)
-            else:
-                mockup_result = mockup_service.create_mockup(original_abs_path, screenshot.device_type, mockup_folder)
+            timer = PhaseTimer()
+            old_paths = [screenshot.original_path]
+            old_bytes, old_files = screenshot.stored_bytes, screenshot.stored_files
+            with timer.phase('storage'):
+                screenshot.original_path = store_file(res["path"])
+                screenshot.original_bytes = quota.file_size(screenshot.original_path)
+                # keep the previous mockup if a new one couldn't be made
                 if mockup_result["success"]:
-                    screenshot.mockup_path = make_relative_path(mockup_result["path"])
+                    old_paths.append(screenshot.mockup_path)
+                    screenshot.mockup_path = store_file(mockup_result["path"], ext='.webp')
+                    screenshot.mockup_bytes = quota.file_size(screenshot.mockup_path)
+            screenshot.timings = {**res.get('timings', {}), **mockup_result.get('timings', {}), **timer.take()}
+            screenshot.is_preview = False  # a preview left by a failed full capture is now a full one
 
-            screenshot.save()
+            with timer.phase('db_write'), transaction.atomic():
+                screenshot.save(update_fields=["original_path", "mockup_path", "original_bytes", "mockup_bytes", "timings",
+                                               "is_preview"])
+                quota.adjust_usage(project.creator_id,
+                                   screenshot.stored_bytes - old_bytes,
+                                   screenshot.stored_files - old_files)
+                for name in old_paths:
+                    release(name)
+            invalidate_project(project.id)
+            record_timings(timer.take(), 'all')
+            record_timings(screenshot.timings, screenshot.device_type)
+            quota_report = quota.enforce_quota(project.creator_id)
 
-            logging.info(f"[Task] Screenshot {screenshot_id} regenerated ✅ (overwritten in place)")
+            logging.info(f"[Task] Screenshot {screenshot_id} regenerated ✅")
 
-            return {"success": True, "screenshot_id": screenshot.id}
+            return {"success": True, "screenshot_id": screenshot.id, "guardrails": guardrails, "quota": quota_report}
 
         else:
-            logging.error(f"[Task] Failed regenerating screenshot {screenshot_id}")
-            return {"success": False, "screenshot_id": screenshot.id}
+            error = results[0].get("error") if results else "no result returned"
+            logging.error(f"[Task] Failed regenerating screenshot {screenshot_id}: {error}")
+            return {"success": False, "screenshot_id": screenshot.id, "error": error}
 
     except Screenshot.DoesNotExist:
         logging.error(f"[Task] Screenshot {screenshot_id} not found")
@@ -151,3 +508,59 @@ def regenerate_single_screenshot(self, screenshot_id):
     except Exception as e:
         logging.error(f"[Task] Error regenerating screenshot {screenshot_id}: {str(e)}", exc_info=True)
         return {"success": False, "error": str(e)}
+    finally:
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+
+@shared_task
+def run_capture_schedules():
+    """Periodic: queue the recurring captures that are due (see screenshots.scheduling)"""
+    return {"success": True, **scheduling.dispatch()}
+
+
+@shared_task(bind=True)
+def capture_scheduled_batch(self, project_ids):
+    """Scheduled captures of projects on one domain, sharing a single browser session"""
+    screenshot_service = get_screenshot_service()
+    results = {}
+    with screenshot_service.session():
+        for project_id in project_ids:
+            devices = Project.objects.filter(id=project_id).values_list('schedule_devices', flat=True).first()
+            # nobody is watching a scheduled capture: skip the preview phase
+            result = _generate_screenshots(self, project_id, devices or None, preview=False)
+            notify_completion(self, project_id, None, result)
+            results[project_id] = {"success": result["success"], "screenshots": len(result.get("screenshots", [])),
+                                   "failed": len(result.get("failed", []))}
+    logging.info(f"[Schedule] Batch of {len(project_ids)} project(s) done: {results}")
+    return {"success": True, "projects": results}
+
+
+@shared_task
+def purge_project(project_id):
+    """Delete a soft-deleted project's rows and files outside the request"""
+    try:
+        return {"success": True, "purged": cleanup.purge_project(project_id)}
+    except Exception as e:
+        logging.error(f"[Task] Error purging project {project_id}: {str(e)}", exc_info=True)
+        return {"success": False, "error": str(e)}
+
+
+@shared_task
+def remove_media_files(paths):
+    """Remove legacy media files left behind by deleted screenshots"""
+    return {"success": True, "removed": cleanup.remove_legacy_files(paths)}
+
+
+@shared_task
+def collect_orphan_media(batch_size=None):
+    """Periodic garbage collection of media files no row references"""
+    removed = cleanup.collect_orphans(batch_size=batch_size)
+    return {"success": True, "removed": len(removed)}
+
+
+@shared_task
+def deliver_webhooks(url):
+    """Send the pending webhook events of one endpoint (routed to the 'webhooks' queue)"""
+    return {"success": True, "delivered": webhooks.deliver(url)}
@@ -1,3 +1,1672 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Artifact, CaptureProfile, Project, Screenshot, StorageUsage, WebhookDelivery
+from . import async_views, cleanup, live, metrics, quota, tasks, webhooks
+from .media import cache_control, resolve_media_path
+from .storage import artifact_path, store_file
+from .services import ScreenshotService, MockupService
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(prefix='screenshots_tests_')
+
+
+def fake_async_result(state, info=None):
+    result = mock.Mock()
+    result.state = state
+    result.info = info
+    return result
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, CAPTURE_PREVIEW=False)
+class MediaTestCase(TestCase):
+    """Base test case writing any files into a throwaway MEDIA_ROOT"""
+
+    def setUp(self):
+        cache.clear()
+        metrics._registered.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_project(self, **kwargs):
+        defaults = {
+            'name': 'site',
+            'website_url': 'https://example.com',
+            'creator_id': '1',
+            'creator_name': 'femi',
+        }
+        defaults.update(kwargs)
+        # run on_commit cache invalidation as a real commit would
+        with self.captureOnCommitCallbacks(execute=True):
+            return Project.objects.create(**defaults)
+
+    def add_screenshots(self, project, count, device_type='mobile'):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                Screenshot.objects.create(
+                    project=project, device_type=device_type, device_name='iPhone 12',
+                    width=390, height=844, original_path=f'a{i}.png', mockup_path='',
+                )
+
+
+class TaskStatusTests(MediaTestCase):
+
+    def test_status_reports_progress(self):
+        progress = {'stage': 'capturing', 'total': 2, 'completed': 0, 'devices': {}}
+        with mock.patch('screenshots.views.AsyncResult', return_value=fake_async_result('PROGRESS', progress)):
+            response = self.client.get(reverse('screenshots:api_task_status', args=['abc']))
+
+        data = response.json()
+        self.assertEqual(data['state'], 'PROGRESS')
+        self.assertFalse(data['ready'])
+        self.assertEqual(data['progress'], progress)
+
+    def test_status_reports_result(self):
+        result = {'success': True, 'screenshots': []}
+        with mock.patch('screenshots.views.AsyncResult', return_value=fake_async_result('SUCCESS', result)):
+            response = self.client.get(reverse('screenshots:api_task_status', args=['abc']))
+
+        data = response.json()
+        self.assertTrue(data['ready'])
+        self.assertEqual(data['result'], result)
+
+    @override_settings(TASK_EVENTS_POLL_INTERVAL=0)
+    def test_events_stream_until_done(self):
+        states = iter([
+            fake_async_result('PENDING'),
+            fake_async_result('PROGRESS', {'stage': 'capturing'}),
+            fake_async_result('PROGRESS', {'stage': 'capturing'}),
+            fake_async_result('SUCCESS', {'success': True}),
+        ])
+        with mock.patch('screenshots.views.AsyncResult', side_effect=lambda task_id: next(states)):
+            response = self.client.get(reverse('screenshots:api_task_events', args=['abc']))
+            body = b''.join(response.streaming_content).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(body.count('event: progress'), 2)  # unchanged state is not re-sent
+        self.assertTrue(body.rstrip().split('\n\n')[-1].startswith('event: done'))
+
+
+class GenerateScreenshotsProgressTests(MediaTestCase):
+
+    def test_progress_reported_per_device(self):
+        project = self.create_project()
+        captured = []
+
+        def fake_capture(url, devices, output_folder, project, progress_callback=None):
+            results = []
+            for device_name, config, device_type in devices:
+                path = os.path.join(output_folder, f'{device_type}.png')
+                with open(path, 'wb') as f:
+                    f.write(b'same page')
+                result = {
+                    'success': True,
+                    'path': path,
+                    'device_name': device_name,
+                    'device_type': device_type,
+                    'width': config['width'],
+                    'height': config['height'],
+                }
+                results.append(result)
+                progress_callback(result)
+            return results
+
+        def record(task, stage, **meta):
+            captured.append((stage, json.loads(json.dumps(meta))))
+
+        with mock.patch.object(ScreenshotService, 'capture_screenshot', side_effect=fake_capture), \
+                mock.patch.object(MockupService, 'create_mockup', return_value={'success': False}), \
+                mock.patch.object(tasks, 'report_progress', side_effect=record):
+            result = tasks.generate_screenshots.apply(args=(project.id, ['mobile', 'desktop'])).get()
+
+        self.assertTrue(result['success'])
+        self.assertEqual(Screenshot.objects.filter(project=project).count(), 2)
+        project.refresh_from_db()
+        self.assertEqual(project.screenshot_counter, 2)  # bulk_create bypasses signals
+
+        # identical captures share one content-addressed file
+        names = set(Screenshot.objects.values_list('original_path', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(Artifact.objects.get(name=names.pop()).ref_count, 2)
+
+        stages = [stage for stage, _ in captured]
+        self.assertEqual(stages[0], 'capturing')
+        self.assertIn('mockups', stages)
+
+        final = captured[-1][1]
+        self.assertEqual(final['completed'], 2)
+        self.assertEqual({d['stage'] for d in final['devices'].values()}, {'done'})
+
+
+class WorkerWarmUpTests(MediaTestCase):
+
+    @override_settings(WORKER_WARMUP_BROWSER=False)
+    def test_warm_up_reuses_services_and_templates(self):
+        from . import worker
+
+        timings = worker.warm_up()
+
+        self.assertEqual(list(timings), ['services', 'imports', 'templates'])
+        self.assertIs(worker.get_screenshot_service(), worker.get_screenshot_service())
+        mockup_service = worker.get_mockup_service()
+        self.assertEqual(set(mockup_service._templates), set(mockup_service.template_paths))
+        self.assertIs(mockup_service.load_template('mobile'), mockup_service.load_template('mobile'))
+
+    @override_settings(WORKER_WARMUP_BROWSER=True)
+    def test_browser_is_warmed_only_for_playwright(self):
+        from . import worker
+
+        with mock.patch.dict(worker._services, clear=True), \
+                mock.patch.object(ScreenshotService, 'start_browser') as start_browser:
+            with override_settings(CAPTURE_ENGINES=['placeholder']):
+                self.assertNotIn('browser', worker.warm_up())
+            start_browser.assert_not_called()
+
+            worker._services.clear()
+            with override_settings(CAPTURE_ENGINES=['playwright', 'placeholder']):
+                self.assertIn('browser', worker.warm_up())
+            start_browser.assert_called_once()
+
+
+class ScreenshotCountTests(MediaTestCase):
+
+    def test_project_list_query_count_is_constant(self):
+        self.add_screenshots(self.create_project(), 2)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('screenshots:api_projects'))
+
+        for _ in range(5):
+            self.add_screenshots(self.create_project(), 3)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('screenshots:api_projects'))
+
+        counts = sorted(p['screenshot_count'] for p in response.json()['projects'])
+        self.assertEqual(counts, [2, 3, 3, 3, 3, 3])
+
+    def test_counter_follows_create_and_delete(self):
+        project = self.create_project()
+        self.add_screenshots(project, 3)
+        project.refresh_from_db()
+        self.assertEqual(project.screenshot_counter, 3)
+
+        project.screenshots.first().delete()
+        project.refresh_from_db()
+        self.assertEqual(project.screenshot_counter, 2)
+        self.assertEqual(project.screenshot_count, 2)
+
+    @override_settings(SCREENSHOT_COUNTER_ENABLED=False)
+    def test_property_falls_back_to_count_query(self):
+        project = self.create_project()
+        self.add_screenshots(project, 2)
+        project.refresh_from_db()
+
+        self.assertEqual(project.screenshot_counter, 0)
+        self.assertEqual(project.screenshot_count, 2)
+        self.assertEqual(project.recount_screenshots(), 2)
+
+
+class ListAPITests(MediaTestCase):
+
+    def test_projects_keyset_pagination(self):
+        ids = [self.create_project(name=f'p{i}').id for i in range(5)]
+        url = reverse('screenshots:api_projects')
+
+        seen = []
+        cursor = ''
+        while True:
+            data = self.client.get(url, {'limit': 2, 'cursor': cursor}).json()
+            seen += [p['id'] for p in data['projects']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(seen, sorted(ids, reverse=True))
+
+    def test_projects_filter_and_sparse_fields(self):
+        self.create_project(creator_id='7')
+        self.create_project(creator_id='8')
+
+        data = self.client.get(reverse('screenshots:api_projects'), {'creator_id': '7', 'fields': 'id,name'}).json()
+        self.assertEqual(len(data['projects']), 1)
+        self.assertEqual(set(data['projects'][0]), {'id', 'name'})
+
+        response = self.client.get(reverse('screenshots:api_projects'), {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('screenshots:api_projects'), {'cursor': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_list_returns_304(self):
+        project = self.create_project()
+        url = reverse('screenshots:api_projects')
+
+        first = self.client.get(url)
+        self.assertIn('Last-Modified', first)
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+        self.add_screenshots(project, 1)
+        third = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(third.status_code, 200)
+
+    def test_screenshot_lists(self):
+        project = self.create_project(creator_id='7')
+        self.add_screenshots(project, 2)
+        self.add_screenshots(project, 1, device_type='desktop')
+        self.add_screenshots(self.create_project(creator_id='8'), 1)
+
+        data = self.client.get(reverse('screenshots:api_screenshots', args=[project.id])).json()
+        self.assertEqual(len(data['screenshots']), 3)
+
+        data = self.client.get(reverse('screenshots:api_screenshot_list'), {
+            'creator_id': '7', 'device_type': 'mobile', 'fields': 'id,mockup_url', 'limit': 1,
+        }).json()
+        self.assertEqual(len(data['screenshots']), 1)
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertEqual(set(data['screenshots'][0]), {'id', 'mockup_url'})
+
+
+class ResponseCacheTests(MediaTestCase):
+
+    def test_project_pages_are_cached_until_invalidated(self):
+        project = self.create_project()
+        detail_url = reverse('screenshots:project_detail', args=[project.id])
+
+        self.client.get(detail_url)
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(detail_url), project.name)
+
+        self.add_screenshots(project, 1)
+        with self.assertNumQueries(2):
+            self.client.get(detail_url)
+
+        stats = self.client.get(reverse('screenshots:api_cache_stats')).json()['views']
+        self.assertEqual(stats['project_detail']['hit'], 1)
+        self.assertEqual(stats['project_detail']['miss'], 2)
+
+    def test_other_projects_stay_cached(self):
+        project = self.create_project()
+        other = self.create_project(name='other')
+        other_url = reverse('screenshots:project_detail', args=[other.id])
+        self.client.get(other_url)
+
+        self.add_screenshots(project, 1)
+        with self.assertNumQueries(0):
+            self.client.get(other_url)
+
+    def test_list_cache_keyed_by_query(self):
+        self.create_project(creator_id='7')
+        self.create_project(creator_id='8')
+        url = reverse('screenshots:api_projects')
+
+        self.assertEqual(len(self.client.get(url).json()['projects']), 2)
+        self.assertEqual(len(self.client.get(url, {'creator_id': '7'}).json()['projects']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.filter(creator_id='8').get().delete()
+        self.assertEqual(len(self.client.get(url).json()['projects']), 1)
+
+
+    def test_implicit_locmem_cache_is_reported(self):
+        from . import metrics
+
+        self.assertTrue(metrics.check_shared_cache())
+        with override_settings(CACHE_LOCMEM=False), self.assertLogs(level='ERROR'):
+            self.assertFalse(metrics.check_shared_cache())
+
+
+class MediaDeliveryTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        project = self.create_project()
+        self.path = 'users_projects/femi_1/site/project_1/normal_screenshots/iphone_12_390x844.png'
+        self.content = bytes(range(256)) * 4
+        full_path = os.path.join(TEMP_MEDIA_ROOT, self.path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(self.content)
+        Screenshot.objects.create(
+            project=project, device_type='mobile', device_name='iPhone 12',
+            width=390, height=844, original_path=self.path, mockup_path='',
+        )
+        self.url = f'/media/{self.path}'
+
+    def test_full_file_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('must-revalidate', response['Cache-Control'])
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_unknown_and_outside_files_are_refused(self):
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'stray.png'), 'wb') as f:
+            f.write(b'x')
+        self.assertEqual(self.client.get('/media/stray.png').status_code, 404)
+        with self.assertRaises(Http404):
+            resolve_media_path('../screenshot_generator/settings.py')
+
+    @override_settings(MEDIA_ACCEL='nginx')
+    def test_accel_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.path}')
+        self.assertEqual(response.content, b'')
+
+    def test_content_hashed_names_are_immutable(self):
+        self.assertIn('immutable', cache_control('cas/ab/' + 'ab' * 32 + '.png'))
+
+
+class ArtifactStorageTests(MediaTestCase):
+
+    def write(self, name, content):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_identical_content_is_stored_once_and_refcounted(self):
+        project = self.create_project()
+        first = store_file(self.write('tmp/a.png', b'pixels'))
+        second = store_file(self.write('tmp/b.png', b'pixels'))
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('cas/'))
+
+        screenshots = [
+            Screenshot.objects.create(project=project, device_type='mobile', device_name='iPhone 12',
+                                      width=390, height=844, original_path=first, mockup_path='')
+            for _ in range(2)
+        ]
+        self.assertEqual(screenshots[0].original_url, f'/media/{first}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            screenshots[0].delete()
+        self.assertEqual(Artifact.objects.get(name=first).ref_count, 1)
+        self.assertTrue(os.path.exists(artifact_path(first)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            screenshots[1].delete()
+        self.assertFalse(Artifact.objects.filter(name=first).exists())
+        self.assertFalse(os.path.exists(artifact_path(first)))
+
+    def test_dedupe_media_command(self):
+        project = self.create_project()
+        for i in range(2):
+            path = f'users_projects/femi_1/site/project_{i}/normal_screenshots/iphone.png'
+            self.write(path, b'same capture')
+            Screenshot.objects.create(project=project, device_type='mobile', device_name='iPhone 12',
+                                      width=390, height=844, original_path=path, mockup_path='')
+
+        call_command('dedupe_media', stdout=io.StringIO())
+
+        names = set(Screenshot.objects.values_list('original_path', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertEqual(Artifact.objects.get(name=name).ref_count, 2)
+        self.assertEqual(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'users_projects')), [])
+
+
+class DeletionTests(MediaTestCase):
+
+    def write(self, name, content=b'x', age=None):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        if age:
+            old = time.time() - age
+            os.utime(path, (old, old))
+        return path
+
+    def test_delete_project_is_soft_then_purged(self):
+        project = self.create_project()
+        self.add_screenshots(project, 2)
+        folder_file = self.write(f'users_projects/femi_1/site/project_{project.id}/normal_screenshots/a.png')
+
+        with mock.patch.object(tasks.purge_project, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('screenshots:api_delete_project', args=[project.id]))
+
+        self.assertEqual(response.status_code, 200)
+        delay.assert_called_once_with(project.id)
+        self.assertFalse(Project.objects.filter(id=project.id).exists())
+        self.assertTrue(Project.all_objects.filter(id=project.id).exists())
+        self.assertTrue(os.path.exists(folder_file))
+        self.assertEqual(self.client.get(reverse('screenshots:project_detail', args=[project.id])).status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks.purge_project(project.id)
+        self.assertFalse(Project.all_objects.filter(id=project.id).exists())
+        self.assertFalse(Screenshot.objects.filter(project_id=project.id).exists())
+        self.assertFalse(os.path.exists(folder_file))
+
+    def test_delete_screenshot_removes_legacy_files(self):
+        project = self.create_project()
+        path = 'users_projects/femi_1/site/project_1/normal_screenshots/iphone.png'
+        full_path = self.write(path)
+        screenshot = Screenshot.objects.create(project=project, device_type='mobile', device_name='iPhone 12',
+                                               width=390, height=844, original_path=path, mockup_path='')
+
+        with mock.patch.object(tasks.remove_media_files, 'delay', side_effect=tasks.remove_media_files) as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('screenshots:delete_screenshot', args=[screenshot.id]))
+
+        delay.assert_called_once_with([path])
+        self.assertFalse(os.path.exists(full_path))
+
+    def test_orphan_collector(self):
+        project = self.create_project()
+        kept = store_file(self.write('tmp/kept.png', b'kept'))
+        os.utime(artifact_path(kept), (0, 0))
+        Screenshot.objects.create(project=project, device_type='mobile', device_name='iPhone 12',
+                                  width=390, height=844, original_path=kept, mockup_path='')
+
+        orphans = [self.write(f'cas/00/00/{i:064x}.png', age=7200) for i in range(3)]
+        young = self.write('cas/00/01/' + 'f' * 64 + '.png')
+        legacy = self.write('users_projects/femi_1/site/project_9/mockup_screenshots/m.webp', age=7200)
+        unrelated = self.write('users_projects/femi_1/notes.txt', age=7200)
+
+        removed = cleanup.collect_orphans(batch_size=2, grace_seconds=3600)
+        self.assertEqual(len(removed), 2)
+
+        cleanup.collect_orphans(batch_size=10, grace_seconds=3600)
+        for path in orphans + [legacy]:
+            self.assertFalse(os.path.exists(path))
+        for path in (artifact_path(kept), young, unrelated):
+            self.assertTrue(os.path.exists(path))
+
+
+class StorageQuotaTests(MediaTestCase):
+
+    def stored_screenshot(self, project, tag, size, mockup=True, device_name='iPhone 12', page_url=''):
+        def stored(suffix, ext):
+            path = os.path.join(TEMP_MEDIA_ROOT, 'tmp', f'{tag}{suffix}{ext}')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(tag.encode() + suffix.encode() + b'x' * (size - len(tag) - len(suffix)))
+            return store_file(path)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            original = stored('o', '.png')
+            mockup_name = stored('m', '.webp') if mockup else ''
+            return Screenshot.objects.create(
+                project=project, device_type='mobile', device_name=device_name, width=390, height=844,
+                original_path=original, mockup_path=mockup_name, page_url=page_url,
+                original_bytes=quota.file_size(original), mockup_bytes=quota.file_size(mockup_name),
+            )
+
+    def test_usage_is_tracked_incrementally(self):
+        project = self.create_project()
+        first = self.stored_screenshot(project, 'a', 100)
+        self.stored_screenshot(project, 'b', 50, mockup=False)
+
+        response = self.client.get(reverse('screenshots:api_storage_usage', args=['1']))
+        self.assertEqual(response.json()['bytes'], 250)
+        self.assertEqual(response.json()['files'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(quota.get_usage('1')['bytes'], 50)
+
+        StorageUsage.objects.all().delete()
+        quota.recount_usage()
+        self.assertEqual(quota.get_usage('1')['files'], 1)
+
+    def test_eviction_drops_lru_mockups_then_old_generations(self):
+        project = self.create_project()
+        old = self.stored_screenshot(project, 'old', 100)
+        new = self.stored_screenshot(project, 'new', 100)
+        other = self.stored_screenshot(project, 'other', 100, device_name='Pixel 5')
+        Screenshot.objects.filter(pk=old.pk).update(last_accessed_at=timezone.now())
+        Screenshot.objects.filter(pk=new.pk).update(last_accessed_at=timezone.now())
+
+        # 600 bytes used; target is 90% of 450 -> 405: the never-served mockup goes first
+        with override_settings(STORAGE_QUOTA_BYTES=450), self.captureOnCommitCallbacks(execute=True):
+            report = quota.enforce_quota('1')
+        self.assertEqual(report['evicted_mockups'], 2)
+        self.assertEqual(report['bytes_after'], 400)
+        other.refresh_from_db()
+        self.assertEqual(other.mockup_path, '')
+
+        # all mockups gone, then the superseded capture; the latest of each device stays
+        with override_settings(STORAGE_QUOTA_BYTES=250), self.captureOnCommitCallbacks(execute=True):
+            report = quota.enforce_quota('1')
+        self.assertEqual(report['evicted_screenshots'], 1)
+        self.assertFalse(Screenshot.objects.filter(pk=old.pk).exists())
+        self.assertEqual(set(Screenshot.objects.values_list('pk', flat=True)), {new.pk, other.pk})
+        self.assertFalse(os.path.exists(artifact_path(old.original_path)))
+        self.assertEqual(quota.get_usage('1')['bytes'], 200)
+        self.assertFalse(report['over_quota'])
+
+    def test_pages_are_not_generations_of_each_other(self):
+        project = self.create_project(page_urls=['https://example.com/', 'https://example.com/about'])
+        old = self.stored_screenshot(project, 'old', 100, mockup=False, page_url='https://example.com/')
+        home = self.stored_screenshot(project, 'home', 100, mockup=False, page_url='https://example.com/')
+        about = self.stored_screenshot(project, 'about', 100, mockup=False, page_url='https://example.com/about')
+
+        with override_settings(STORAGE_QUOTA_BYTES=100), self.captureOnCommitCallbacks(execute=True):
+            report = quota.enforce_quota('1')
+
+        # only the superseded capture of the home page goes; the latest of both pages survive
+        self.assertEqual(report['evicted_screenshots'], 1)
+        self.assertEqual(set(Screenshot.objects.values_list('pk', flat=True)), {home.pk, about.pk})
+        self.assertFalse(Screenshot.objects.filter(pk=old.pk).exists())
+
+
+class AsyncAPIViewTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+
+    async def test_project_list_and_create(self):
+        view = async_views.ProjectAPIView.as_view()
+        body = json.dumps({'name': 'site', 'website_url': 'https://example.com', 'creator_id': '7', 'creator_name': 'ada'})
+
+        response = await view(self.factory.post('/api/projects/', body, content_type='application/json'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(await Project.objects.filter(creator_id='7').aexists())
+
+        response = await view(self.factory.get('/api/projects/', {'fields': 'name,creator_id'}))
+        self.assertEqual(json.loads(response.content)['projects'], [{'name': 'site', 'creator_id': '7'}])
+
+        response = await view(self.factory.get('/api/projects/', {'limit': 'x'}))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_enqueue_and_status(self):
+        project = await Project.objects.acreate(name='site', website_url='https://example.com', creator_id='1', creator_name='femi')
+        view = async_views.ScreenshotAPIView.as_view()
+
+        with mock.patch.object(tasks.generate_screenshots, 'delay', return_value=mock.Mock(id='t1')) as delay:
+            response = await view(self.factory.post('/', json.dumps({'devices': ['mobile']}),
+                                                    content_type='application/json'), project_id=project.id)
+        delay.assert_called_once_with(project.id, ['mobile'])
+        self.assertEqual(json.loads(response.content)['task_id'], 't1')
+
+        with mock.patch('screenshots.views.AsyncResult', return_value=fake_async_result('SUCCESS', {'success': True})):
+            response = await async_views.task_status(self.factory.get('/'), 't1')
+            self.assertEqual(json.loads(response.content)['state'], 'SUCCESS')
+
+            stream = await async_views.task_events(self.factory.get('/'), 't1')
+            chunks = [chunk async for chunk in stream.streaming_content]
+        self.assertTrue(chunks[-1].startswith(b'event: done'))
+
+    async def test_webhook_url_is_resolved_off_the_event_loop(self):
+        project = await Project.objects.acreate(name='site', website_url='https://example.com', creator_id='1', creator_name='femi')
+        threads = []
+
+        def check(url):
+            threads.append(threading.get_ident())
+            raise ValueError('points at a private address')
+
+        body = json.dumps({'webhook_url': 'http://intranet.example/hook'})
+        with mock.patch('screenshots.addresses.check_public_url', side_effect=check):
+            response = await async_views.ScreenshotAPIView.as_view()(
+                self.factory.post('/', body, content_type='application/json'), project_id=project.id)
+            self.assertEqual(response.status_code, 400)
+            response = await async_views.ProjectAPIView.as_view()(self.factory.post('/api/projects/', json.dumps(
+                {'name': 'site', 'website_url': 'https://example.com', 'creator_id': '7', 'creator_name': 'ada',
+                 'webhook_url': 'http://intranet.example/hook'}), content_type='application/json'))
+            self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    async def test_regenerate_unknown_screenshot_is_404(self):
+        with self.assertRaises(Http404):
+            await async_views.regenerate_screenshot(self.factory.post('/'), 999)
+
+
+@override_settings(LIVE_CAPTURE_ALLOW_PRIVATE=True)
+class CaptureNowTests(MediaTestCase):
+
+    def pool(self, capture, estimate=0.1, size=1, max_queue=0):
+        pool = live.CapturePool(size=size, max_queue=max_queue, initial_estimate=estimate)
+        pool.capture = capture
+        with mock.patch.object(ScreenshotService, 'start_browser'):
+            pool.start()
+            time.sleep(0.05)  # let the threads get past the browser launch
+        return pool
+
+    def get(self, pool, **params):
+        params.setdefault('url', 'http://127.0.0.1:9/')
+        with mock.patch.object(live, 'get_pool', return_value=pool):
+            return self.client.get(reverse('screenshots:api_capture_now'), params)
+
+    def test_streams_image_without_persisting(self):
+        calls = []
+
+        def capture(service, options, timeout):
+            calls.append((options, timeout))
+            return b'\x89PNG fake'
+
+        response = self.get(self.pool(capture), device='mobile', format='png', budget_ms='3000')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response.content, b'\x89PNG fake')
+        self.assertIn('capture;dur=', response['Server-Timing'])
+        options, timeout = calls[0]
+        self.assertEqual(options['config']['width'], 390)
+        self.assertLessEqual(timeout, 3000)
+        self.assertFalse(Project.objects.exists() or Screenshot.objects.exists() or Artifact.objects.exists())
+
+    def test_admission_control_and_timeouts(self):
+        def slow(service, options, timeout):
+            time.sleep(1)
+            return b'late'
+
+        # the running average says a capture takes 5s: a 1s budget can't be met
+        response = self.get(self.pool(slow, estimate=5), budget_ms='1000')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+        response = self.get(self.pool(slow, estimate=0.1), budget_ms='500')
+        self.assertEqual(response.status_code, 504)
+
+    def test_rejects_bad_parameters(self):
+        pool = self.pool(lambda *args: b'')
+        self.assertEqual(self.get(pool, url='file:///etc/passwd').status_code, 400)
+        self.assertEqual(self.get(pool, device='watch').status_code, 400)
+        self.assertEqual(self.get(pool, width='99999').status_code, 400)
+        with override_settings(LIVE_CAPTURE_ALLOW_PRIVATE=False):
+            self.assertEqual(self.get(pool, url='http://127.0.0.1/').status_code, 400)
+
+    @override_settings(LIVE_CAPTURE_ALLOW_PRIVATE=False)
+    def test_every_request_is_checked_redirects_included(self):
+        from .engines.playwright import guard_requests
+
+        context = mock.Mock()
+        guard_requests(context, live.allowed_url())
+        handle = context.route.call_args.args[1]
+
+        def route(url, status=200, location=None):
+            route = mock.Mock()
+            route.request.url = url
+            route.fetch.return_value = mock.Mock(status=status, headers={'location': location} if location else {})
+            handle(route)
+            return route
+
+        resolve = socket.getaddrinfo
+        public = [(None, None, None, '', ('93.184.216.34', 80))]
+        with mock.patch('socket.getaddrinfo', lambda host, port: public if host == 'example.com' else resolve(host, port)):
+            allowed = route('http://example.com/')
+            redirected = route('http://example.com/go', status=302, location='http://127.0.0.1:8000/admin')
+        subresource = route('http://169.254.169.254/latest/meta-data/')
+
+        allowed.fulfill.assert_called_once()
+        redirected.fulfill.assert_not_called()
+        redirected.abort.assert_called_once_with('blockedbyclient')
+        subresource.fetch.assert_not_called()
+        subresource.abort.assert_called_once_with('blockedbyclient')
+
+
+class WebhookReceiver:
+    """Local HTTP server standing in for a client's webhook endpoint"""
+
+    def __init__(self, statuses=(200,)):
+        self.statuses = list(statuses)
+        self.requests = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                receiver.requests.append((dict(self.headers), body))
+                status = receiver.statuses.pop(0) if len(receiver.statuses) > 1 else receiver.statuses[0]
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/hook'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ScreenshotOneStandIn:
+    """Local HTTP server standing in for the ScreenshotOne API"""
+
+    def __init__(self, statuses=(200,), delay=0.0):
+        from PIL import Image
+
+        self.statuses = list(statuses)
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+        lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                from urllib.parse import parse_qs, urlparse
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with lock:
+                    stand_in.requests.append(params)
+                    stand_in.in_flight += 1
+                    stand_in.max_in_flight = max(stand_in.max_in_flight, stand_in.in_flight)
+                    status = stand_in.statuses.pop(0) if len(stand_in.statuses) > 1 else stand_in.statuses[0]
+                time.sleep(delay)
+                body = b''
+                if status == 200:
+                    png = io.BytesIO()
+                    Image.new('RGB', (int(params['viewport_width']), 100), 'white').save(png, 'PNG')
+                    body = png.getvalue()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header('Retry-After', '0')
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with lock:
+                    stand_in.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/take'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@override_settings(WEBHOOK_SECRET='test-secret')
+@override_settings(WEBHOOK_ALLOW_PRIVATE=True)
+class WebhookTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.receiver = WebhookReceiver()
+        self.addCleanup(self.receiver.close)
+        schedule = mock.patch.object(tasks.deliver_webhooks, 'apply_async')
+        self.scheduled = schedule.start()
+        self.addCleanup(schedule.stop)
+
+    def test_burst_is_coalesced_into_one_signed_request(self):
+        for i in range(3):
+            webhooks.notify(self.receiver.url, 'screenshots.completed', {'success': True, 'project_id': i})
+        self.assertEqual(self.scheduled.call_count, 1)
+
+        self.assertEqual(webhooks.deliver(self.receiver.url), 3)
+        self.assertEqual(len(self.receiver.requests), 1)
+        headers, body = self.receiver.requests[0]
+        self.assertTrue(webhooks.verify_signature(headers[webhooks.SIGNATURE_HEADER], body))
+        self.assertFalse(webhooks.verify_signature(headers[webhooks.SIGNATURE_HEADER], body + b' '))
+        self.assertEqual([d['data']['project_id'] for d in json.loads(body)['deliveries']], [0, 1, 2])
+        self.assertEqual(WebhookDelivery.objects.filter(status=WebhookDelivery.DELIVERED).count(), 3)
+
+    def test_failures_are_retried_with_backoff(self):
+        self.receiver.statuses = [503, 200]
+        webhooks.notify(self.receiver.url, 'screenshots.completed', {'success': True})
+        self.scheduled.reset_mock()
+
+        self.assertEqual(webhooks.deliver(self.receiver.url), 0)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.attempts, delivery.last_error), ('pending', 1, 'HTTP 503'))
+        # retry scheduled for when the backoff expires (10s base, +-20% jitter)
+        self.assertTrue(7 <= self.scheduled.call_args.kwargs['countdown'] <= 13)
+
+        WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(webhooks.deliver(self.receiver.url), 1)
+        self.assertEqual(len(self.receiver.requests), 2)
+
+        # client errors other than 429 are not retried
+        self.receiver.statuses = [410]
+        webhooks.notify(self.receiver.url, 'screenshots.completed', {'success': True})
+        webhooks.deliver(self.receiver.url)
+        self.assertEqual(WebhookDelivery.objects.filter(status=WebhookDelivery.FAILED).count(), 1)
+
+    def test_generate_task_notifies_with_its_result(self):
+        project = self.create_project(webhook_url=self.receiver.url)
+        result = {'success': True, 'screenshots': [], 'quota': None}
+        with mock.patch.object(tasks, '_generate_screenshots', return_value=result):
+            self.assertEqual(tasks.generate_screenshots.apply(args=[project.id]).get(), result)
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.url, self.receiver.url)
+        self.assertEqual(delivery.payload['screenshots'], [])
+        self.assertEqual(delivery.payload['project_id'], project.id)
+
+    def test_rejects_invalid_webhook_url(self):
+        project = self.create_project()
+        response = self.client.post(reverse('screenshots:api_screenshots', args=[project.id]),
+                                    json.dumps({'webhook_url': 'ftp://example.com'}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE=False)
+    def test_private_endpoints_are_refused(self):
+        project = self.create_project()
+        response = self.client.post(reverse('screenshots:api_screenshots', args=[project.id]),
+                                    json.dumps({'webhook_url': self.receiver.url}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('private address', response.json()['error'])
+
+        # saved before it pointed at a private address: refused at delivery too
+        webhooks.notify(self.receiver.url, 'screenshots.completed', {'success': True})
+        self.assertEqual(webhooks.deliver(self.receiver.url), 0)
+        self.assertEqual(self.receiver.requests, [])
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.status, delivery.last_error), ('failed', 'webhook_url points at a private address'))
+
+
+class PhaseTimingTests(MediaTestCase):
+
+    def test_phase_timings_stored_per_device_and_exported(self):
+        project = self.create_project()
+
+        def fake_capture(url, devices, output_folder, project, progress_callback=None):
+            results = []
+            for i, (device_name, config, device_type) in enumerate(devices):
+                path = os.path.join(output_folder, f'{device_type}.png')
+                with open(path, 'wb') as f:
+                    f.write(device_type.encode())
+                # navigation is charged to the first device only
+                timings = {'navigation': 1.5, 'page_delay': 1.0} if i == 0 else {}
+                results.append({
+                    'success': True, 'path': path, 'device_name': device_name, 'device_type': device_type,
+                    'width': config['width'], 'height': config['height'],
+                    'timings': {**timings, 'scrolling': 0.3, 'rasterization': 0.7},
+                })
+            return results
+
+        def fake_mockup(path, device_type, output_folder):
+            mockup_path = os.path.join(output_folder, f'mockup_{device_type}.webp')
+            with open(mockup_path, 'wb') as f:
+                f.write(b'mockup ' + device_type.encode())
+            return {'success': True, 'path': mockup_path, 'timings': {'mockup_fit': 0.2, 'mockup_encode': 0.4}}
+
+        with mock.patch.object(ScreenshotService, 'capture_screenshot', side_effect=fake_capture), \
+                mock.patch.object(MockupService, 'create_mockup', side_effect=fake_mockup):
+            result = tasks.generate_screenshots.apply(args=(project.id, ['mobile', 'desktop'])).get()
+
+        self.assertIn('db_write', result['timings'])
+        mobile = Screenshot.objects.get(project=project, device_type='mobile')
+        desktop = Screenshot.objects.get(project=project, device_type='desktop')
+        self.assertEqual(mobile.timings['navigation'], 1.5)
+        self.assertEqual(mobile.timings['mockup_encode'], 0.4)
+        self.assertIn('storage', mobile.timings)
+        self.assertNotIn('navigation', desktop.timings)
+
+        text = self.client.get(reverse('screenshots:metrics')).content.decode()
+        self.assertIn('# TYPE screenshots_capture_phase_seconds histogram', text)
+        self.assertIn('screenshots_capture_phase_seconds_bucket{device_type="mobile",phase="navigation",le="1"} 0', text)
+        self.assertIn('screenshots_capture_phase_seconds_bucket{device_type="mobile",phase="navigation",le="2.5"} 1', text)
+        self.assertIn('screenshots_capture_phase_seconds_count{device_type="all",phase="db_write"} 1', text)
+
+    def test_prometheus_text_format(self):
+        metrics.incr('webhook_deliveries', 3, result='delivered')
+        for value in (0.03, 0.3, 400):
+            metrics.observe('webhook_delivery_seconds', value)
+
+        text = metrics.prometheus_text()
+        self.assertIn('screenshots_webhook_deliveries_total{result="delivered"} 3.0', text)
+        self.assertIn('screenshots_webhook_delivery_seconds_bucket{le="0.05"} 1', text)
+        self.assertIn('screenshots_webhook_delivery_seconds_bucket{le="0.5"} 2', text)
+        self.assertIn('screenshots_webhook_delivery_seconds_bucket{le="+Inf"} 3', text)
+        self.assertIn('screenshots_webhook_delivery_seconds_count 3', text)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_metrics_endpoint_token(self):
+        self.assertEqual(self.client.get(reverse('screenshots:metrics')).status_code, 401)
+        response = self.client.get(reverse('screenshots:metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+
+class ProfilingTests(MediaTestCase):
+
+    def test_profiled_run_stores_reports(self):
+        project = self.create_project()
+
+        def fake_capture(url, devices, output_folder, project, progress_callback=None):
+            from PIL import Image
+            results = []
+            for device_name, config, device_type in devices:
+                path = os.path.join(output_folder, f'{device_type}.png')
+                Image.new('RGB', (config['width'], config['height'] * 2), 'white').save(path)
+                results.append({'success': True, 'path': path, 'device_name': device_name,
+                                'device_type': device_type, 'width': config['width'], 'height': config['height']})
+            return results
+
+        with mock.patch.object(ScreenshotService, 'capture_screenshot', side_effect=fake_capture):
+            result = tasks.generate_screenshots.apply(args=(project.id, ['desktop']), kwargs={'profile': True}).get()
+
+        self.assertTrue(result['success'])
+        profile = CaptureProfile.objects.get(project=project)
+        self.assertEqual(result['profile']['id'], profile.id)
+        self.assertEqual([r['call'] for r in profile.summary['memory']], ['_fit_screenshot_to_device', 'create_mockup'])
+        self.assertTrue(profile.summary['hotspots'])
+        for name in profile.paths:
+            self.assertTrue(os.path.exists(artifact_path(name)))
+        with open(artifact_path(profile.summary_path)) as f:
+            self.assertIn('Memory around mockup calls', f.read())
+
+        # the shared service is left alone, and deleting the row releases the files
+        from . import worker
+        self.assertNotIn('create_mockup', vars(worker.get_mockup_service()))
+        paths = profile.paths
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.delete()
+        self.assertFalse(Artifact.objects.filter(name__in=paths).exists())
+
+    def test_generate_request_profile_flag(self):
+        project = self.create_project()
+        with mock.patch.object(tasks.generate_screenshots, 'delay') as delay:
+            delay.return_value.id = 'task-1'
+            self.client.post(reverse('screenshots:api_screenshots', args=[project.id]),
+                             data=json.dumps({'devices': ['mobile'], 'profile': True}), content_type='application/json')
+        delay.assert_called_once_with(project.id, ['mobile'], profile=True)
+
+        with override_settings(CAPTURE_PROFILING_ENABLED=False):
+            response = self.client.post(reverse('screenshots:api_screenshots', args=[project.id]),
+                                        data=json.dumps({'profile': True}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class MemoryGuardrailTests(MediaTestCase):
+
+    def image_file(self, size, fmt='PNG'):
+        from PIL import Image
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'tmp'), exist_ok=True)
+        path = os.path.join(TEMP_MEDIA_ROOT, 'tmp', f'shot_{size[0]}x{size[1]}.{fmt.lower()}')
+        Image.new('RGB', size, 'white').save(path, fmt)
+        return path
+
+    def test_tall_png_decodes_only_the_visible_top(self):
+        service = MockupService(max_pixels=2_000_000)
+        image, _, guardrails = service._open_screenshot(self.image_file((390, 40000)), 2995, 6270)
+
+        self.assertEqual(image.width, 390)
+        self.assertLess(image.height, 1000)  # 390 * 6270 / 2995 rows plus the resize margin
+        image.load()
+        self.assertEqual(guardrails, [])
+
+    def test_png_top_matches_the_full_decode(self):
+        from PIL import Image
+        from .services import png_top
+
+        for mode in ('RGB', 'RGBA', 'P', 'L'):
+            path = os.path.join(TEMP_MEDIA_ROOT, 'tmp', f'noise_{mode}.png')
+            full = Image.frombytes('RGB', (50, 400), os.urandom(50 * 400 * 3)).convert(mode)
+            full.save(path)
+            top = Image.open(io.BytesIO(png_top(path, 120)))
+            self.assertEqual(top.size, (50, 120))
+            self.assertEqual(top.tobytes(), full.crop((0, 0, 50, 120)).tobytes())
+
+    def test_over_budget_jpeg_is_downscaled_and_png_rejected(self):
+        service = MockupService(max_pixels=1_100_000)
+        image, _, guardrails = service._open_screenshot(self.image_file((2000, 1000), 'JPEG'), 1000, 1000)
+        self.assertEqual(image.size, (1000, 500))
+        self.assertEqual(guardrails[0]['kind'], 'downscaled')
+
+        result = MockupService(max_pixels=1000).create_mockup(self.image_file((1000, 1000)), 'desktop', TEMP_MEDIA_ROOT)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['guardrails'][0]['kind'], 'rejected')
+
+    def test_truncations_reported_in_task_result(self):
+        project = self.create_project()
+
+        def fake_capture(url, devices, output_folder, project, progress_callback=None):
+            path = os.path.join(output_folder, 'desktop.png')
+            with open(path, 'wb') as f:
+                f.write(b'png')
+            device_name, config, device_type = devices[0]
+            return [{'success': True, 'path': path, 'device_name': device_name, 'device_type': device_type,
+                     'width': config['width'], 'height': config['height'],
+                     'guardrails': [{'kind': 'truncated', 'detail': 'page is 1920x90000'}]}]
+
+        with mock.patch.object(ScreenshotService, 'capture_screenshot', side_effect=fake_capture), \
+                mock.patch.object(MockupService, 'create_mockup', return_value={'success': False}):
+            result = tasks.generate_screenshots.apply(args=(project.id, ['desktop'])).get()
+
+        self.assertEqual(result['guardrails'], [
+            {'kind': 'truncated', 'detail': 'page is 1920x90000', 'device_type': 'desktop', 'stage': 'capture'},
+        ])
+
+    def test_worker_over_rss_limit_is_counted(self):
+        from . import memory
+        with override_settings(WORKER_MAX_RSS_MB=1), self.assertLogs(level='WARNING') as logs:
+            memory.check_worker_memory('screenshots.tasks.generate_screenshots')
+        self.assertIn('over the 1 MB limit', logs.output[0])
+        self.assertNotIn('recycl', logs.output[0])
+        with override_settings(WORKER_MAX_RSS_MB=1_000_000):
+            memory.check_worker_memory('screenshots.tasks.generate_screenshots')
+        [entry] = [e for e in metrics.snapshot() if e['name'] == 'worker_memory_over_limit']
+        self.assertEqual(entry['value'], 1)
+
+
+class CaptureEngineTests(MediaTestCase):
+
+    def test_web_process_does_not_import_browser_libraries(self):
+        import subprocess
+        import sys
+
+        code = ("import os, sys; os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'screenshot_generator.settings'); "
+                "import django; django.setup(); import screenshot_generator.urls; "
+                "print(','.join(m for m in ('playwright', 'selenium', 'webdriver_manager') if m in sys.modules))")
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.assertEqual(out.stdout.strip(), '')
+
+    def test_engines_are_tried_in_order(self):
+        with self.assertRaises(ValueError):
+            ScreenshotService(engines=['playwright', 'lynx'])
+
+        service = ScreenshotService(engines=['playwright', 'placeholder'])
+        service._engines['playwright'] = mock.Mock(**{'capture.side_effect': RuntimeError('no chromium')})
+        folder = os.path.join(TEMP_MEDIA_ROOT, 'tmp')
+        os.makedirs(folder, exist_ok=True)
+        devices = [('iPhone 12', service.device_configs['mobile']['iPhone 12'], 'mobile')]
+
+        results = service.capture_screenshot('https://example.com', devices, folder, None)
+
+        self.assertEqual(results[0]['source'], 'placeholder')
+        from PIL import Image
+        with Image.open(results[0]['path']) as image:
+            self.assertEqual((image.format, image.size), ('PNG', (390, 844)))
+
+    def test_failed_devices_fall_back_per_device(self):
+        service = ScreenshotService(engines=['playwright', 'placeholder'])
+        folder = os.path.join(TEMP_MEDIA_ROOT, 'tmp')
+        os.makedirs(folder, exist_ok=True)
+        devices = [(name, service.device_configs[kind][name], kind)
+                   for kind, name in (('mobile', 'iPhone 12'), ('desktop', 'MacBook Pro'))]
+
+        def partial_capture(url, devices, output_folder, options, progress_callback=None):
+            # captured the first device, then the browser died
+            results = [{'success': True, 'path': 'mobile.png', 'device_name': devices[0][0],
+                        'device_type': 'mobile', 'source': 'playwright'},
+                       {'success': False, 'error': 'Target closed', 'device_name': devices[1][0],
+                        'device_type': 'desktop', 'source': 'playwright'}]
+            for result in results:
+                progress_callback(result)
+            return results
+
+        service._engines['playwright'] = mock.Mock(**{'capture.side_effect': partial_capture})
+        reported = []
+        results = service.capture_screenshot('https://example.com', devices, folder, None, reported.append)
+
+        self.assertEqual([r['source'] for r in results], ['playwright', 'placeholder'])
+        self.assertTrue(all(r['success'] for r in results))
+        # the failure a later engine made up for is never reported
+        self.assertEqual([(r['device_type'], r['success']) for r in reported], [('mobile', True), ('desktop', True)])
+
+    def test_circuit_opens_then_probes(self):
+        from .health import EngineHealth
+
+        health = EngineHealth(failure_threshold=2, reset_seconds=60)
+        service = ScreenshotService(engines=['playwright', 'placeholder'], health=health)
+        broken = mock.Mock(**{'capture.side_effect': RuntimeError('no chromium')})
+        service._engines['playwright'] = broken
+        folder = os.path.join(TEMP_MEDIA_ROOT, 'tmp')
+        os.makedirs(folder, exist_ok=True)
+        devices = [('iPhone 12', service.device_configs['mobile']['iPhone 12'], 'mobile')]
+
+        for _ in range(3):
+            results = service.capture_screenshot('https://example.com', devices, folder, None)
+            self.assertEqual(results[0]['source'], 'placeholder')
+        self.assertEqual(broken.capture.call_count, 2)  # the third capture skipped it
+        self.assertEqual(health.state('playwright')['state'], 'open')
+
+        # after the reset period one capture probes the engine; success closes the circuit
+        with mock.patch('screenshots.health.time.time', return_value=time.time() + 61):
+            self.assertTrue(health.allow('playwright'))
+            self.assertFalse(health.allow('playwright'))
+            health.record('playwright', True)
+        self.assertEqual(health.state('playwright')['state'], 'closed')
+
+        text = metrics.prometheus_text()
+        self.assertIn('screenshots_engine_captures_total{engine="playwright",outcome="skipped"} 2.0', text)
+        self.assertIn('screenshots_engine_circuit_state{engine="playwright"', text)
+
+    def test_selenium_reuses_one_session_and_cleans_up(self):
+        import base64
+        from PIL import Image
+        from .engines import capture_options, selenium as selenium_engine
+
+        png = io.BytesIO()
+        Image.new('RGB', (390, 2000), 'white').save(png, 'PNG')
+
+        def cdp(command, params):
+            if command == 'Page.getLayoutMetrics':
+                return {'cssContentSize': {'width': 390, 'height': 2000}}
+            if command == 'Page.captureScreenshot':
+                return {'data': base64.b64encode(png.getvalue()).decode()}
+            return {}
+
+        driver = mock.Mock(**{'execute_script.return_value': 1000, 'execute_cdp_cmd.side_effect': cdp})
+        folder = os.path.join(TEMP_MEDIA_ROOT, 'tmp')
+        os.makedirs(folder, exist_ok=True)
+        service = ScreenshotService(engines=['selenium'])
+        devices = [(name, service.device_configs[kind][name], kind)
+                   for kind, name in (('mobile', 'iPhone 12'), ('desktop', 'MacBook Pro'))]
+        engine = service.engine('selenium')
+
+        selenium_engine._driver_paths.clear()
+        with mock.patch.object(selenium_engine, 'ChromeDriverManager') as manager, \
+                mock.patch.object(selenium_engine.webdriver, 'Chrome', return_value=driver) as chrome:
+            for _ in range(2):
+                results = engine.capture('https://example.com', devices, folder, capture_options(None))
+                self.assertTrue(all(r['success'] and r['source'] == 'selenium' for r in results))
+            profile_dir = engine._profile_dir
+            engine.close()
+
+        manager.return_value.install.assert_called_once()
+        chrome.assert_called_once()
+        self.assertEqual(driver.get.call_args_list[0], mock.call('https://example.com'))
+        self.assertFalse(os.path.exists(profile_dir))
+        self.assertIn('timings', results[0])
+
+
+class ScreenshotOneEngineTests(MediaTestCase):
+
+    def capture(self, stand_in, devices=('mobile', 'tablet', 'desktop'), **options):
+        from .engines import capture_options
+
+        options = {'base_url': stand_in.url, 'access_key': 'key', 'retry_base_seconds': 0.01, **options}
+        service = ScreenshotService(engines=['screenshotone'], engine_options={'screenshotone': options})
+        folder = os.path.join(TEMP_MEDIA_ROOT, 'tmp')
+        os.makedirs(folder, exist_ok=True)
+        device_list = []
+        for device_type in devices:
+            device_name = next(iter(service.device_configs[device_type]))
+            device_list.append((device_name, service.device_configs[device_type][device_name], device_type))
+        engine = service.engine('screenshotone')
+        self.addCleanup(engine.close)
+        return engine.capture('https://example.com', device_list, folder, capture_options(None))
+
+    def test_devices_are_fetched_concurrently_and_streamed_to_disk(self):
+        stand_in = ScreenshotOneStandIn(delay=0.2)
+        self.addCleanup(stand_in.close)
+
+        results = self.capture(stand_in, concurrency=3, credit_price=0.002)
+
+        self.assertEqual(stand_in.max_in_flight, 3)
+        self.assertEqual([r['device_type'] for r in results], ['mobile', 'tablet', 'desktop'])
+        for result in results:
+            self.assertTrue(result['success'])
+            self.assertEqual(result['cost']['bytes'], os.path.getsize(result['path']))
+            self.assertEqual((result['cost']['credits'], result['cost']['price']), (1, 0.002))
+            self.assertIn('rasterization', result['timings'])
+        self.assertEqual(stand_in.requests[0]['access_key'], 'key')
+
+    def test_retries_429_and_5xx_but_not_other_4xx(self):
+        stand_in = ScreenshotOneStandIn(statuses=[429, 503, 200])
+        self.addCleanup(stand_in.close)
+        result, = self.capture(stand_in, devices=['mobile'])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['cost']['attempts'], 3)
+
+        stand_in = ScreenshotOneStandIn(statuses=[403])
+        self.addCleanup(stand_in.close)
+        result, = self.capture(stand_in, devices=['mobile'])
+        self.assertFalse(result['success'])
+        self.assertEqual((result['cost']['attempts'], result['cost']['credits']), (1, 0))
+        self.assertEqual(len(stand_in.requests), 1)
+
+    def test_missing_key_fails_every_device(self):
+        service = ScreenshotService(engines=['screenshotone'], engine_options={'screenshotone': {'access_key': None}})
+        devices = [('iPhone 12', service.device_configs['mobile']['iPhone 12'], 'mobile')]
+        with mock.patch.dict(os.environ, {'SCREENSHOTONE_KEY': ''}):
+            result, = service.capture_screenshot('https://example.com', devices, TEMP_MEDIA_ROOT, None)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['error'], 'SCREENSHOTONE_KEY is not configured')
+
+
+class ScheduleTests(MediaTestCase):
+
+    def test_update_sets_a_spread_out_schedule(self):
+        project = self.create_project()
+        url = reverse('screenshots:update_project_settings', args=[project.id])
+
+        response = self.client.patch(url, json.dumps({'schedule_interval': 5}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        before = timezone.now()
+        response = self.client.patch(url, json.dumps({'schedule_interval': 60, 'schedule_devices': ['desktop']}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        project.refresh_from_db()
+        self.assertEqual((project.schedule_interval, project.schedule_devices), (60, ['desktop']))
+        self.assertTrue(before <= project.next_capture_at <= before + timezone.timedelta(minutes=60, seconds=1))
+
+    def test_due_projects_are_claimed_once_and_batched_by_domain(self):
+        from . import scheduling
+
+        now = timezone.now()
+        projects = [
+            self.create_project(website_url=url, schedule_interval=60)
+            for url in ('https://example.com/a', 'https://www.example.com/b', 'https://other.org/', 'https://later.net/')
+        ]
+        Project.objects.filter(id__in=[p.id for p in projects[:3]]).update(next_capture_at=now)
+        Project.objects.filter(id=projects[3].id).update(next_capture_at=now + timezone.timedelta(minutes=5))
+
+        with mock.patch.object(tasks.capture_scheduled_batch, 'delay') as delay:
+            self.assertEqual(scheduling.dispatch(now), {'due': 3, 'batches': 2})
+            self.assertEqual(scheduling.dispatch(now), {'due': 0, 'batches': 0})
+
+        self.assertEqual(sorted(sorted(call.args[0]) for call in delay.call_args_list),
+                         [[projects[0].id, projects[1].id], [projects[2].id]])
+        for project in projects[:3]:
+            project.refresh_from_db()
+            # next interval plus at most a tenth of it (capped by SCHEDULE_JITTER_SECONDS)
+            delay_seconds = (project.next_capture_at - now).total_seconds()
+            self.assertTrue(3600 <= delay_seconds <= 3600 + 300)
+
+    def test_batch_shares_one_browser_session(self):
+        projects = [self.create_project(schedule_interval=60, schedule_devices=['mobile']) for _ in range(2)]
+
+        def fake_capture(url, devices, output_folder, project, progress_callback=None):
+            path = os.path.join(output_folder, 'mobile.png')
+            with open(path, 'wb') as f:
+                f.write(b'png')
+            device_name, config, device_type = devices[0]
+            return [{'success': True, 'path': path, 'device_name': device_name, 'device_type': device_type,
+                     'width': config['width'], 'height': config['height']}]
+
+        with mock.patch.object(ScreenshotService, 'session') as session, \
+                mock.patch.object(ScreenshotService, 'capture_screenshot', side_effect=fake_capture) as capture, \
+                mock.patch.object(MockupService, 'create_mockup', return_value={'success': False}):
+            result = tasks.capture_scheduled_batch.apply(args=([p.id for p in projects],)).get()
+
+        session.assert_called_once()
+        self.assertEqual(capture.call_count, 2)
+        self.assertEqual({r['screenshots'] for r in result['projects'].values()}, {1})
+        self.assertEqual(Screenshot.objects.filter(device_type='mobile').count(), 2)
+
+
+class PageCaptureTests(MediaTestCase):
+
+    SITEMAP = (b'<?xml version="1.0" encoding="UTF-8"?>'
+               b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+               b'<url><loc>https://example.com/</loc></url>'
+               b'<url><loc>https://example.com/blog</loc></url>'
+               b'<url><loc>https://example.com/blog/post</loc></url>'
+               b'<url><loc>https://example.com/blog</loc></url>'
+               b'</urlset>')
+
+    def test_sitemap_indexes_are_followed_within_the_limits(self):
+        import gzip
+        from . import pages
+
+        index = (b'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                 b'<sitemap><loc>https://example.com/pages.xml.gz</loc></sitemap></sitemapindex>')
+        bodies = {'https://example.com/sitemap.xml': index,
+                  'https://example.com/pages.xml.gz': gzip.compress(self.SITEMAP)}
+
+        with mock.patch('screenshots.pages.fetch_sitemap', side_effect=bodies.__getitem__):
+            self.assertEqual(pages.sitemap_urls('https://example.com/sitemap.xml', 10),
+                             ['https://example.com/', 'https://example.com/blog', 'https://example.com/blog/post'])
+            self.assertEqual(pages.sitemap_urls('https://example.com/sitemap.xml', 10, max_depth=1),
+                             ['https://example.com/', 'https://example.com/blog'])
+            self.assertEqual(pages.sitemap_urls('https://example.com/sitemap.xml', 1), ['https://example.com/'])
+
+    def test_private_sitemaps_are_refused_redirects_included(self):
+        from . import pages
+
+        with mock.patch('screenshots.pages.requests.get') as get:
+            with self.assertRaisesMessage(ValueError, 'points at a private address'):
+                pages.sitemap_urls('http://127.0.0.1:8000/sitemap.xml', 10)
+            get.assert_not_called()
+
+            # a public sitemap redirecting to the internal network
+            get.return_value.__enter__.return_value = mock.Mock(
+                is_redirect=True, headers={'location': 'http://169.254.169.254/latest/'})
+            resolve = socket.getaddrinfo
+            public = [(None, None, None, '', ('93.184.216.34', 80))]
+            with mock.patch('socket.getaddrinfo', lambda host, port: public if host == 'example.com'
+                            else resolve(host, port)), \
+                    self.assertRaisesMessage(ValueError, 'sitemap http://169.254.169.254/latest/ points at'):
+                pages.fetch_sitemap('https://example.com/sitemap.xml')
+            self.assertEqual(get.call_count, 1)
+            self.assertFalse(get.call_args.kwargs['allow_redirects'])
+
+    def test_gzipped_sitemap_is_limited_once_decompressed(self):
+        import gzip
+        from . import pages
+
+        bomb = gzip.compress(self.SITEMAP + b' ' * 1024 * 1024)
+        self.assertLess(len(bomb), 10 * 1024)
+        with override_settings(SITEMAP_MAX_BYTES=64 * 1024), self.assertRaises(ValueError):
+            pages.parse_sitemap(bomb)
+
+    def test_update_validates_pages(self):
+        project = self.create_project()
+        url = reverse('screenshots:update_project_settings', args=[project.id])
+
+        response = self.client.patch(url, json.dumps({'page_urls': ['ftp://example.com/']}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(url, json.dumps({'max_pages': 0}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(url, json.dumps({'page_urls': ['https://example.com/a', 'https://example.com/a'],
+                                                      'max_pages': 5, 'max_depth': 2}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        project.refresh_from_db()
+        self.assertEqual((project.page_urls, project.max_pages, project.max_depth), (['https://example.com/a'], 5, 2))
+
+    def test_crawl_failures_fall_back_per_page(self):
+        service = ScreenshotService(engines=['playwright', 'placeholder'])
+        folder = os.path.join(TEMP_MEDIA_ROOT, 'crawl')
+        os.makedirs(folder, exist_ok=True)
+        devices = [('iPhone 12', service.device_configs['mobile']['iPhone 12'], 'mobile')]
+        failure = {'success': False, 'error': 'timeout', 'device_name': 'iPhone 12', 'device_type': 'mobile'}
+
+        def crawl(urls, devices, output_folder, options, concurrency):
+            yield 1, [failure]  # pages finish in any order
+            raise RuntimeError('browser crashed')
+
+        service._engines['playwright'] = mock.Mock(**{'capture_pages.side_effect': crawl})
+        results = dict(service.capture_pages(['https://example.com/', 'https://example.com/b'], devices, folder, None))
+
+        self.assertEqual(list(results), ['https://example.com/b', 'https://example.com/'])
+        self.assertEqual({r[0]['source'] for r in results.values()}, {'placeholder'})
+        self.assertNotEqual(results['https://example.com/'][0]['path'], results['https://example.com/b'][0]['path'])
+
+    def test_generate_saves_one_row_per_page_and_device(self):
+        project = self.create_project(page_urls=['https://example.com/', 'https://example.com/about'])
+
+        with mock.patch('screenshots.tasks.get_screenshot_service', return_value=ScreenshotService(engines=['placeholder'])), \
+                mock.patch.object(MockupService, 'create_mockup', return_value={'success': False}):
+            result = tasks.generate_screenshots.apply(args=(project.id, ['mobile', 'desktop'])).get()
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['pages'], 2)
+        rows = Screenshot.objects.filter(project=project)
+        self.assertEqual(sorted(rows.values_list('page_url', 'device_type')), [
+            ('https://example.com/', 'desktop'), ('https://example.com/', 'mobile'),
+            ('https://example.com/about', 'desktop'), ('https://example.com/about', 'mobile'),
+        ])
+        response = self.client.get(reverse('screenshots:api_screenshot_list'),
+                                   {'page_url': 'https://example.com/about', 'fields': 'page_url'})
+        self.assertEqual(len(response.json()['screenshots']), 2)
+
+    def test_regenerate_captures_the_row_page(self):
+        project = self.create_project(page_urls=['https://example.com/', 'https://example.com/about'])
+        screenshot = Screenshot.objects.create(project=project, device_type='mobile', device_name='iPhone 12',
+                                               width=390, height=844, original_path='', mockup_path='',
+                                               page_url='https://example.com/about')
+        service = ScreenshotService(engines=['placeholder'])
+
+        with mock.patch('screenshots.tasks.get_screenshot_service', return_value=service), \
+                mock.patch.object(service, 'capture_screenshot', wraps=service.capture_screenshot) as capture, \
+                mock.patch.object(MockupService, 'create_mockup', return_value={'success': False}):
+            result = tasks.regenerate_single_screenshot.apply(args=(screenshot.id,)).get()
+
+        self.assertTrue(result['success'])
+        self.assertEqual(capture.call_args.kwargs['url'], 'https://example.com/about')
+        screenshot.refresh_from_db()
+        self.assertEqual(screenshot.page_url, 'https://example.com/about')
+
+
+class LoginStateTests(MediaTestCase):
+
+    RECIPE = {'url': 'https://example.com/login',
+              'steps': [{'fill': '#password', 'value': 'hunter2'}, {'click': 'button'}],
+              'logged_in_selector': '#account'}
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_recipe_is_validated_and_stored_encrypted(self):
+        from . import auth
+
+        project = self.create_project()
+        url = reverse('screenshots:update_project_settings', args=[project.id])
+
+        response = self.client.patch(url, json.dumps({'login_recipe': {'url': 'https://example.com/login',
+                                                                       'steps': [{'fill': '#email'}]}}),
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.patch(url, json.dumps({'login_recipe': self.RECIPE}), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['settings']['login'])
+        self.assertNotIn('hunter2', response.content.decode())
+        project.refresh_from_db()
+        self.assertNotIn('hunter2', project.login_recipe)
+        self.assertEqual(auth.recipe_of(project), self.RECIPE)
+
+    def test_state_is_cached_and_refreshed_once(self):
+        from . import auth
+
+        project = self.create_project(login_recipe=auth.encrypt(self.RECIPE))
+        states = iter([{'cookies': [{'name': 'sid', 'value': str(n), 'expires': -1}], 'origins': []}
+                       for n in range(3)])
+        sign_in = mock.Mock(side_effect=lambda recipe: next(states))
+
+        first = auth.login_session(project, sign_in)
+        self.assertEqual(first.state()['cookies'][0]['value'], '0')
+        # a later capture starts from the cached state
+        second = auth.login_session(project, sign_in)
+        self.assertEqual(second.state()['cookies'][0]['value'], '0')
+        self.assertEqual(sign_in.call_count, 1)
+        self.assertNotIn(b'sid', json.dumps(cache.get(second._key)).encode())
+
+        # every device / page of a stale capture asks; only the first signs in again
+        self.assertEqual(second.refresh()['cookies'][0]['value'], '1')
+        self.assertEqual(second.refresh()['cookies'][0]['value'], '1')
+        self.assertEqual(sign_in.call_count, 2)
+        self.assertEqual(auth.login_session(project, sign_in).state()['cookies'][0]['value'], '1')
+
+    def test_state_ttl_follows_the_first_cookie_expiry(self):
+        from . import auth
+
+        now = time.time()
+        self.assertEqual(auth.state_ttl({'cookies': [{'expires': -1}]}, now), 12 * 3600)
+        self.assertEqual(auth.state_ttl({'cookies': [{'expires': now + 3660}, {'expires': -1}]}, now), 3600)
+
+    def test_capture_options_carry_the_login(self):
+        from . import auth
+
+        service = ScreenshotService(engines=['placeholder'], login_sessions=auth.login_session)
+        self.assertNotIn('login', service.options(self.create_project()))
+        login = service.options(self.create_project(login_recipe=auth.encrypt(self.RECIPE)))['login']
+        self.assertEqual((login.login_url, login.logged_in_selector), ('https://example.com/login', '#account'))
+
+    def test_selenium_restores_the_whole_state_and_refreshes_a_stale_one(self):
+        from .engines.selenium import SeleniumEngine
+
+        stale = {'cookies': [{'name': 'sid', 'value': 'old', 'domain': 'example.com', 'path': '/', 'expires': -1}],
+                 'origins': [{'origin': 'https://example.com', 'localStorage': [{'name': 'token', 'value': 'old'}]}]}
+        fresh = {'cookies': [{'name': 'sid', 'value': 'new', 'domain': 'example.com', 'path': '/',
+                              'expires': time.time() + 3600}], 'origins': []}
+        login = mock.Mock(logged_in_selector='#account', **{'state.return_value': stale, 'refresh.return_value': fresh})
+
+        driver = mock.Mock()
+        driver.execute_cdp_cmd.side_effect = lambda cmd, params: {'identifier': '1'}
+        driver.execute_script.side_effect = lambda script, *args: 0 if 'scrollHeight' in script else True
+        # signed out on the first load, signed in after the refresh
+        driver.find_elements.side_effect = [[], [mock.Mock()]]
+
+        engine = SeleniumEngine()
+        folder = os.path.join(TEMP_MEDIA_ROOT, 'tmp')
+        os.makedirs(folder, exist_ok=True)
+        devices = [('iPhone 12', {'width': 390, 'height': 844}, 'mobile')]
+        options = {'timeout': 1000, 'navigation_timeout': 1000, 'page_delay': 0, 'scroll_delay': 0, 'login': login}
+        with mock.patch.object(engine, 'start', return_value=driver), \
+                mock.patch.object(engine, '_full_page_png', return_value=(b'png', [])):
+            result, = engine.capture('https://example.com/app', devices, folder, options)
+
+        self.assertTrue(result['success'])
+        login.refresh.assert_called_once()
+        self.assertEqual([c.args[0] for c in driver.get.call_args_list][:2], ['https://example.com/app'] * 2)
+        calls = driver.execute_cdp_cmd.call_args_list
+        cookies = [c.args[1]['cookies'] for c in calls if c.args[0] == 'Network.setCookies']
+        # the session cookie goes in without an expiry, the refreshed one keeps its own
+        self.assertNotIn('expires', cookies[0][0])
+        self.assertIn('expires', cookies[1][0])
+        [script] = [c.args[1]['source'] for c in calls if c.args[0] == 'Page.addScriptToEvaluateOnNewDocument']
+        self.assertIn('"https://example.com": [{"name": "token", "value": "old"}]', script)
+        self.assertIn('Page.removeScriptToEvaluateOnNewDocument', [c.args[0] for c in calls])
+
+    def test_engines_without_login_are_skipped(self):
+        from . import auth
+
+        service = ScreenshotService(engines=['placeholder'], login_sessions=auth.login_session)
+        project = self.create_project(login_recipe=auth.encrypt(self.RECIPE))
+        devices = [('iPhone 12', service.device_configs['mobile']['iPhone 12'], 'mobile')]
+        with tempfile.TemporaryDirectory() as folder:
+            results = service.capture_screenshot('https://example.com', devices, folder, project)
+            self.assertEqual(os.listdir(folder), [])
+
+        self.assertFalse(results[0]['success'])
+        self.assertEqual(results[0]['error'], "placeholder can't capture logged in")
+
+
+@override_settings(CAPTURE_PREVIEW=True)
+class PreviewTests(MediaTestCase):
+
+    def fake_capture(self, content, events):
+        def capture(url, devices, output_folder, project, progress_callback=None, **kwargs):
+            events.append(content)
+            results = []
+            for device_name, config, device_type in devices:
+                path = os.path.join(output_folder, f'{device_type}_{content}.png')
+                with open(path, 'wb') as f:
+                    f.write(content.encode())
+                results.append({'success': True, 'path': path, 'device_name': device_name,
+                                'device_type': device_type, 'width': config['width'], 'height': config['height']})
+            return results
+        return capture
+
+    def test_preview_row_is_replaced_by_the_full_capture(self):
+        project = self.create_project()
+        events, seen = [], []
+
+        announced = {}
+
+        def record(task, stage, **meta):
+            if stage == 'preview':
+                # announced, and already saved, before the full capture starts
+                seen.extend(Screenshot.objects.filter(project=project).values_list('id', 'is_preview'))
+                events.append('announced')
+                announced.update(json.loads(json.dumps(meta)))
+
+        with mock.patch.object(ScreenshotService, 'capture_previews', side_effect=self.fake_capture('preview', events)), \
+                mock.patch.object(ScreenshotService, 'capture_screenshot', side_effect=self.fake_capture('full', events)), \
+                mock.patch.object(ScreenshotService, 'session'), \
+                mock.patch.object(MockupService, 'create_mockup', return_value={'success': False}), \
+                mock.patch.object(tasks, 'report_progress', side_effect=record):
+            result = tasks.generate_screenshots.apply(args=(project.id, ['mobile'])).get()
+
+        self.assertEqual(events, ['preview', 'announced', 'full'])
+        [(preview_id, is_preview)] = seen
+        # what the project page shows while the full capture runs
+        device = announced['devices']['mobile']
+        self.assertEqual(device['stage'], 'preview')
+        self.assertEqual(device['preview']['id'], preview_id)
+        self.assertTrue(device['preview']['original_path'])
+        self.assertIsNotNone(announced['first_image_seconds'])
+        page = self.client.get(reverse('screenshots:project_detail', args=[project.id]))
+        self.assertContains(page, 'preview: "Preview ready, capturing full page..."')
+        self.assertContains(page, 'preview.original_path')
+        self.assertTrue(is_preview)
+        self.assertIsNotNone(result['first_image_seconds'])
+
+        screenshot = Screenshot.objects.get(project=project)
+        self.assertEqual((screenshot.id, screenshot.is_preview), (preview_id, False))
+        with open(artifact_path(screenshot.original_path), 'rb') as f:
+            self.assertEqual(f.read(), b'full')
+        # the preview's file is released, and counted once
+        self.assertEqual(Artifact.objects.count(), 1)
+        project.refresh_from_db()
+        self.assertEqual(project.screenshot_counter, 1)
+        self.assertEqual(quota.get_usage(project.creator_id)['files'], 1)
+        [entry] = [e for e in metrics.snapshot() if e['name'] == 'capture_time_to_first_image_seconds']
+        self.assertEqual((entry['labels'], entry['count']), ({'phase': 'preview'}, 1))
+
+    def test_preview_is_dropped_when_the_full_capture_fails(self):
+        project = self.create_project()
+        events = []
+
+        def failed_capture(url, devices, output_folder, project, progress_callback=None):
+            device_name, _, device_type = devices[0]
+            return [{'success': False, 'error': 'timeout', 'device_name': device_name, 'device_type': device_type}]
+
+        with mock.patch.object(ScreenshotService, 'capture_previews', side_effect=self.fake_capture('preview', events)), \
+                mock.patch.object(ScreenshotService, 'session'), \
+                mock.patch.object(MockupService, 'create_mockup', return_value={'success': False}):
+            with mock.patch.object(ScreenshotService, 'capture_screenshot', side_effect=failed_capture), \
+                    self.captureOnCommitCallbacks(execute=True):
+                result = tasks.generate_screenshots.apply(args=(project.id, ['mobile'])).get()
+            self.assertEqual((result['screenshots'], result['failed'][0]['error']), ([], 'timeout'))
+
+            # the task raising after the previews were saved drops them as well
+            with mock.patch.object(ScreenshotService, 'capture_screenshot', side_effect=RuntimeError('boom')), \
+                    self.captureOnCommitCallbacks(execute=True):
+                result = tasks.generate_screenshots.apply(args=(project.id, ['mobile'])).get()
+            self.assertFalse(result['success'])
+
+        self.assertFalse(Screenshot.objects.filter(project=project).exists())
+        self.assertFalse(Artifact.objects.exists())
+        project.refresh_from_db()
+        self.assertEqual(project.screenshot_counter, 0)
+        self.assertEqual(quota.get_usage(project.creator_id)['files'], 0)
+
+    def test_preview_is_a_downscaled_viewport(self):
+        from PIL import Image
+        from .engines.playwright import PlaywrightEngine
+        from .timing import PhaseTimer
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (390, 844), 'white').save(buffer, 'JPEG')
+        page = mock.Mock(**{'screenshot.return_value': buffer.getvalue()})
+        folder = os.path.join(TEMP_MEDIA_ROOT, 'preview')
+        os.makedirs(folder, exist_ok=True)
+
+        result = PlaywrightEngine()._capture_preview(page, ('iPhone 12', {'width': 390, 'height': 844}, 'mobile'),
+                                                     folder, {'scale': 0.5, 'quality': 60}, PhaseTimer())
+
+        self.assertEqual(page.screenshot.call_args.kwargs['type'], 'jpeg')
+        self.assertNotIn('full_page', page.screenshot.call_args.kwargs)
+        with Image.open(result['path']) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (195, 422)))
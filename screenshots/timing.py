@@ -0,0 +1,40 @@
+# screenshots/timing.py
+"""
+Per-phase wall-clock timings of a capture.
+
+Kept free of Django so the capture services can use it. Phases recorded:
+
+  capture   navigation, page_delay, viewport, scrolling, rasterization
+            (Chromium's screenshot, PNG encoding included), save
+  mockup    mockup_decode, mockup_fit, mockup_composite, mockup_encode
+  task      storage (moving files into the artifact storage), db_write
+
+navigation and page_delay happen once per page; they are charged to the
+first device captured from it.
+"""
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """Accumulates seconds per named phase"""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def take(self):
+        """Return the phases recorded so far (rounded to the millisecond) and start over"""
+        phases = {name: round(seconds, 3) for name, seconds in self.phases.items()}
+        self.phases = {}
+        return phases
@@ -1,8 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
 
-from django.conf import settings
-from django.conf.urls.static import static
+# ✅ enqueue / status endpoints: async views under ASGI, sync views under WSGI
+api = async_views if getattr(settings, 'ASYNC_API_VIEWS', False) else views
 
 app_name = 'screenshots'
 
@@ -12,17 +13,22 @@ urlpatterns = [
     path('project/<int:project_id>/', views.ProjectDetailView.as_view(), name='project_detail'),
     
     # API routes
-    path('api/projects/', views.ProjectAPIView.as_view(), name='api_projects'),
-    path('api/projects/<int:project_id>/screenshots/', views.ScreenshotAPIView.as_view(), name='api_screenshots'),
+    path('api/projects/', api.ProjectAPIView.as_view(), name='api_projects'),
+    path('api/projects/<int:project_id>/screenshots/', api.ScreenshotAPIView.as_view(), name='api_screenshots'),
     path('api/projects/<int:project_id>/delete/', views.delete_project, name='api_delete_project'),
     path("api/projects/<int:project_id>/update/", views.update_project_settings, name="update_project_settings"),
 
+    path('api/screenshots/', views.screenshot_list, name='api_screenshot_list'),
     path('api/screenshots/<int:screenshot_id>/delete', views.delete_screenshot, name='delete_screenshot'),
-    path('api/screenshots/<int:screenshot_id>/regenerate/', views.regenerate_screenshot, name='regenerate_screenshot'),
-]
+    path('api/screenshots/<int:screenshot_id>/regenerate/', api.regenerate_screenshot, name='regenerate_screenshot'),
 
-# Serve media files during development
+    path('api/capture/', api.capture_now, name='api_capture_now'),
+    path('api/creators/<str:creator_id>/usage/', views.storage_usage, name='api_storage_usage'),
 
+    path('api/cache/stats/', views.response_cache_stats, name='api_cache_stats'),
+    path('metrics', views.prometheus_metrics, name='metrics'),
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    # Task status / progress
+    path('api/tasks/<str:task_id>/', api.task_status, name='api_task_status'),
+    path('api/tasks/<str:task_id>/events/', api.task_events, name='api_task_events'),
+]
@@ -1,22 +1,34 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.views import View
 from django.utils.decorators import method_decorator
+from django.utils import timezone
+from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.core.validators import URLValidator
 import json
 import os
 import logging
+import time
+
+from celery.result import AsyncResult
 
 from .models import Project, Screenshot
-from .services import ScreenshotService, MockupService
+from .listing import ListParamError, keyset_page, parse_fields, parse_limit, serialize, conditional_json
+from .caching import cached, cache_stats, list_key, project_key
+from .storage import is_artifact
+from .quota import get_usage
+from . import auth, live, metrics, pages, scheduling, webhooks
+from .worker import get_screenshot_service
 
 
 from django.conf import settings
 
 # for celery screenshot generation
 # in views.py
-from .tasks import generate_screenshots, regenerate_single_screenshot
+from .tasks import generate_screenshots, regenerate_single_screenshot, purge_project, remove_media_files
 
 
 def make_relative_path(abs_path):
@@ -35,8 +47,11 @@ class ProjectListView(View):
     
     def get(self, request):
         """Render the main page with projects list"""
-        projects = Project.objects.all()
-        return render(request, 'screenshots/index.html', {'projects': projects})
+        def build():
+            projects = Project.objects.with_screenshot_count()
+            return render(request, 'screenshots/index.html', {'projects': projects}).content
+
+        return HttpResponse(cached('project_list', list_key('project_list'), build))
 
 
 class ProjectDetailView(View):
@@ -44,12 +59,172 @@ class ProjectDetailView(View):
     
     def get(self, request, project_id):
         """Render project detail page"""
-        project = get_object_or_404(Project, id=project_id)
-        screenshots = project.screenshots.all()
-        return render(request, 'screenshots/project_detail.html', {
-            'project': project,
-            'screenshots': screenshots
-        })
+        def build():
+            project = get_object_or_404(Project, id=project_id)
+            screenshots = project.screenshots.all()
+            return render(request, 'screenshots/project_detail.html', {
+                'project': project,
+                'screenshots': screenshots
+            }).content
+
+        return HttpResponse(cached('project_detail', project_key('project_detail', project_id), build))
+
+
+# field name -> serializer, used by the list endpoints and ?fields= selection
+PROJECT_FIELDS = {
+    'id': lambda p: p.id,
+    'name': lambda p: p.name,
+    'website_url': lambda p: p.website_url,
+    'creator_id': lambda p: p.creator_id,
+    'creator_name': lambda p: p.creator_name,
+    'screenshot_count': lambda p: p.screenshot_count,
+    'created_at': lambda p: p.created_at.isoformat(),
+    'updated_at': lambda p: p.updated_at.isoformat(),
+}
+
+SCREENSHOT_FIELDS = {
+    'id': lambda s: s.id,
+    'project_id': lambda s: s.project_id,
+    'device_type': lambda s: s.device_type,
+    'device_name': lambda s: s.device_name,
+    'width': lambda s: s.width,
+    'height': lambda s: s.height,
+    'original_path': lambda s: s.original_path,
+    'mockup_path': lambda s: s.mockup_path,
+    'original_url': lambda s: s.original_url,
+    'mockup_url': lambda s: s.mockup_url,
+    'page_url': lambda s: s.page_url,
+    'is_preview': lambda s: s.is_preview,
+    'created_at': lambda s: s.created_at.isoformat(),
+    'timings': lambda s: s.timings,
+}
+
+
+def screenshot_list_query(request, queryset):
+    """Apply the list filters; returns (queryset, fields, limit) and raises ListParamError on bad parameters"""
+    fields = parse_fields(request, SCREENSHOT_FIELDS)
+    limit = parse_limit(request)
+
+    if request.GET.get('creator_id'):
+        queryset = queryset.filter(project__creator_id=request.GET['creator_id'])
+    if request.GET.get('device_type'):
+        queryset = queryset.filter(device_type=request.GET['device_type'])
+    if request.GET.get('page_url'):
+        queryset = queryset.filter(page_url=request.GET['page_url'])
+    return queryset, fields, limit
+
+
+def screenshot_list_data(page, next_cursor, fields):
+    """(data, last_modified) for a page of screenshots"""
+    return {
+        'screenshots': [serialize(screenshot, fields, SCREENSHOT_FIELDS) for screenshot in page],
+        'next_cursor': next_cursor,
+    }, max((s.created_at for s in page), default=None)
+
+
+def list_screenshots(request, queryset):
+    """Paginated list of screenshots (?cursor=, ?limit=, ?creator_id=, ?device_type=, ?page_url=, ?fields=)
+
+    Returns (data, last_modified); raises ListParamError on bad parameters
+    """
+    queryset, fields, limit = screenshot_list_query(request, queryset)
+    page, next_cursor = keyset_page(queryset, request.GET.get('cursor'), limit)
+    return screenshot_list_data(page, next_cursor, fields)
+
+
+def project_list_query(request):
+    """Projects matching the list parameters; returns (queryset, fields, limit)"""
+    fields = parse_fields(request, PROJECT_FIELDS)
+    limit = parse_limit(request)
+
+    projects = Project.objects.all()
+    if 'screenshot_count' in fields:
+        projects = projects.with_screenshot_count()
+    if request.GET.get('creator_id'):
+        projects = projects.filter(creator_id=request.GET['creator_id'])
+    return projects, fields, limit
+
+
+def project_list_data(page, next_cursor, fields):
+    """(data, last_modified) for a page of projects"""
+    return {
+        'projects': [serialize(project, fields, PROJECT_FIELDS) for project in page],
+        'next_cursor': next_cursor,
+    }, max((p.updated_at for p in page), default=None)
+
+
+def clean_webhook_url(value):
+    """'' or a valid http(s) URL on a public address (raises ValidationError)"""
+    if not value:
+        return ''
+    try:
+        URLValidator(schemes=['http', 'https'])(value)
+    except ValidationError:
+        raise ValidationError('webhook_url must be an http(s) URL')
+    try:
+        return webhooks.check_url(value)
+    except ValueError as e:
+        raise ValidationError(f'webhook_url {e}')
+
+
+def parse_project_data(body):
+    """Validated fields for a new project, or None when one is missing
+
+    Raises json.JSONDecodeError / ValidationError
+    """
+    data = json.loads(body)
+    fields = {key: data.get(key) for key in ('name', 'website_url', 'creator_id', 'creator_name')}
+    if not all(fields.values()):
+        return None
+    fields['webhook_url'] = clean_webhook_url(data.get('webhook_url'))
+    return fields
+
+
+def parse_generate_data(body):
+    """(devices, task kwargs) for a generate request
+
+    An optional webhook_url overrides the project's; "profile": true records a CaptureProfile
+    """
+    data = json.loads(body)
+    devices = data.get('devices', ['mobile', 'tablet', 'desktop'])
+    options = {}
+    webhook_url = clean_webhook_url(data.get('webhook_url'))
+    if webhook_url:
+        options['webhook_url'] = webhook_url
+    if data.get('profile'):
+        if not getattr(settings, 'CAPTURE_PROFILING_ENABLED', True):
+            raise ValidationError('Profiling is disabled on this server')
+        options['profile'] = True
+    return devices, options
+
+
+def project_created_response(project):
+    logging.info(f"Created project: {project.name} with ID: {project.id}")
+
+    return JsonResponse({
+        'message': 'Project created successfully',
+        'project': {
+            'id': project.id,
+            'name': project.name,
+            'website_url': project.website_url,
+            'creator_id': project.creator_id,
+            'creator_name': project.creator_name,
+            'page_delay': project.page_delay,
+            'webhook_url': project.webhook_url,
+            'screenshot_count': project.screenshot_count,
+            'created_at': project.created_at.isoformat(),
+            'updated_at': project.updated_at.isoformat()
+        }
+    })
+
+
+def cached_list_response(request, view, key, build):
+    """Serve a list endpoint through the response cache with conditional GET"""
+    try:
+        data, last_modified = cached(view, key, build)
+    except ListParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return conditional_json(request, data, last_modified=last_modified)
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -57,60 +232,29 @@ class ProjectAPIView(View):
     """API view for creating projects"""
     
     def get(self, request):
-        """Get all projects"""
-        projects = Project.objects.all()
-        projects_data = []
-        
-        for project in projects:
-            projects_data.append({
-                'id': project.id,
-                'name': project.name,
-                'website_url': project.website_url,
-                'screenshot_count': project.screenshot_count,
-                'created_at': project.created_at.isoformat(),
-                'updated_at': project.updated_at.isoformat()
-            })
-        
-        return JsonResponse({'projects': projects_data})
-    
+        """List projects, newest first (?cursor=, ?limit=, ?creator_id=, ?fields=)"""
+        return cached_list_response(request, 'api_projects', list_key('api_projects', request),
+                                    lambda: self.list_projects(request))
+
+    def list_projects(self, request):
+        projects, fields, limit = project_list_query(request)
+        page, next_cursor = keyset_page(projects, request.GET.get('cursor'), limit)
+        return project_list_data(page, next_cursor, fields)
+
     def post(self, request):
         """Create a new project"""
         try:
-            data = json.loads(request.body)
-            name = data.get('name')
-            website_url = data.get('website_url')
-            creator_id = data.get('creator_id')
-            creator_name = data.get('creator_name')
-            
-            if not all([name, website_url, creator_id, creator_name]):
+            data = parse_project_data(request.body)
+            if data is None:
                 return JsonResponse({'error': 'Name and website_url are required'}, status=400)
-            
-            project = Project.objects.create(
-                name=name,
-                website_url=website_url,
-                creator_id=creator_id,
-                creator_name=creator_name
-            )
-            
-            logging.info(f"Created project: {name} with ID: {project.id}")
-            
-            return JsonResponse({
-                'message': 'Project created successfully',
-                'project': {
-                    'id': project.id,
-                    'name': project.name,
-                    'website_url': project.website_url,
-                    'creator_id': project.creator_id,
-                    'creator_name': project.creator_name,
-                    'page_delay': project.page_delay,
-                    'screenshot_count': project.screenshot_count,
-                    'created_at': project.created_at.isoformat(),
-                    'updated_at': project.updated_at.isoformat()
-                }
-            })
+
+            project = Project.objects.create(**data)
+            return project_created_response(project)
             
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except ValidationError as e:
+            return JsonResponse({'error': e.messages[0]}, status=400)
         except Exception as e:
             logging.error(f"Error creating project: {str(e)}")
             return JsonResponse({'error': str(e)}, status=500)
@@ -121,21 +265,31 @@ class ProjectAPIView(View):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class ScreenshotAPIView(View):
-    """API view for generating screenshots"""
-    
+    """API view for listing and generating a project's screenshots"""
+
+    def get(self, request, project_id):
+        """List this project's screenshots"""
+        def build():
+            project = get_object_or_404(Project, id=project_id)
+            return list_screenshots(request, project.screenshots.all())
+
+        return cached_list_response(request, 'api_project_screenshots',
+                                    project_key('api_project_screenshots', project_id, request), build)
+
     def post(self, request, project_id):
         try:
             project = get_object_or_404(Project, id=project_id)
-            data = json.loads(request.body)
-            devices = data.get('devices', ['mobile', 'tablet', 'desktop'])
+            devices, options = parse_generate_data(request.body)
 
-            task = generate_screenshots.delay(project.id, devices)
+            task = generate_screenshots.delay(project.id, devices, **options)
 
             return JsonResponse({
                 "message": "Screenshots task queued",
                 "task_id": task.id
             })
 
+        except ValidationError as e:
+            return JsonResponse({'error': e.messages[0]}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
         
@@ -143,25 +297,35 @@ class ScreenshotAPIView(View):
 
 
 
+@require_http_methods(["GET"])
+def screenshot_list(request):
+    """List screenshots across projects (?project_id= narrows to one project)"""
+    screenshots = Screenshot.objects.filter(project__deleted_at__isnull=True)
+    project_id = request.GET.get('project_id')
+    if project_id:
+        if not project_id.isdigit():
+            return JsonResponse({'error': 'project_id must be an integer'}, status=400)
+        screenshots = screenshots.filter(project_id=project_id)
+    return cached_list_response(request, 'api_screenshots', list_key('api_screenshots', request),
+                                lambda: list_screenshots(request, screenshots))
+
+
 @require_http_methods(["DELETE"])
 @csrf_exempt
 def delete_project(request, project_id):
-    """Delete a project and its screenshots"""
+    """Delete a project and its screenshots (soft delete now, files removed in the background)"""
     try:
         project = get_object_or_404(Project, id=project_id)
-        
-        # Delete associated files
-        project_folder = project.get_project_folder()
-        if os.path.exists(project_folder):
-            import shutil
-            shutil.rmtree(project_folder)
-        
-        project_name = project.name
-        project.delete()
-        
-        logging.info(f"Deleted project: {project_name}")
-        
-        return JsonResponse({'message': f'Project "{project_name}" deleted successfully'})
+
+        project.deleted_at = timezone.now()
+        project.save(update_fields=['deleted_at'])
+
+        # rows and files are purged by a worker once the soft delete is committed
+        transaction.on_commit(lambda: purge_project.delay(project.id))
+
+        logging.info(f"Deleted project: {project.name}")
+
+        return JsonResponse({'message': f'Project "{project.name}" deleted successfully'})
         
     except Exception as e:
         logging.error(f"Error deleting project: {str(e)}")
@@ -174,22 +338,19 @@ def delete_project(request, project_id):
 def delete_screenshot(request, screenshot_id):
     """Delete individual screenshot (full + mockup)"""
     try:
-        screenshot = get_object_or_404(Screenshot, id=screenshot_id)
-        
-        # Delete files
-        if screenshot.original_path and os.path.exists(screenshot.original_path):
-            os.remove(screenshot.original_path)
-        if screenshot.mockup_path and os.path.exists(screenshot.mockup_path):
-            os.remove(screenshot.mockup_path)
+        screenshot = get_object_or_404(Screenshot, id=screenshot_id, project__deleted_at__isnull=True)
+        project_id = screenshot.project_id
+        paths = [screenshot.original_path, screenshot.mockup_path]
 
-        project = screenshot.project
+        # artifact references are released by the post_delete signal
         screenshot.delete()
 
-        # update project screenshot count
-        # project.screenshot_count = project.screenshots.count()
-        # project.save(update_fields=["screenshot_count"])
+        # legacy per-project files are removed by a worker
+        legacy_paths = [p for p in paths if p and not is_artifact(p)]
+        if legacy_paths:
+            transaction.on_commit(lambda: remove_media_files.delay(legacy_paths))
 
-        logging.info(f"[Delete] Screenshot {screenshot_id} deleted for project {project.id}")
+        logging.info(f"[Delete] Screenshot {screenshot_id} deleted for project {project_id}")
 
         return JsonResponse({"message": f"Screenshot {screenshot_id} deleted successfully"})
     
@@ -203,7 +364,7 @@ def delete_screenshot(request, screenshot_id):
 def regenerate_screenshot(request, screenshot_id):
     """Regenerate an individual screenshot + mockup"""
     try:
-        screenshot = get_object_or_404(Screenshot, id=screenshot_id)
+        screenshot = get_object_or_404(Screenshot, id=screenshot_id, project__deleted_at__isnull=True)
         project = screenshot.project
 
         # queue Celery regeneration
@@ -234,6 +395,10 @@ def update_project_settings(request, project_id):
         project.page_delay = data.get("page_delay", project.page_delay)
         project.scroll_delay = data.get("scroll_delay", project.scroll_delay)
         project.timeout = data.get("timeout", project.timeout)
+        project.webhook_url = clean_webhook_url(data.get("webhook_url", project.webhook_url))
+        scheduling.clean_schedule(data, project)
+        pages.clean_pages(data, project)
+        auth.clean_login_recipe(data, project)
         project.save()
         logging.info("project data updatted")
 
@@ -244,10 +409,158 @@ def update_project_settings(request, project_id):
                 "page_delay": project.page_delay,
                 "scroll_delay": project.scroll_delay,
                 "timeout": project.timeout,
+                "webhook_url": project.webhook_url,
+                "schedule_interval": project.schedule_interval,
+                "schedule_devices": project.schedule_devices,
+                "next_capture_at": project.next_capture_at.isoformat() if project.next_capture_at else None,
+                "page_urls": project.page_urls,
+                "sitemap_url": project.sitemap_url,
+                "max_pages": project.max_pages,
+                "max_depth": project.max_depth,
+                # the recipe holds credentials: never sent back
+                "login": bool(project.login_recipe),
             }
         })
 
     except Project.DoesNotExist:
         return JsonResponse({"error": "Project not found"}, status=404)
+    except ValidationError as e:
+        return JsonResponse({"error": e.messages[0]}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+
+
+def task_payload(task_id):
+    """Build a JSON-serialisable snapshot of a Celery task's state and progress"""
+    result = AsyncResult(task_id)
+    state = result.state
+    info = result.info
+
+    payload = {
+        "task_id": task_id,
+        "state": state,
+        "ready": state in ("SUCCESS", "FAILURE", "REVOKED"),
+    }
+
+    if state == "PROGRESS" and isinstance(info, dict):
+        payload["progress"] = info
+    elif state == "SUCCESS":
+        payload["result"] = info
+    elif state == "FAILURE":
+        payload["error"] = str(info)
+
+    return payload
+
+
+@require_http_methods(["GET"])
+def task_status(request, task_id):
+    """Return the current state (and progress) of a queued task"""
+    try:
+        return JsonResponse(task_payload(task_id))
+    except Exception as e:
+        logging.error(f"Error reading task {task_id}: {str(e)}")
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+class TaskEventStream:
+    """State of one task progress SSE stream, shared by the sync and async views"""
+
+    def __init__(self, task_id):
+        self.task_id = task_id
+        self.interval = getattr(settings, 'TASK_EVENTS_POLL_INTERVAL', 1.0)
+        self.heartbeat = getattr(settings, 'TASK_EVENTS_HEARTBEAT', 15.0)
+        self.deadline = time.monotonic() + getattr(settings, 'TASK_EVENTS_MAX_DURATION', 600)
+        self.last_sent = None
+        self.last_write = time.monotonic()
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+    def event_for(self, payload):
+        """SSE chunk for a new payload: an event when it changed, a keep-alive when idle, else None"""
+        data = json.dumps(payload)
+        if data != self.last_sent:
+            self.last_sent = data
+            self.last_write = time.monotonic()
+            return f"event: {'done' if payload['ready'] else 'progress'}\ndata: {data}\n\n"
+        if time.monotonic() - self.last_write >= self.heartbeat:
+            # ✅ comment line keeps proxies from closing an idle connection
+            self.last_write = time.monotonic()
+            return ": keep-alive\n\n"
+        return None
+
+    def timeout_event(self):
+        return f"event: timeout\ndata: {json.dumps({'task_id': self.task_id})}\n\n"
+
+
+def _task_event_stream(task_id):
+    """Yield Server-Sent Events whenever the task state changes, until it is finished"""
+    stream = TaskEventStream(task_id)
+
+    yield "retry: 3000\n\n"
+    while not stream.expired():
+        payload = task_payload(task_id)
+        event = stream.event_for(payload)
+        if event:
+            yield event
+        if payload['ready']:
+            return
+        time.sleep(stream.interval)
+
+    yield stream.timeout_event()
+
+
+@require_http_methods(["GET"])
+def task_events(request, task_id):
+    """Stream task progress to the browser as Server-Sent Events"""
+    response = StreamingHttpResponse(_task_event_stream(task_id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # ✅ disable nginx buffering so events arrive immediately
+    return response
+
+
+@require_http_methods(["GET"])
+def response_cache_stats(request):
+    """Hit / miss counts of the page and API response cache"""
+    return JsonResponse({'views': cache_stats()})
+
+
+@require_http_methods(["GET"])
+def prometheus_metrics(request):
+    """Shared metrics of every web and worker process in the Prometheus text format"""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return JsonResponse({'error': 'Unauthorized'}, status=401)
+    return HttpResponse(metrics.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@require_http_methods(["GET"])
+def storage_usage(request, creator_id):
+    """Storage used by a creator and their quota"""
+    return JsonResponse(get_usage(creator_id))
+
+
+@require_http_methods(["GET"])
+def capture_now(request):
+    """Capture a URL right now and return the image bytes (no project, no files)
+
+    ?url= &device= &device_name= &width= &height= &format=png|jpeg &quality= &full_page=1 &delay= &budget_ms=
+    """
+    started_at = time.monotonic()
+    try:
+        options = live.parse_capture_request(request.GET, get_screenshot_service().device_configs)
+        future = live.get_pool().submit(options)
+    except live.CaptureParamError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except live.CaptureRejected as e:
+        return live.rejected_response(e, started_at)
+
+    try:
+        result = future.result(timeout=options['budget'] / 1000)
     except Exception as e:
-        return JsonResponse({"error": str(e)}, status=500)
\ No newline at end of file
+        return live.failed_response(e, started_at, future)
+    return live.image_response(result, options, started_at)
@@ -0,0 +1,227 @@
+# screenshots/webhooks.py
+"""
+Completion webhooks.
+
+notify() records an event as a WebhookDelivery row and schedules one
+deliver_webhooks task per endpoint, a few seconds later, on the
+'webhooks' queue. Events that arrive for the same endpoint in the
+meantime go out in the same request, as a batch:
+
+    {"deliveries": [{"id": 7, "event": "screenshots.completed", "created_at": ..., "data": {...}}]}
+
+where data is the generate_screenshots task result plus project_id and
+task_id. Every request is signed:
+
+    X-Webhook-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>" with WEBHOOK_SECRET>
+
+Connection errors, 429 and 5xx responses are retried with exponential
+backoff up to WEBHOOK_MAX_ATTEMPTS; other 4xx responses fail at once.
+
+Endpoints on private / loopback addresses are refused (unless
+WEBHOOK_ALLOW_PRIVATE), when the URL is saved and again right before each
+request; redirects are not followed.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from . import addresses, metrics
+from .models import WebhookDelivery
+
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+
+_sessions = threading.local()
+
+
+# ---------------------------
+# ✅ SIGNING
+# ---------------------------
+def webhook_secret():
+    return getattr(settings, 'WEBHOOK_SECRET', None) or settings.SECRET_KEY
+
+
+def sign(body, timestamp=None, secret=None):
+    """Signature header value for a request body (bytes)"""
+    timestamp = int(timestamp if timestamp is not None else time.time())
+    mac = hmac.new((secret or webhook_secret()).encode(), f'{timestamp}.'.encode() + body, hashlib.sha256)
+    return f't={timestamp},v1={mac.hexdigest()}'
+
+
+def verify_signature(header, body, secret=None, tolerance=300):
+    """Check a signature header the way a receiver should (constant-time, with a replay window)"""
+    try:
+        parts = dict(item.split('=', 1) for item in header.split(','))
+        timestamp = int(parts['t'])
+    except (ValueError, KeyError, AttributeError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    expected = sign(body, timestamp, secret).split('v1=', 1)[1]
+    return hmac.compare_digest(expected, parts.get('v1', ''))
+
+
+def check_url(url):
+    """Raise ValueError when url is on a private address (and WEBHOOK_ALLOW_PRIVATE is off)"""
+    if not getattr(settings, 'WEBHOOK_ALLOW_PRIVATE', False):
+        addresses.check_public_url(url)
+    return url
+
+
+# ---------------------------
+# ✅ QUEUEING + COALESCING
+# ---------------------------
+def _schedule_key(url):
+    return f"webhooks:scheduled:{hashlib.sha1(url.encode()).hexdigest()}"
+
+
+def _cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def schedule(url, countdown=None):
+    """Queue a delivery run for url unless one is already waiting"""
+    from .tasks import deliver_webhooks
+
+    countdown = getattr(settings, 'WEBHOOK_COALESCE_SECONDS', 2) if countdown is None else countdown
+    # the marker outlives the countdown a little so a burst maps to one run
+    if not _cache().add(_schedule_key(url), 1, countdown + 30):
+        return False
+    deliver_webhooks.apply_async(args=[url], countdown=countdown)
+    return True
+
+
+def notify(url, event, data):
+    """Record a webhook event for url and make sure a delivery is scheduled"""
+    if not url:
+        return None
+    delivery = WebhookDelivery.objects.create(url=url, event=event, payload=data)
+    try:
+        schedule(url)
+    except Exception as e:
+        # the row is kept; the next event for this endpoint picks it up
+        logging.warning(f"[Webhook] Could not schedule delivery to {url}: {e}")
+    return delivery
+
+
+# ---------------------------
+# ✅ DELIVERY
+# ---------------------------
+def session():
+    """Per-thread pooled HTTP session (keep-alive connections are reused across deliveries)"""
+    if getattr(_sessions, 'session', None) is None:
+        pool_size = getattr(settings, 'WEBHOOK_POOL_SIZE', 10)
+        s = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        s.mount('http://', adapter)
+        s.mount('https://', adapter)
+        s.headers['User-Agent'] = 'screenshot-generator-webhooks/1'
+        _sessions.session = s
+    return _sessions.session
+
+
+def backoff(attempts):
+    """Seconds before retry number `attempts`: exponential, capped, with jitter"""
+    base = getattr(settings, 'WEBHOOK_RETRY_BASE_SECONDS', 10)
+    cap = getattr(settings, 'WEBHOOK_RETRY_MAX_SECONDS', 3600)
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _claim(url):
+    """Atomically take the due events of url (stale claims of crashed runs included)"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'WEBHOOK_TIMEOUT', 10) * 6)
+    due = WebhookDelivery.objects.filter(url=url).filter(
+        Q(status=WebhookDelivery.PENDING, next_attempt_at__lte=now)
+        | Q(status=WebhookDelivery.SENDING, claimed_at__lt=stale)
+    ).order_by('created_at')
+    ids = list(due.values_list('id', flat=True)[:getattr(settings, 'WEBHOOK_BATCH_SIZE', 50)])
+
+    token = uuid.uuid4().hex
+    WebhookDelivery.objects.filter(id__in=ids, status__in=[WebhookDelivery.PENDING, WebhookDelivery.SENDING]).update(
+        status=WebhookDelivery.SENDING, claim_token=token, claimed_at=now
+    )
+    return list(WebhookDelivery.objects.filter(claim_token=token, status=WebhookDelivery.SENDING))
+
+
+def _post(url, deliveries):
+    """Send one batch; returns (ok, retryable, error)"""
+    try:
+        # checked again here: the host may resolve elsewhere since the URL was saved
+        check_url(url)
+    except ValueError as e:
+        return False, False, f'webhook_url {e}'
+
+    body = json.dumps({'deliveries': [
+        {'id': d.id, 'event': d.event, 'created_at': d.created_at, 'data': d.payload} for d in deliveries
+    ]}, cls=DjangoJSONEncoder).encode()
+    headers = {
+        'Content-Type': 'application/json',
+        SIGNATURE_HEADER: sign(body),
+        'X-Webhook-Event': ','.join(sorted({d.event for d in deliveries})),
+    }
+    try:
+        response = session().post(url, data=body, headers=headers, timeout=getattr(settings, 'WEBHOOK_TIMEOUT', 10),
+                                  allow_redirects=False)
+    except requests.RequestException as e:
+        return False, True, str(e)
+
+    if 200 <= response.status_code < 300:
+        return True, False, ''
+    retryable = response.status_code == 429 or response.status_code >= 500
+    return False, retryable, f'HTTP {response.status_code}'
+
+
+def deliver(url):
+    """Send every due event of url in one signed request; returns the number delivered"""
+    # new events from now on schedule a fresh run
+    _cache().delete(_schedule_key(url))
+
+    deliveries = _claim(url)
+    delivered = 0
+    if deliveries:
+        ids = [d.id for d in deliveries]
+        started = time.monotonic()
+        ok, retryable, error = _post(url, deliveries)
+        metrics.observe('webhook_delivery_seconds', time.monotonic() - started)
+
+        if ok:
+            WebhookDelivery.objects.filter(id__in=ids).update(
+                status=WebhookDelivery.DELIVERED, delivered_at=timezone.now(), claim_token=''
+            )
+            delivered = len(ids)
+            metrics.incr('webhook_deliveries', len(ids), result='delivered')
+        else:
+            max_attempts = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8)
+            for d in deliveries:
+                attempts = d.attempts + 1
+                give_up = not retryable or attempts >= max_attempts
+                WebhookDelivery.objects.filter(id=d.id).update(
+                    status=WebhookDelivery.FAILED if give_up else WebhookDelivery.PENDING,
+                    attempts=attempts,
+                    next_attempt_at=timezone.now() + timedelta(seconds=backoff(attempts)),
+                    last_error=error,
+                    claim_token='',
+                )
+                metrics.incr('webhook_deliveries', result='failed' if give_up else 'retry')
+            logging.warning(f"[Webhook] Delivery of {len(ids)} event(s) to {url} failed: {error}")
+
+    # whatever is still pending (retries, or more than one batch) gets its own run
+    next_due = WebhookDelivery.objects.filter(url=url, status=WebhookDelivery.PENDING).aggregate(
+        at=Min('next_attempt_at'))['at']
+    if next_due is not None:
+        schedule(url, countdown=max(0, round((next_due - timezone.now()).total_seconds())))
+    return delivered
@@ -0,0 +1,121 @@
+# screenshots/worker.py
+"""
+Per-process service instances and Celery worker warm-up.
+
+Each worker process builds ScreenshotService / MockupService once and keeps
+them for every task it runs. On worker_process_init the configured capture
+engines (CAPTURE_ENGINES), the mockup templates and (optionally, when
+Playwright is one of the engines) a Chromium instance are loaded up-front so the first task runs as fast as the rest.
+"""
+import logging
+import os
+import time
+
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown
+from django.conf import settings
+
+from . import auth, memory, metrics
+from .health import EngineHealth
+from .services import ScreenshotService, MockupService
+
+_services = {}
+
+
+def _get_service(name, factory):
+    # keyed by pid so a forked child never reuses its parent's browser handle
+    key = (name, os.getpid())
+    if key not in _services:
+        _services[key] = factory()
+    return _services[key]
+
+
+def engine_options():
+    """Per-engine settings passed to the capture engines"""
+    return {
+        'screenshotone': {
+            'access_key': getattr(settings, 'SCREENSHOTONE_KEY', None),
+            'concurrency': getattr(settings, 'SCREENSHOTONE_CONCURRENCY', 3),
+            'timeout': getattr(settings, 'SCREENSHOTONE_TIMEOUT', 90),
+            'max_attempts': getattr(settings, 'SCREENSHOTONE_MAX_ATTEMPTS', 4),
+            'retry_base_seconds': getattr(settings, 'SCREENSHOTONE_RETRY_BASE_SECONDS', 1.0),
+            'credit_price': getattr(settings, 'SCREENSHOTONE_CREDIT_PRICE', None),
+        },
+    }
+
+
+def make_screenshot_service():
+    """A ScreenshotService configured with the engines, circuit breakers and memory budget from settings"""
+    return ScreenshotService(
+        max_capture_pixels=getattr(settings, 'CAPTURE_MAX_PIXELS', None),
+        engines=getattr(settings, 'CAPTURE_ENGINES', None),
+        health=EngineHealth() if getattr(settings, 'ENGINE_CIRCUIT_BREAKER', True) else None,
+        engine_options=engine_options(),
+        login_sessions=auth.login_session,
+    )
+
+
+def make_mockup_service():
+    """A MockupService configured with the memory budget from settings"""
+    memory.configure_pillow()
+    return MockupService(max_pixels=getattr(settings, 'MOCKUP_MAX_PIXELS', None))
+
+
+def get_screenshot_service():
+    """Return this process's shared ScreenshotService"""
+    return _get_service('screenshot', make_screenshot_service)
+
+
+def get_mockup_service():
+    """Return this process's shared MockupService"""
+    return _get_service('mockup', make_mockup_service)
+
+
+def _timed(step, func, timings):
+    start = time.perf_counter()
+    try:
+        func()
+    except Exception as e:
+        logging.warning(f"[Warm-up] {step} failed: {e}", exc_info=True)
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[step] = round(elapsed, 4)
+        metrics.observe('worker_warmup_seconds', elapsed, step=step)
+
+
+def warm_up():
+    """Do the one-off per-process setup so the first task doesn't pay for it"""
+    timings = {}
+    start = time.perf_counter()
+
+    _timed('services', lambda: (get_screenshot_service(), get_mockup_service()), timings)
+    # the configured engines' libraries (Playwright, Selenium, ...), which the web process never loads
+    _timed('imports', lambda: [get_screenshot_service().engine(name)
+                               for name in get_screenshot_service().engine_names], timings)
+    _timed('templates', lambda: get_mockup_service().load_templates(), timings)
+    # a worker whose engines don't include Playwright would never use the browser
+    if getattr(settings, 'WORKER_WARMUP_BROWSER', True) and 'playwright' in get_screenshot_service().engine_names:
+        _timed('browser', lambda: get_screenshot_service().start_browser(), timings)
+
+    total = time.perf_counter() - start
+    metrics.observe('worker_warmup_seconds', total, step='total')
+    logging.info(f"[Warm-up] Worker {os.getpid()} ready in {total:.2f}s {timings}")
+    return timings
+
+
+@worker_process_init.connect
+def warm_up_worker_process(**kwargs):
+    if getattr(settings, 'WORKER_WARMUP', True):
+        warm_up()
+
+
+@worker_process_shutdown.connect
+def close_worker_browser(**kwargs):
+    key = ('screenshot', os.getpid())
+    if key in _services:
+        _services[key].close_browser()
+
+
+@task_postrun.connect
+def check_memory_after_task(sender=None, **kwargs):
+    # prefork children over the limit are replaced by Celery (worker_max_memory_per_child)
+    memory.check_worker_memory(getattr(sender, 'name', None))